@@ -0,0 +1 @@
+# PlasticFlow benchmarks — run with `bench --site <site> execute`, never in production.
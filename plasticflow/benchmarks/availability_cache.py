@@ -0,0 +1,133 @@
+"""Shared availability cache benchmark: cold, warm and invalidated reads.
+
+Times `get_cached_available_quantity` (the path behind the Stock
+Reconciliation `get_current_stock` call) and its bulk variant against
+the uncached canonical query, for:
+
+* uncached — `get_available_quantity`, the per-transaction cache cleared
+  before every call;
+* cold — shared versions bumped before every call, so each read misses;
+* warm — repeated reads of entries already in Redis;
+* invalidated — one product's version bumped per round, as a stock write
+  would, then every product read again.
+
+Run against a scratch site with stock:
+
+	bench --site test.local execute \\
+		plasticflow.benchmarks.availability_cache.run \\
+		--kwargs "{'products': ['PET-001', 'PET-002'], 'rounds': 200}"
+
+Without `products` the products with the most batch rows are used.
+"""
+
+from __future__ import annotations
+
+import time
+
+import frappe
+
+from plasticflow.stock import availability as stock_availability
+
+DEFAULT_ROUNDS = 200
+DEFAULT_PRODUCT_COUNT = 20
+
+
+def run(
+	products=None,
+	*,
+	location_type: str = "Warehouse",
+	warehouse: str | None = None,
+	rounds: int = DEFAULT_ROUNDS,
+):
+	products = list(products or _busiest_products(DEFAULT_PRODUCT_COUNT))
+	if not products:
+		frappe.throw("No products with Stock Entry Items rows to benchmark.")
+	rounds = int(rounds)
+	options = {"location_type": location_type, "warehouse": warehouse}
+
+	def uncached(product):
+		stock_availability.clear_cache()
+		stock_availability.get_available_quantity(product, **options)
+
+	def cold(product):
+		stock_availability.bump_shared_versions([product])
+		stock_availability.get_cached_available_quantity(product, **options)
+
+	def warm(product):
+		stock_availability.get_cached_available_quantity(product, **options)
+
+	def cold_bulk():
+		stock_availability.bump_shared_versions(products)
+		stock_availability.get_cached_available_quantities(products, **options)
+
+	def warm_bulk():
+		stock_availability.get_cached_available_quantities(products, **options)
+
+	def invalidated_bulk(round_index):
+		stock_availability.bump_shared_versions([products[round_index % len(products)]])
+		stock_availability.get_cached_available_quantities(products, **options)
+
+	stock_availability.get_cached_available_quantities(products, **options)
+	stock_availability.get_cache_stats(reset=True)
+	results = {
+		"products": len(products),
+		"rounds": rounds,
+		"uncached": _time_per_product(uncached, products, rounds),
+		"cold": _time_per_product(cold, products, rounds),
+		"warm": _time_per_product(warm, products, rounds),
+		"cold_bulk": _time(lambda _round: cold_bulk(), rounds),
+		"warm_bulk": _time(lambda _round: warm_bulk(), rounds),
+		"invalidated_bulk": _time(invalidated_bulk, rounds),
+		"cache_stats": stock_availability.get_cache_stats(reset=True),
+	}
+	_print(results)
+	return results
+
+
+def _busiest_products(limit):
+	return frappe.db.sql_list(
+		"""
+		select product from `tabStock Entry Items`
+		where product is not null
+		group by product
+		order by count(*) desc
+		limit %s
+		""",
+		(limit,),
+	)
+
+
+def _time_per_product(call, products, rounds):
+	return _time(lambda round_index: call(products[round_index % len(products)]), rounds)
+
+
+def _time(call, rounds):
+	timings = []
+	for round_index in range(rounds):
+		started = time.perf_counter()
+		call(round_index)
+		timings.append((time.perf_counter() - started) * 1000)
+	timings.sort()
+	return {
+		"mean_ms": round(sum(timings) / len(timings), 3),
+		"p50_ms": round(_percentile(timings, 0.5), 3),
+		"p95_ms": round(_percentile(timings, 0.95), 3),
+	}
+
+
+def _percentile(values, fraction):
+	if not values:
+		return 0.0
+	index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+	return values[index]
+
+
+def _print(results):
+	print(f"{results['products']} products, {results['rounds']} rounds")
+	for label in ("uncached", "cold", "warm", "cold_bulk", "warm_bulk", "invalidated_bulk"):
+		timing = results[label]
+		print(
+			f"{label:>17}: mean {timing['mean_ms']:8.3f} ms"
+			f"  p50 {timing['p50_ms']:8.3f} ms  p95 {timing['p95_ms']:8.3f} ms"
+		)
+	print(f"cache stats: {results['cache_stats']}")
@@ -0,0 +1,123 @@
+"""Sales Order invoicing progress benchmark: re-aggregation vs stored counters.
+
+Adds `invoices` partial Invoices to a submitted Sales Order, then times:
+
+* aggregate — the per-call work before the counters existed: summing
+  every submitted Invoice and looking up the latest one;
+* counters — `_load_invoicing_counters()`, the primary-key read that
+  replaces it;
+* progress — a full `update_invoicing_progress()`;
+* validate — Invoice validation of one more partial invoice, which
+  checks the remaining gross amount against the counters.
+
+Run against a scratch site with a submitted Sales Order:
+
+	bench --site test.local execute \\
+		plasticflow.benchmarks.invoicing_progress.run \\
+		--kwargs "{'sales_order': 'SO-0001', 'invoices': 50, 'rounds': 200}"
+
+Everything the benchmark writes is rolled back at the end.
+"""
+
+from __future__ import annotations
+
+import time
+
+import frappe
+from frappe.utils import flt
+
+DEFAULT_INVOICES = 50
+DEFAULT_ROUNDS = 200
+
+
+def run(sales_order: str, *, invoices: int = DEFAULT_INVOICES, rounds: int = DEFAULT_ROUNDS):
+	invoices = int(invoices)
+	rounds = int(rounds)
+	order = frappe.get_doc("Sales Order", sales_order)
+	if order.docstatus != 1:
+		frappe.throw("Benchmark needs a submitted Sales Order.")
+
+	try:
+		_add_partial_invoices(order, invoices)
+		order.reload()
+		probe = order._build_invoice_doc(_partial_amount(order, invoices))
+
+		results = {
+			"sales_order": order.name,
+			"invoices": int(order.invoice_count or 0),
+			"rounds": rounds,
+			"aggregate": _time(lambda: _aggregate(order.name), rounds),
+			"counters": _time(order._load_invoicing_counters, rounds),
+			"progress": _time(order.update_invoicing_progress, rounds),
+			"validate": _time(probe._ensure_alignment_with_sales_order, rounds),
+		}
+	finally:
+		frappe.db.rollback()
+
+	_print(results)
+	return results
+
+
+def _partial_amount(order, invoices):
+	# Leave room for one more invoice of the same size (the validation probe).
+	return flt(order.total_gross_amount or order.total_amount) / (invoices + 2)
+
+
+def _add_partial_invoices(order, invoices):
+	amount = _partial_amount(order, invoices)
+	for _index in range(invoices):
+		invoice = order._build_invoice_doc(amount)
+		invoice.insert(ignore_permissions=True)
+		invoice.submit()
+
+
+def _aggregate(sales_order):
+	frappe.db.sql(
+		"""
+		select coalesce(sum(total_amount), 0)
+		from `tabInvoice`
+		where sales_order = %s and docstatus = 1
+		""",
+		(sales_order,),
+	)
+	frappe.db.sql(
+		"""
+		select name
+		from `tabInvoice`
+		where sales_order = %s and docstatus = 1
+		order by modified desc
+		limit 1
+		""",
+		(sales_order,),
+	)
+
+
+def _time(call, rounds):
+	timings = []
+	for _round in range(rounds):
+		started = time.perf_counter()
+		call()
+		timings.append((time.perf_counter() - started) * 1000)
+	timings.sort()
+	return {
+		"mean_ms": round(sum(timings) / len(timings), 3),
+		"p50_ms": round(_percentile(timings, 0.5), 3),
+		"p95_ms": round(_percentile(timings, 0.95), 3),
+	}
+
+
+def _percentile(values, fraction):
+	if not values:
+		return 0.0
+	index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+	return values[index]
+
+
+def _print(results):
+	print(f"{results['sales_order']}: {results['invoices']} invoices, {results['rounds']} rounds")
+	for label in ("aggregate", "counters", "progress", "validate"):
+		timing = results[label]
+		print(
+			f"{label:>10}: mean {timing['mean_ms']:8.3f} ms"
+			f"  p50 {timing['p50_ms']:8.3f} ms  p95 {timing['p95_ms']:8.3f} ms"
+		)
@@ -0,0 +1,220 @@
+"""Multi-process Sales Order submission contention benchmark.
+
+Spawns N worker processes that each insert and submit Sales Orders for
+the same product at the same time, so every submit competes for the same
+`Stock Entry Items` rows. Reports throughput, deadlocks, lock-wait
+timeouts, stock conflicts (guarded reservation lost the race) and retries
+for each concurrency level. Any other validation error counts as an
+error and is not retried.
+
+Run against a scratch site that has warehouse stock for the product:
+
+	bench --site test.local execute \\
+		plasticflow.benchmarks.sales_order_contention.run \\
+		--kwargs "{'product': 'PET-001', 'customer': 'CUST-0001', 'import_shipment': 'ISH-0001'}"
+
+Submitted orders are cancelled again after each level so the stock is
+restored for the next one (side documents such as auto-created Loading
+Orders are left behind).
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import random
+import time
+
+import frappe
+from frappe.utils import flt, nowdate
+
+from plasticflow.stock import availability as stock_availability
+from plasticflow.stock import reservation as stock_reservation
+
+DEFAULT_LEVELS = (8, 16, 32)
+
+
+def run(
+	product: str,
+	customer: str,
+	import_shipment: str,
+	*,
+	levels=DEFAULT_LEVELS,
+	orders_per_worker: int = 5,
+	quantity: float = 1,
+	warehouse: str | None = None,
+	max_retries: int = 5,
+	cleanup: bool = True,
+):
+	spec = {
+		"product": product,
+		"customer": customer,
+		"import_shipment": import_shipment,
+		"quantity": flt(quantity),
+		"warehouse": warehouse,
+		"orders_per_worker": int(orders_per_worker),
+		"max_retries": int(max_retries),
+	}
+	results = []
+	for workers in levels:
+		needed = flt(quantity) * int(workers) * int(orders_per_worker)
+		available = stock_availability.get_available_quantity(product, warehouse=warehouse)
+		if available + stock_availability.QTY_TOLERANCE < needed:
+			frappe.throw(f"Level {workers} needs {needed} of {product}, only {available} available.")
+
+		result = _run_level(int(workers), spec)
+		results.append(result)
+		print(_format_result(result))
+		if cleanup:
+			_cancel_orders(result.pop("orders"))
+		else:
+			result.pop("orders")
+	return results
+
+
+def _run_level(workers: int, spec: dict) -> dict:
+	ctx = multiprocessing.get_context("spawn")
+	queue = ctx.Queue()
+	barrier = ctx.Barrier(workers)
+	site = frappe.local.site
+	sites_path = os.path.abspath(frappe.local.sites_path)
+
+	frappe.db.commit()
+	processes = [
+		ctx.Process(target=_worker, args=(site, sites_path, spec, barrier, queue)) for _ in range(workers)
+	]
+	started = time.perf_counter()
+	for process in processes:
+		process.start()
+	stats = [queue.get() for _ in processes]
+	for process in processes:
+		process.join()
+	elapsed = time.perf_counter() - started
+
+	totals = {
+		"submitted": 0,
+		"deadlocks": 0,
+		"lock_timeouts": 0,
+		"stock_conflicts": 0,
+		"errors": 0,
+		"retries": 0,
+		"failed": 0,
+	}
+	latencies: list[float] = []
+	orders: list[str] = []
+	for row in stats:
+		for key in totals:
+			totals[key] += row[key]
+		latencies.extend(row["latencies"])
+		orders.extend(row["orders"])
+
+	latencies.sort()
+	return {
+		"workers": workers,
+		"elapsed": elapsed,
+		"throughput": totals["submitted"] / elapsed if elapsed else 0,
+		"p50_ms": _percentile(latencies, 0.5) * 1000,
+		"p95_ms": _percentile(latencies, 0.95) * 1000,
+		**totals,
+		"orders": orders,
+	}
+
+
+def _worker(site, sites_path, spec, barrier, queue):
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	frappe.set_user("Administrator")
+	stats = {
+		"submitted": 0,
+		"deadlocks": 0,
+		"lock_timeouts": 0,
+		"stock_conflicts": 0,
+		"errors": 0,
+		"retries": 0,
+		"failed": 0,
+		"latencies": [],
+		"orders": [],
+	}
+	try:
+		barrier.wait()
+		for _ in range(spec["orders_per_worker"]):
+			for attempt in range(spec["max_retries"] + 1):
+				started = time.perf_counter()
+				try:
+					doc = _make_order(spec)
+					doc.insert(ignore_permissions=True)
+					doc.submit()
+					frappe.db.commit()
+				except frappe.QueryDeadlockError:
+					frappe.db.rollback()
+					stats["deadlocks"] += 1
+				except frappe.QueryTimeoutError:
+					frappe.db.rollback()
+					stats["lock_timeouts"] += 1
+				except stock_reservation.StockConflictError:
+					frappe.db.rollback()
+					stats["stock_conflicts"] += 1
+				except frappe.ValidationError:
+					frappe.db.rollback()
+					stats["errors"] += 1
+					stats["failed"] += 1
+					break
+				else:
+					stats["submitted"] += 1
+					stats["latencies"].append(time.perf_counter() - started)
+					stats["orders"].append(doc.name)
+					break
+				if attempt == spec["max_retries"]:
+					stats["failed"] += 1
+				else:
+					stats["retries"] += 1
+					time.sleep(random.uniform(0.01, 0.05) * (attempt + 1))
+	finally:
+		frappe.local.message_log = []
+		queue.put(stats)
+		frappe.destroy()
+
+
+def _make_order(spec):
+	return frappe.get_doc(
+		{
+			"doctype": "Sales Order",
+			"order_date": nowdate(),
+			"customer": spec["customer"],
+			"import_shipment": spec["import_shipment"],
+			"delivery_source": "Warehouse",
+			"sales_type": "Credit",
+			"items": [
+				{
+					"product": spec["product"],
+					"quantity": spec["quantity"],
+					"warehouse": spec["warehouse"],
+				}
+			],
+		}
+	)
+
+
+def _cancel_orders(names):
+	for name in names:
+		doc = frappe.get_doc("Sales Order", name)
+		if doc.docstatus == 1:
+			doc.cancel()
+			frappe.db.commit()
+
+
+def _percentile(values, fraction):
+	if not values:
+		return 0.0
+	index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+	return values[index]
+
+
+def _format_result(result):
+	return (
+		f"workers={result['workers']:>3} submitted={result['submitted']:>4} "
+		f"throughput={result['throughput']:.1f}/s p50={result['p50_ms']:.0f}ms p95={result['p95_ms']:.0f}ms "
+		f"deadlocks={result['deadlocks']} lock_timeouts={result['lock_timeouts']} "
+		f"stock_conflicts={result['stock_conflicts']} errors={result['errors']} "
+		f"retries={result['retries']} failed={result['failed']}"
+	)
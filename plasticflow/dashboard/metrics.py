@@ -134,3 +134,31 @@ def get_average_profit_margin(filters: dict[str, str] | None = None) -> dict[str
 		"fieldtype": "Percent",
 		"route": ["List", "Sales Order"],
 	}
+
+
+@frappe.whitelist()
+def get_stock_ledger_drift(filters: dict[str, str] | None = None) -> dict[str, object]:
+	"""Drifting Stock Ledger Entry slots found by the latest scheduled drift check."""
+	from plasticflow.stock import drift_monitor
+
+	latest = drift_monitor.get_latest()
+
+	return {
+		"value": latest.drift_count if latest else 0,
+		"fieldtype": "Int",
+		"route": ["List", drift_monitor.LOG_DOCTYPE],
+	}
+
+
+@frappe.whitelist()
+def get_stock_ledger_max_drift(filters: dict[str, str] | None = None) -> dict[str, object]:
+	"""Worst absolute quantity difference found by the latest scheduled drift check."""
+	from plasticflow.stock import drift_monitor
+
+	latest = drift_monitor.get_latest()
+
+	return {
+		"value": flt(latest.max_abs_diff) if latest else 0,
+		"fieldtype": "Float",
+		"route": ["List", drift_monitor.LOG_DOCTYPE],
+	}
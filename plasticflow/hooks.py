@@ -199,6 +199,17 @@ doc_events = {
 # 	],
 # }
 
+scheduler_events = {
+	"hourly": [
+		"plasticflow.stock.drift_monitor.run",
+	],
+	"cron": {
+		"* * * * *": [
+			"plasticflow.stock.outbox.sweep",
+		],
+	},
+}
+
 # Testing
 # -------
 
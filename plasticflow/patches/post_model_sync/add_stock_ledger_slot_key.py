@@ -0,0 +1,34 @@
+import frappe
+
+from plasticflow.stock import ledger as stock_ledger
+
+
+def execute():
+	"""Merge duplicate ledger slots once and backfill the unique `slot_key`.
+
+	Before the unique index, `_get_or_create` healed races by deleting
+	duplicates on every write. Keep the most recently moved row of each
+	slot (the one the old self-heal would have kept) and drop the rest;
+	`rebuild_stock_ledger_entries` restores balances from the truth anyway.
+	"""
+	if not frappe.db.table_exists(stock_ledger.LEDGER_DOCTYPE):
+		return
+
+	table = f"`tab{stock_ledger.LEDGER_DOCTYPE}`"
+	frappe.db.sql(
+		f"""
+		delete sle
+		from {table} sle
+		inner join (
+			select name,
+				row_number() over (
+					partition by {stock_ledger.slot_key_sql("src")}
+					order by coalesce(src.last_movement, src.creation) desc, src.name
+				) as position
+			from {table} src
+		) ranked on ranked.name = sle.name
+		where ranked.position > 1
+		"""
+	)
+	frappe.db.sql(f"update {table} set slot_key = {stock_ledger.slot_key_sql()}")
+	frappe.db.commit()
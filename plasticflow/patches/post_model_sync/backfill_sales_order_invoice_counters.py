@@ -0,0 +1,33 @@
+import frappe
+
+
+def execute():
+	"""Fill the Sales Order invoicing counters from the submitted Invoices.
+
+	Invoice submit and cancel now maintain `invoiced_amount`, `invoice_count`
+	and `invoice` incrementally, so they have to start out exact.
+	"""
+	if not frappe.db.table_exists("Sales Order") or not frappe.db.table_exists("Invoice"):
+		return
+
+	frappe.db.sql(
+		"""
+		update `tabSales Order` so
+		left join (
+			select sales_order, sum(total_amount) as invoiced, count(*) as invoices
+			from `tabInvoice`
+			where docstatus = 1 and sales_order is not null
+			group by sales_order
+		) totals on totals.sales_order = so.name
+		set so.invoiced_amount = coalesce(totals.invoiced, 0),
+			so.invoice_count = coalesce(totals.invoices, 0),
+			so.invoice = (
+				select inv.name
+				from `tabInvoice` inv
+				where inv.sales_order = so.name and inv.docstatus = 1
+				order by inv.modified desc
+				limit 1
+			)
+		"""
+	)
+	frappe.db.commit()
@@ -0,0 +1,25 @@
+import frappe
+
+
+def execute():
+	"""Recompute the stored `available_qty` on every Stock Entry Items row.
+
+	The availability reader now filters on the stored column instead of
+	`received - reserved - issued`, so it has to be exact for old rows too.
+	"""
+	if not frappe.db.table_exists("Stock Entry Items"):
+		return
+
+	frappe.db.sql(
+		"""
+		update `tabStock Entry Items`
+		set available_qty = greatest(
+			coalesce(received_qty, 0) - coalesce(reserved_qty, 0) - coalesce(issued_qty, 0), 0
+		)
+		where available_qty is null
+			or available_qty != greatest(
+				coalesce(received_qty, 0) - coalesce(reserved_qty, 0) - coalesce(issued_qty, 0), 0
+			)
+		"""
+	)
+	frappe.db.commit()
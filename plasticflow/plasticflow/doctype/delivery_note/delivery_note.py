@@ -1,8 +1,11 @@
 import frappe
+from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate
 
+from plasticflow.stock import availability as stock_availability
 from plasticflow.stock import ledger as stock_ledger
+from plasticflow.stock import reservation as stock_reservation
 from plasticflow.stock import uom as stock_uom
 
 
@@ -87,32 +90,12 @@ class DeliveryNote(Document):
 				item.uom = self._get_sales_order_uom(item.product)
 
 	def _issue_stock(self):
-		batch_map = {}
-		aggregated = []
-		for item in self.items:
-			if item.stock_entry_item:
-				child = frappe.get_doc("Stock Entry Items", item.stock_entry_item)
-				batch_map.setdefault(child.parent, []).append((child.name, item))
-			else:
-				aggregated.append(item)
-
-		for batch_name, entries in batch_map.items():
-			batch = frappe.get_doc("Stock Entries", batch_name)
-			updated = False
-			from_customs = batch.status == "At Customs"
-			for child_name, item in entries:
-				child = next((row for row in batch.items if row.name == child_name), None)
-				if not child:
-					continue
-				quantity = flt(item.quantity or 0)
-				stock_uom_name = child.uom or self._get_product_uom(child.product)
-				qty_stock = self._to_stock_qty(item, quantity, stock_uom_name)
-				child.reserved_qty = max((child.reserved_qty or 0) - qty_stock, 0)
-				child.issued_qty = (child.issued_qty or 0) + qty_stock
-				stock_ledger.issue_stock(child, qty_stock, from_customs=from_customs)
-				updated = True
-			if updated:
-				batch.save(ignore_permissions=True)
+		rows, aggregated = self._collect_batch_rows()
+		if rows:
+			stock_reservation.issue(rows)
+			stock_reservation.refresh_entry_totals(row["child"].parent for row in rows)
+			for row in rows:
+				stock_ledger.issue_stock(row["child"], row["qty"], from_customs=row["from_customs"])
 
 		if aggregated:
 			location_type, warehouse = self._source_location()
@@ -133,32 +116,12 @@ class DeliveryNote(Document):
 				)
 
 	def _reverse_stock(self):
-		batch_map = {}
-		aggregated = []
-		for item in self.items:
-			if item.stock_entry_item:
-				child = frappe.get_doc("Stock Entry Items", item.stock_entry_item)
-				batch_map.setdefault(child.parent, []).append((child.name, item))
-			else:
-				aggregated.append(item)
-
-		for batch_name, entries in batch_map.items():
-			batch = frappe.get_doc("Stock Entries", batch_name)
-			updated = False
-			from_customs = batch.status == "At Customs"
-			for child_name, item in entries:
-				child = next((row for row in batch.items if row.name == child_name), None)
-				if not child:
-					continue
-				quantity = flt(item.quantity or 0)
-				stock_uom_name = child.uom or self._get_product_uom(child.product)
-				qty_stock = self._to_stock_qty(item, quantity, stock_uom_name)
-				child.issued_qty = max((child.issued_qty or 0) - qty_stock, 0)
-				child.reserved_qty = (child.reserved_qty or 0) + qty_stock
-				stock_ledger.reverse_issue(child, qty_stock, from_customs=from_customs)
-				updated = True
-			if updated:
-				batch.save(ignore_permissions=True)
+		rows, aggregated = self._collect_batch_rows()
+		if rows:
+			stock_reservation.reverse_issue(rows)
+			stock_reservation.refresh_entry_totals(row["child"].parent for row in rows)
+			for row in rows:
+				stock_ledger.reverse_issue(row["child"], row["qty"], from_customs=row["from_customs"])
 
 		if aggregated:
 			location_type, warehouse = self._source_location()
@@ -178,6 +141,28 @@ class DeliveryNote(Document):
 					remarks=f"Issue reversed for Delivery Note {self.name}",
 				)
 
+	def _collect_batch_rows(self):
+		"""Split items into per-batch quantity rows and aggregated (batch-less) items."""
+		batch_items = [item for item in self.items if item.stock_entry_item]
+		aggregated = [item for item in self.items if not item.stock_entry_item]
+		stock_availability.lock_batch_items(item.stock_entry_item for item in batch_items)
+		children = stock_reservation.get_items(item.stock_entry_item for item in batch_items)
+		rows = []
+		for item in batch_items:
+			child = children.get(item.stock_entry_item)
+			if not child:
+				frappe.throw(_("Stock Entry Item {0} not found.").format(item.stock_entry_item))
+			stock_uom_name = child.uom or self._get_product_uom(child.product)
+			rows.append(
+				{
+					"child_name": child.name,
+					"qty": self._to_stock_qty(item, flt(item.quantity or 0), stock_uom_name),
+					"child": child,
+					"from_customs": child.entry_status == "At Customs",
+				}
+			)
+		return rows, aggregated
+
 	def _update_sales_order_status(self):
 		if not self.sales_order or not frappe.db.exists("Sales Order", self.sales_order):
 			return
@@ -3,6 +3,12 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate
 
+from plasticflow.plasticflow.doctype.sales_order.sales_order import (
+	get_for_invoicing_progress,
+	record_invoice,
+	remove_invoice,
+)
+
 PAYMENT_TOLERANCE = 0.01
 
 
@@ -17,10 +23,14 @@ class Invoice(Document):
 		self._ensure_alignment_with_sales_order()
 
 	def on_submit(self):
+		if self.sales_order:
+			record_invoice(self.sales_order, self.name, self.total_amount)
 		self._sync_sales_order_progress()
 
 	def on_cancel(self):
 		self._clear_upstream_links()
+		if self.sales_order:
+			remove_invoice(self.sales_order, self.name, self.total_amount)
 		self._sync_sales_order_progress()
 
 	def on_trash(self):
@@ -55,7 +65,15 @@ class Invoice(Document):
 		self.outstanding_amount = self.total_amount
 
 	def _ensure_alignment_with_sales_order(self):
-		sales_order = frappe.get_doc("Sales Order", self.sales_order)
+		# The stored invoicing counters stand in for re-summing every Invoice.
+		sales_order = frappe.db.get_value(
+			"Sales Order",
+			self.sales_order,
+			["sales_type", "total_gross_amount", "total_amount", "invoiced_amount", "currency"],
+			as_dict=True,
+		)
+		if not sales_order:
+			frappe.throw(_("Sales Order {0} not found.").format(self.sales_order))
 		expected_type = "Cash" if sales_order.sales_type == "Cash" else "Credit"
 		if not self.invoice_type:
 			self.invoice_type = expected_type
@@ -63,7 +81,7 @@ class Invoice(Document):
 			frappe.throw(_("Invoice type must match the sales order sales type ({0}).").format(expected_type))
 
 		total_gross = flt(sales_order.total_gross_amount or sales_order.total_amount or 0)
-		total_invoiced = flt(sales_order._get_total_invoiced_amount() or 0)
+		total_invoiced = flt(sales_order.invoiced_amount)
 		if self.docstatus == 1:
 			# When updating an already submitted invoice, exclude this invoice from the already invoiced sum
 			total_invoiced = max(total_invoiced - flt(self.total_amount or 0), 0)
@@ -80,7 +98,9 @@ class Invoice(Document):
 	def _sync_sales_order_progress(self):
 		if not self.sales_order:
 			return
-		sales_order = frappe.get_doc("Sales Order", self.sales_order)
+		sales_order = get_for_invoicing_progress(self.sales_order)
+		if not sales_order:
+			return
 		sales_order.update_invoicing_progress()
 		if flt(sales_order.outstanding_amount) <= PAYMENT_TOLERANCE:
 			sales_order._finalize_reservations()
@@ -1,9 +1,11 @@
 # Copyright (c) 2025, VuleroTech and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import nowdate
 
+from plasticflow.tests.utils import insert_rows
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -11,6 +13,9 @@ from frappe.tests import IntegrationTestCase
 EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
+SALES_ORDER = "_Test Invoicing SO"
+CUSTOMER = "_Test Invoicing Customer"
+PRODUCT = "_Test Invoicing Product"
 
 
 class IntegrationTestInvoice(IntegrationTestCase):
@@ -19,4 +24,79 @@ class IntegrationTestInvoice(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def setUp(self):
+		_seed_sales_order(total=300)
+
+	def test_counters_follow_submit_and_cancel(self):
+		first, second, third = (_submit_invoice(amount) for amount in (100, 50, 70))
+		self.assertCounters(220, 3, third.name)
+
+		# Cancelling the latest invoice falls back to the previous one.
+		third.cancel()
+		self.assertCounters(150, 2, second.name)
+
+		# Cancelling an older invoice keeps the current one.
+		first.cancel()
+		self.assertCounters(50, 1, second.name)
+
+		second.cancel()
+		self.assertCounters(0, 0, None)
+		self.assertEqual(frappe.db.get_value("Sales Order", SALES_ORDER, "outstanding_amount"), 300)
+
+	def test_over_invoicing_is_rejected(self):
+		first = _submit_invoice(200)
+
+		with self.assertRaises(frappe.ValidationError):
+			_submit_invoice(150)
+		self.assertCounters(200, 1, first.name)
+
+		# Cancelling frees the amount again.
+		first.cancel()
+		self.assertCounters(150, 1, _submit_invoice(150).name)
+
+	def assertCounters(self, invoiced_amount, invoice_count, invoice):
+		counters = frappe.db.get_value(
+			"Sales Order", SALES_ORDER, ["invoiced_amount", "invoice_count", "invoice"], as_dict=True
+		)
+		self.assertEqual(
+			(counters.invoiced_amount, counters.invoice_count, counters.invoice),
+			(invoiced_amount, invoice_count, invoice),
+		)
+
+
+def _submit_invoice(amount):
+	invoice = frappe.get_doc(
+		{
+			"doctype": "Invoice",
+			"invoice_date": nowdate(),
+			"sales_order": SALES_ORDER,
+			"customer": CUSTOMER,
+			"invoice_type": "Cash",
+			"items": [{"product": PRODUCT, "quantity": 1, "rate": amount}],
+		}
+	)
+	invoice.insert()
+	invoice.submit()
+	return invoice
+
+
+def _seed_sales_order(*, total):
+	insert_rows("Customer", [{"name": CUSTOMER, "customer_name": CUSTOMER}])
+	insert_rows("Product", [{"name": PRODUCT, "item_code": PRODUCT, "product_name": PRODUCT}])
+	# A cash order awaiting payment: progress syncs never create a Loading Order.
+	insert_rows(
+		"Sales Order",
+		[
+			{
+				"name": SALES_ORDER,
+				"customer": CUSTOMER,
+				"status": "Payment Pending",
+				"sales_type": "Cash",
+				"delivery_source": "Warehouse",
+				"total_amount": total,
+				"total_gross_amount": total,
+				"outstanding_amount": total,
+			}
+		],
+		docstatus=1,
+	)
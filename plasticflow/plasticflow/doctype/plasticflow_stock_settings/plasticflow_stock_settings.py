@@ -0,0 +1,22 @@
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from plasticflow.stock import fifo as stock_fifo
+
+
+class PlasticFlowStockSettings(Document):
+	def validate(self):
+		seen = set()
+		for rule in self.policy_rules:
+			if not rule.product and not rule.warehouse:
+				frappe.throw(_("Row {0}: set a Product, a Warehouse or both.").format(rule.idx))
+			key = (rule.product or None, rule.warehouse or None)
+			if key in seen:
+				frappe.throw(
+					_("Row {0}: a rule for this Product and Warehouse already exists.").format(rule.idx)
+				)
+			seen.add(key)
+
+	def on_update(self):
+		stock_fifo.clear_cache()
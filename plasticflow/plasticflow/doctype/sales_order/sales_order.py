@@ -3,9 +3,12 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate
 
+from plasticflow.stock import allocation as stock_allocation
 from plasticflow.stock import availability as stock_availability
 from plasticflow.stock import fifo as stock_fifo
+from plasticflow.stock import landed_cost as stock_landed_cost
 from plasticflow.stock import ledger as stock_ledger
+from plasticflow.stock import reservation as stock_reservation
 from plasticflow.stock import uom as stock_uom
 
 PAYMENT_TOLERANCE = 0.01
@@ -13,6 +16,31 @@ SETTLEMENT_TOLERANCE = 200
 QTY_TOLERANCE = 0.0001
 VAT_RATE = 0.15
 WITHHOLDING_RATE_DEFAULT = 3.0
+INVOICE_COUNTER_FIELDS = ("invoiced_amount", "invoice_count", "invoice")
+# Everything `update_invoicing_progress()` reads, including the reservation
+# and Loading Order steps it can trigger (see `get_for_invoicing_progress`).
+INVOICING_PROGRESS_FIELDS = (
+	"name",
+	"docstatus",
+	"status",
+	"sales_type",
+	"delivery_source",
+	"customer",
+	"import_shipment",
+	"driver_name",
+	"plate_number",
+	"gate_pass",
+	"total_amount",
+	"total_gross_amount",
+	"total_net_amount",
+	"outstanding_amount",
+	*INVOICE_COUNTER_FIELDS,
+)
+INVOICING_PROGRESS_CHILD_FIELDS = {
+	"items": ("product", "product_name", "quantity", "uom", "warehouse", "import_shipment_item"),
+	"shipment_allocations": ("stock_entry", "stock_entry_item", "quantity"),
+	"payment_slips": ("amount_paid", "slip_status", "invoice"),
+}
 
 
 class SalesOrder(Document):
@@ -35,6 +63,7 @@ class SalesOrder(Document):
 
 	def before_submit(self):
 		self._calculate_totals()
+		self._lock_stock_candidates()
 		reservations = self._collect_batch_reservations()
 		self._calculate_profitability_fields()
 		if getattr(self, "_allocations_missing", False):
@@ -53,7 +82,8 @@ class SalesOrder(Document):
 			self.status = "Credit Sales"
 
 	def on_submit(self):
-		reservations = self._collect_batch_reservations(track_allocations=False)
+		# Apply the plan `before_submit` stored; never walk FIFO a second time.
+		reservations = self._reservations_from_allocations()
 		self._apply_reservations(reservations)
 		self.db_set(
 			{
@@ -73,7 +103,12 @@ class SalesOrder(Document):
 		self._try_generate_gate_pass()
 
 	def on_cancel(self):
-		reservations = self._collect_batch_reservations(for_release=True, track_allocations=False)
+		if self._allocation_plan():
+			reservations = self._reservations_from_allocations(for_release=True)
+		else:
+			# Orders submitted before allocations were stored: scan for them.
+			self._lock_stock_candidates()
+			reservations = self._collect_batch_reservations(for_release=True)
 		self._release_reservations(reservations)
 		self.db_set(
 			{
@@ -132,6 +167,20 @@ class SalesOrder(Document):
 			cache[product] = frappe.db.get_value("Product", product, "uom")
 		return cache[product]
 
+	def _prefetch_product_uoms(self, products):
+		"""Fill the product UOM cache for `products` with one query."""
+		cache = getattr(self, "_product_uom_cache", None)
+		if cache is None:
+			cache = {}
+			self._product_uom_cache = cache
+		missing = list({product for product in products if product and product not in cache})
+		if not missing:
+			return
+		cache.update(dict.fromkeys(missing))
+		cache.update(
+			frappe.get_all("Product", filters={"name": ("in", missing)}, fields=["name", "uom"], as_list=True)
+		)
+
 	def _resolve_kg_uom(self) -> str | None:
 		if hasattr(self, "_kg_uom_cache"):
 			return self._kg_uom_cache
@@ -244,96 +293,55 @@ class SalesOrder(Document):
 		self._calculate_profitability_fields()
 
 	def _calculate_profitability_fields(self):
-		total_landed = 0.0
-		rate_cache: dict[object, float] = {}
-		for item in self.items:
-			quantity = flt(item.quantity or 0)
-			if quantity <= 0 or not item.product:
-				continue
+		lines = [item for item in self.items if flt(item.quantity or 0) > 0 and item.product]
+		allocations_by_item: dict[str, list] = {}
+		for row in self.get("shipment_allocations") or getattr(self, "_allocation_rows", None) or []:
+			if flt(row.get("quantity") or 0) > 0:
+				allocations_by_item.setdefault(row.get("sales_order_item"), []).append(row)
+
+		# Every rate the order can need, resolved in one query.
+		shipment_items = set()
+		shipment_products = set()
+		for item in lines:
+			allocation_rows = allocations_by_item.get(item.name) or []
+			for row in allocation_rows:
+				if row.get("import_shipment_item"):
+					shipment_items.add(row.get("import_shipment_item"))
+				elif row.get("import_shipment"):
+					shipment_products.add((row.get("import_shipment"), item.product))
+			if item.import_shipment_item:
+				shipment_items.add(item.import_shipment_item)
+			elif self.import_shipment:
+				shipment_products.add((self.import_shipment, item.product))
+		rates_by_item, rates_by_pair = stock_landed_cost.get_landed_rates(shipment_items, shipment_products)
+		self._prefetch_product_uoms(item.product for item in lines)
 
-			allocation_rows = self.get("shipment_allocations") or getattr(self, "_allocation_rows", None) or []
-			allocation_rows = [
-				row
-				for row in allocation_rows
-				if (
-					(isinstance(row, dict) and row.get("sales_order_item") == item.name)
-					or (not isinstance(row, dict) and row.sales_order_item == item.name)
-				)
-			]
+		total_landed = 0.0
+		for item in lines:
+			allocation_rows = allocations_by_item.get(item.name) or []
 			if allocation_rows:
 				allocated_total = 0.0
 				allocated_cost = 0.0
 				for row in allocation_rows:
-					if isinstance(row, dict):
-						alloc_qty = flt(row.get("quantity") or 0)
-						import_shipment_item = row.get("import_shipment_item")
-						import_shipment = row.get("import_shipment")
-					else:
-						alloc_qty = flt(row.quantity or 0)
-						import_shipment_item = row.import_shipment_item
-						import_shipment = row.import_shipment
-					if alloc_qty <= 0:
-						continue
+					alloc_qty = flt(row.get("quantity") or 0)
 					allocated_total += alloc_qty
-
-					landed_rate = 0.0
-					if import_shipment_item:
-						if import_shipment_item not in rate_cache:
-							rate_cache[import_shipment_item] = flt(
-								frappe.db.get_value(
-									"Import Shipment Item",
-									import_shipment_item,
-									"landed_cost_rate_local",
-								)
-								or 0
-							)
-						landed_rate = rate_cache[import_shipment_item]
-					elif import_shipment:
-						cache_key = (import_shipment, item.product)
-						if cache_key not in rate_cache:
-							rate_cache[cache_key] = flt(
-								frappe.db.get_value(
-									"Import Shipment Item",
-									{"parent": import_shipment, "product": item.product},
-									"landed_cost_rate_local",
-								)
-								or 0
-							)
-						landed_rate = rate_cache[cache_key]
-
+					if row.get("import_shipment_item"):
+						landed_rate = rates_by_item.get(row.get("import_shipment_item"), 0.0)
+					else:
+						landed_rate = rates_by_pair.get((row.get("import_shipment"), item.product), 0.0)
 					allocated_cost += alloc_qty * landed_rate
 
 				if allocated_total > 0:
 					total_landed += allocated_cost
 					continue
 
-			landed_rate = 0.0
 			if item.import_shipment_item:
-				if item.import_shipment_item not in rate_cache:
-					rate_cache[item.import_shipment_item] = flt(
-						frappe.db.get_value(
-							"Import Shipment Item",
-							item.import_shipment_item,
-							"landed_cost_rate_local",
-						)
-						or 0
-					)
-				landed_rate = rate_cache[item.import_shipment_item]
-			elif self.import_shipment:
-				cache_key = (self.import_shipment, item.product)
-				if cache_key not in rate_cache:
-					rate_cache[cache_key] = flt(
-						frappe.db.get_value(
-							"Import Shipment Item",
-							{"parent": self.import_shipment, "product": item.product},
-							"landed_cost_rate_local",
-						)
-						or 0
-					)
-				landed_rate = rate_cache[cache_key]
+				landed_rate = rates_by_item.get(item.import_shipment_item, 0.0)
+			else:
+				landed_rate = rates_by_pair.get((self.import_shipment, item.product), 0.0)
 
 			landed_rate = self._to_sales_rate(item, landed_rate)
-			total_landed += quantity * landed_rate
+			total_landed += flt(item.quantity or 0) * landed_rate
 
 		self.landed_cost_total = total_landed
 		net_sales = flt(self.total_net_amount or 0)
@@ -369,8 +377,7 @@ class SalesOrder(Document):
 			delattr(self, "_pending_import_shipments")
 
 	def _set_invoice_progress_fields(self):
-		total_invoiced = self._get_total_invoiced_amount()
-		self.invoiced_amount = total_invoiced
+		self._load_invoicing_counters()
 		net_receivable = self._net_receivable()
 		paid = self._sum_payment_slips(verified_only=self.sales_type == "Cash")
 		self.outstanding_amount = max(net_receivable - paid, 0)
@@ -570,7 +577,7 @@ class SalesOrder(Document):
 		# Intentionally ignore to keep status-driven flow
 		pass
 
-	def _collect_batch_reservations(self, *, for_release: bool = False, track_allocations: bool = True):
+	def _collect_batch_reservations(self, *, for_release: bool = False):
 		reservations: dict[str, dict[str, object]] = {}
 		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
 		target_warehouse = self._get_target_warehouse()
@@ -589,7 +596,7 @@ class SalesOrder(Document):
 				alternate_allocations[product] = alternate_allocations.get(product, 0) + flt(qty or 0)
 
 		def record_allocation(item, batch, qty):
-			if for_release or not track_allocations:
+			if for_release:
 				return
 			allocation = {
 				"sales_order_item": item.name,
@@ -615,13 +622,54 @@ class SalesOrder(Document):
 			self._allocation_rows.append(allocation)
 			self._allocations_missing = True
 
-		if track_allocations and not for_release:
+		if not for_release:
+			self._allocation_rows = []
 			meta = getattr(self, "meta", None)
 			field = meta.get_field("shipment_allocations") if meta else None
 			if field and field.fieldtype == "Table":
 				self.set("shipment_allocations", [])
 
-		for item in self.items:
+		walked_products = [
+			item.product
+			for item in self.items
+			if item.product and not item.batch_item and self._to_stock_qty(item, flt(item.quantity or 0)) > 0
+		]
+		batches_by_product = (
+			self._fifo_batches_by_product(
+				walked_products,
+				location_type=location_type,
+				warehouse=target_warehouse,
+				for_release=for_release,
+				fifo_enabled=fifo_ordering,
+				import_shipments=shipments_for_release,
+			)
+			if walked_products
+			else {}
+		)
+
+		walked = frappe._dict(allocations_by_line={}, shortfalls_by_line={})
+		if not for_release:
+			# One in-memory walk for the whole order, shared with the dry-run
+			# planner: the order's own shipment first, then every other one.
+			plan = stock_allocation.walk(
+				[
+					{
+						"key": index,
+						"product": item.product,
+						"qty": self._to_stock_qty(item, flt(item.quantity or 0)),
+					}
+					for index, item in enumerate(self.items)
+					if item.product and not item.batch_item
+				],
+				batches_by_product,
+				primary_shipment=self.import_shipment,
+				policies=stock_fifo.get_policies(walked_products, target_warehouse),
+			)
+			for allocation in plan.allocations:
+				walked.allocations_by_line.setdefault(allocation.key, []).append(allocation)
+			walked.shortfalls_by_line = {shortfall.key: shortfall.short for shortfall in plan.shortfalls}
+
+		for index, item in enumerate(self.items):
 			required_qty = self._to_stock_qty(item, flt(item.quantity or 0))
 			if required_qty <= 0 or not item.product:
 				continue
@@ -653,15 +701,9 @@ class SalesOrder(Document):
 						)
 				continue
 
+			batches = batches_by_product.get(item.product, [])
 			if for_release:
-				for batch in self._iter_fifo_batches(
-					item.product,
-					location_type=location_type,
-					warehouse=target_warehouse,
-					for_release=True,
-					fifo_enabled=fifo_ordering,
-					import_shipments=shipments_for_release,
-				):
+				for batch in batches:
 					batch_qty = flt(batch.reserved_qty or 0)
 					if batch_qty <= 0 or required_qty <= 0:
 						continue
@@ -678,55 +720,18 @@ class SalesOrder(Document):
 					if required_qty <= QTY_TOLERANCE:
 						break
 			else:
-				for batch in self._iter_fifo_batches(
-					item.product,
-					location_type=location_type,
-					warehouse=target_warehouse,
-					for_release=False,
-					fifo_enabled=fifo_ordering,
-					import_shipments=[self.import_shipment] if self.import_shipment else None,
-				):
-					batch_qty = flt(batch.available_qty or 0)
-					if batch_qty <= 0 or required_qty <= 0:
-						continue
-					allocate = min(required_qty, batch_qty)
+				for allocation in walked.allocations_by_line.get(index, []):
+					batch = allocation.batch
 					self._add_reservation(
 						reservations,
 						batch.batch_name,
 						batch.child_name,
-						allocate,
+						allocation.qty,
 						from_customs=location_type == "Customs",
 					)
-					record_allocation(item, batch, allocate)
-					required_qty -= allocate
-					if required_qty <= QTY_TOLERANCE:
-						break
-
-				if required_qty > QTY_TOLERANCE:
-					for batch in self._iter_fifo_batches(
-						item.product,
-						location_type=location_type,
-						warehouse=target_warehouse,
-						for_release=False,
-						fifo_enabled=fifo_ordering,
-						exclude_import_shipment=self.import_shipment,
-					):
-						batch_qty = flt(batch.available_qty or 0)
-						if batch_qty <= 0 or required_qty <= 0:
-							continue
-						allocate = min(required_qty, batch_qty)
-						self._add_reservation(
-							reservations,
-							batch.batch_name,
-							batch.child_name,
-							allocate,
-							from_customs=location_type == "Customs",
-						)
-						record_alternate(batch.import_shipment, item.product, allocate)
-						record_allocation(item, batch, allocate)
-						required_qty -= allocate
-						if required_qty <= QTY_TOLERANCE:
-							break
+					record_alternate(batch.import_shipment, item.product, allocation.qty)
+					record_allocation(item, batch, allocation.qty)
+				required_qty = walked.shortfalls_by_line.get(index, 0)
 
 			if required_qty > QTY_TOLERANCE:
 				if for_release:
@@ -742,7 +747,7 @@ class SalesOrder(Document):
 				)
 				frappe.throw(message.format(item.product, f"{required_qty:.3f}"))
 
-		if not for_release and track_allocations:
+		if not for_release:
 			if alternate_shipments:
 				self.alternate_import_shipments = ", ".join(alternate_shipments)
 				self._shipment_substitution_notice = self._build_shipment_substitution_notice(
@@ -754,6 +759,49 @@ class SalesOrder(Document):
 
 		return reservations
 
+	def _allocation_plan(self):
+		"""The stored per-batch plan: `shipment_allocations`, or the in-memory rows without the table."""
+		return [
+			row
+			for row in (self.get("shipment_allocations") or getattr(self, "_allocation_rows", None) or [])
+			if row.get("stock_entry") and row.get("stock_entry_item") and flt(row.get("quantity")) > 0
+		]
+
+	def _reservations_from_allocations(self, *, for_release: bool = False):
+		"""Build the reservation payload straight from the stored plan.
+
+		Releases lock exactly the planned batch rows and check they still
+		hold the reserved quantity, instead of rescanning FIFO queues.
+		"""
+		reservations: dict[str, dict[str, object]] = {}
+		from_customs = self.delivery_source == "Direct from Customs"
+		plan = self._allocation_plan()
+		if for_release:
+			locked = stock_availability.lock_batch_items(row.get("stock_entry_item") for row in plan)
+			planned: dict[str, float] = {}
+			for row in plan:
+				name = row.get("stock_entry_item")
+				planned[name] = planned.get(name, 0) + flt(row.get("quantity"))
+			for name, qty in planned.items():
+				reserved = flt(locked[name].reserved_qty) if name in locked else 0
+				if reserved + QTY_TOLERANCE < qty:
+					frappe.throw(
+						_("Batch item {0} does not have enough reserved stock to release. Required {1}, reserved {2}.").format(
+							name,
+							f"{qty:.3f}",
+							f"{max(reserved, 0):.3f}",
+						)
+					)
+		for row in plan:
+			self._add_reservation(
+				reservations,
+				row.get("stock_entry"),
+				row.get("stock_entry_item"),
+				flt(row.get("quantity")),
+				from_customs=from_customs,
+			)
+		return reservations
+
 	def _collect_location_requirements(self):
 		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
 		requirements = {}
@@ -770,15 +818,22 @@ class SalesOrder(Document):
 		warehouse = self._get_target_warehouse()
 		if not self.import_shipment:
 			frappe.throw(_("Import Shipment is required to validate stock for this order."))
+		locked = getattr(self, "_locked_stock", None)
+		locked_available: dict[str, float] = {}
+		for row in (locked or {}).values():
+			locked_available[row.product] = locked_available.get(row.product, 0) + max(flt(row.available_qty), 0)
 		for item in self.items:
 			qty = self._to_stock_qty(item, flt(item.quantity or 0))
 			if qty <= 0 or not item.product:
 				continue
-			available_qty = stock_availability.get_available_quantity(
-				item.product,
-				location_type=location_type,
-				warehouse=warehouse if location_type == "Warehouse" else None,
-			)
+			if locked is not None:
+				available_qty = locked_available.get(item.product, 0)
+			else:
+				available_qty = stock_availability.get_available_quantity(
+					item.product,
+					location_type=location_type,
+					warehouse=warehouse if location_type == "Warehouse" else None,
+				)
 			if qty - available_qty > QTY_TOLERANCE:
 				frappe.throw(
 					_("Insufficient {0} stock for {1}. Required {2}, available {3}.").format(
@@ -815,22 +870,34 @@ class SalesOrder(Document):
 		if updates:
 			frappe.db.set_value("Sales Order", self.name, updates, update_modified=False)
 
+	def _lock_stock_candidates(self):
+		"""Lock the batch rows this order can touch before reading availability.
+
+		The locked rows are kept on the document: availability checks and
+		the FIFO walk use their current quantities, not the snapshot a plain
+		read would see.
+		"""
+		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
+		self._locked_stock = stock_availability.lock_candidate_batches(
+			[item.product for item in self.items],
+			location_type=location_type,
+			warehouse=self._get_target_warehouse(),
+		)
+
 	def _apply_reservations(self, reservations):
 		if reservations:
-			for batch_name, payload in reservations.items():
-				batch = frappe.get_doc("Stock Entries", batch_name)
-				batch.flags.ignore_validate_update_after_submit = True
-				updated = False
-				for entry in payload["rows"]:
-					child = next((row for row in batch.items if row.name == entry["child_name"]), None)
-					if not child:
-						continue
-					child.flags.ignore_validate_update_after_submit = True
-					child.reserved_qty = (child.reserved_qty or 0) + (entry["qty"] or 0)
-					updated = True
-					stock_ledger.adjust_for_reservation(child, entry["qty"], from_customs=payload["from_customs"])
-				if updated:
-					batch.save(ignore_permissions=True)
+			rows = [entry for payload in reservations.values() for entry in payload["rows"]]
+			applied = stock_reservation.reserve(rows)
+			failed = [entry["child_name"] for entry, ok in zip(rows, applied, strict=True) if not ok]
+			if failed:
+				frappe.throw(
+					_("Batch item {0} no longer has enough available stock. Please review the order and submit again.").format(
+						", ".join(sorted(set(failed)))
+					),
+					exc=stock_reservation.StockConflictError,
+				)
+			stock_reservation.refresh_entry_totals(reservations)
+			self._sync_reservation_ledger(reservations, stock_ledger.adjust_for_reservation)
 			return
 
 		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
@@ -852,20 +919,9 @@ class SalesOrder(Document):
 
 	def _release_reservations(self, reservations):
 		if reservations:
-			for batch_name, payload in reservations.items():
-				batch = frappe.get_doc("Stock Entries", batch_name)
-				batch.flags.ignore_validate_update_after_submit = True
-				updated = False
-				for entry in payload["rows"]:
-					child = next((row for row in batch.items if row.name == entry["child_name"]), None)
-					if not child:
-						continue
-					child.flags.ignore_validate_update_after_submit = True
-					child.reserved_qty = max((child.reserved_qty or 0) - (entry["qty"] or 0), 0)
-					updated = True
-					stock_ledger.release_reservation(child, entry["qty"], from_customs=payload["from_customs"])
-				if updated:
-					batch.save(ignore_permissions=True)
+			stock_reservation.release([entry for payload in reservations.values() for entry in payload["rows"]])
+			stock_reservation.refresh_entry_totals(reservations)
+			self._sync_reservation_ledger(reservations, stock_ledger.release_reservation)
 			return
 
 		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
@@ -885,19 +941,39 @@ class SalesOrder(Document):
 				remarks=f"Reservation released for Sales Order {self.name}",
 			)
 
+	@staticmethod
+	def _sync_reservation_ledger(reservations, handler):
+		children = stock_reservation.get_items(
+			entry["child_name"] for payload in reservations.values() for entry in payload["rows"]
+		)
+		for payload in reservations.values():
+			for entry in payload["rows"]:
+				child = children.get(entry["child_name"])
+				if child:
+					handler(child, entry["qty"], from_customs=payload["from_customs"])
+
 	def _finalize_reservations(self):
-		"""Convert reserved quantity into issued quantity when billing is complete."""
+		"""Convert reserved quantity into issued quantity when billing is complete.
+
+		Only the aggregate slot of an order without an allocation plan holds
+		its reservation here; planned batches are issued by the Delivery Note.
+		"""
+		if self._allocation_plan():
+			return
 		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
 		warehouse = self._get_target_warehouse()
 		reference = self._ledger_reference(location_type, warehouse)
+		balances = self._get_aggregate_balances(location_type, reference, warehouse)
 		for item in self.items:
 			qty = self._to_stock_qty(item, flt(item.quantity or 0))
-			if qty <= 0 or not item.product:
+			if qty <= 0 or not item.product or item.product not in balances:
 				continue
-			reserved_now = self._get_current_reserved(item.product, location_type, reference, warehouse)
-			if reserved_now <= 0:
+			balance = balances[item.product]
+			if balance.reserved_qty <= 0:
 				continue
-			qty_to_convert = min(qty, reserved_now)
+			qty_to_convert = min(qty, balance.reserved_qty)
+			balance.reserved_qty -= qty_to_convert
+			balance.issued_qty += qty_to_convert
 			stock_ledger.apply_delta(
 				item.product,
 				location_type,
@@ -910,17 +986,22 @@ class SalesOrder(Document):
 
 	def _restore_reservations(self):
 		"""Move issued quantity back to reserved when billing is reversed."""
+		if self._allocation_plan():
+			return
 		location_type = "Customs" if self.delivery_source == "Direct from Customs" else "Warehouse"
 		warehouse = self._get_target_warehouse()
 		reference = self._ledger_reference(location_type, warehouse)
+		balances = self._get_aggregate_balances(location_type, reference, warehouse)
 		for item in self.items:
 			qty = self._to_stock_qty(item, flt(item.quantity or 0))
-			if qty <= 0 or not item.product:
+			if qty <= 0 or not item.product or item.product not in balances:
 				continue
-			issued_now = self._get_current_issued(item.product, location_type, reference, warehouse)
-			if issued_now <= 0:
+			balance = balances[item.product]
+			if balance.issued_qty <= 0:
 				continue
-			qty_to_restore = min(qty, issued_now)
+			qty_to_restore = min(qty, balance.issued_qty)
+			balance.issued_qty -= qty_to_restore
+			balance.reserved_qty += qty_to_restore
 			stock_ledger.apply_delta(
 				item.product,
 				location_type,
@@ -931,27 +1012,26 @@ class SalesOrder(Document):
 				remarks=f"Invoice reversed for Sales Order {self.name}",
 			)
 
-	@staticmethod
-	def _get_current_reserved(product, location_type, reference, warehouse):
-		filters = {
-			"product": product,
-			"location_type": location_type,
-			"location_reference": reference,
-		}
-		if warehouse:
-			filters["warehouse"] = warehouse
-		return flt(frappe.db.get_value("Stock Ledger Entry", filters, "reserved_qty") or 0)
-
-	@staticmethod
-	def _get_current_issued(product, location_type, reference, warehouse):
+	def _get_aggregate_balances(self, location_type, reference, warehouse):
+		"""`{product: {reserved_qty, issued_qty}}` of the aggregate slots, in one query."""
+		products = list({item.product for item in self.items if item.product})
+		if not products:
+			return {}
 		filters = {
-			"product": product,
+			"product": ("in", products),
 			"location_type": location_type,
 			"location_reference": reference,
 		}
 		if warehouse:
 			filters["warehouse"] = warehouse
-		return flt(frappe.db.get_value("Stock Ledger Entry", filters, "issued_qty") or 0)
+		balances = {}
+		for row in frappe.get_all(
+			"Stock Ledger Entry", filters=filters, fields=["product", "reserved_qty", "issued_qty"]
+		):
+			balances.setdefault(row.product, frappe._dict(reserved_qty=0, issued_qty=0))
+			balances[row.product].reserved_qty += flt(row.reserved_qty)
+			balances[row.product].issued_qty += flt(row.issued_qty)
+		return balances
 
 	def _add_reservation(self, reservations, batch_name, child_name, qty, *, from_customs):
 		if qty <= 0:
@@ -1057,114 +1137,132 @@ class SalesOrder(Document):
 			from_customs=location_type == "Customs",
 		)
 
-	def _iter_fifo_batches(
+	def _fifo_batches_by_product(
 		self,
-		product,
+		products,
 		*,
 		location_type,
 		warehouse,
 		for_release: bool = False,
 		fifo_enabled: bool = True,
 		import_shipments: list[str] | None = None,
-		exclude_import_shipment: str | None = None,
 	):
+		"""Candidate batches for every walked product, fetched in one query.
+
+		Reservations read every shipment and leave the primary/alternate
+		split to the caller; releases are scoped to `import_shipments`
+		(or the order's shipment).
+		"""
 		if not frappe.db.table_exists("Stock Entries") or not frappe.db.table_exists("Stock Entry Items"):
 			frappe.throw(
 				_("Stock Entry tables are missing. Please run `bench migrate` to set up Stock Entries."),
 				title=_("Stock Entries Not Available"),
 			)
-		if not self.import_shipment and not import_shipments and not exclude_import_shipment:
+		if not self.import_shipment and not (for_release and import_shipments):
 			frappe.throw(_("Import Shipment is required to reserve stock."), title=_("Shipment Required"))
 
-		shipments = import_shipments
 		single_shipment = None
-		if not shipments and not exclude_import_shipment:
+		if for_release and not import_shipments:
 			single_shipment = self.import_shipment
 
-		return stock_availability.get_available_batches(
-			product,
+		batches_by_product = stock_availability.get_available_batches_bulk(
+			products,
 			location_type=location_type,
 			warehouse=warehouse,
 			import_shipment=single_shipment,
-			import_shipments=shipments,
-			exclude_import_shipment=exclude_import_shipment,
+			import_shipments=import_shipments if for_release else None,
 			fifo=fifo_enabled,
 			for_release=for_release,
 		)
+		locked = getattr(self, "_locked_stock", None)
+		if locked is None:
+			return batches_by_product
+		return stock_availability.apply_locked_quantities(batches_by_product, locked, for_release=for_release)
 
 	def _enforce_fifo(self, reservations):
-		for batch_name, payload in reservations.items():
+		"""Throw when any reserved warehouse batch has older stock still available.
+
+		One query checks every reserved row: an EXISTS probe per row finds
+		older `Available` batches of the same product and warehouse whose
+		stored `available_qty` is not consumed by this order's own plan.
+		"""
+		planned: dict[str, float] = {}
+		for payload in reservations.values():
 			if payload["from_customs"]:
 				continue
-			batch = frappe.get_doc("Stock Entries", batch_name)
 			for entry in payload["rows"]:
-				child = next((row for row in batch.items if row.name == entry["child_name"]), None)
-				if not child:
-					continue
-				arrival_marker = batch.arrival_date or batch.creation
-				if not frappe.db.table_exists("Stock Entry Items") or not frappe.db.table_exists("Stock Entries"):
-					continue
-				available_older = frappe.db.sql(
-					"""
-					select sei.name
-					from `tabStock Entry Items` sei
-					inner join `tabStock Entries` se on se.name = sei.parent
-					where se.warehouse = %s
-					and sei.product = %s
-					and se.status = 'Available'
-					and (
-						coalesce(se.arrival_date, se.creation) < %s
-						or (
-							coalesce(se.arrival_date, se.creation) = %s
-							and se.creation < %s
-						)
+				planned[entry["child_name"]] = planned.get(entry["child_name"], 0) + flt(entry["qty"])
+		if not planned:
+			return
+		if not all(stock_ledger.table_exists(doctype) for doctype in ("Stock Entry Items", "Stock Entries")):
+			return
+
+		values: dict[str, object] = {"tolerance": QTY_TOLERANCE}
+		planned_rows = []
+		for index, (child_name, qty) in enumerate(planned.items()):
+			values[f"child_{index}"] = child_name
+			values[f"qty_{index}"] = qty
+			planned_rows.append(f"select %(child_{index})s as child_name, %(qty_{index})s as qty")
+		planned_sql = " union all ".join(planned_rows)
+
+		violations = frappe.db.sql(
+			f"""
+			select distinct sei.product, se.warehouse
+			from ({planned_sql}) reserved
+			inner join `tabStock Entry Items` sei on sei.name = reserved.child_name
+			inner join `tabStock Entries` se on se.name = sei.parent
+			where exists (
+				select 1
+				from `tabStock Entry Items` older_sei
+				inner join `tabStock Entries` older on older.name = older_sei.parent
+				left join ({planned_sql}) own on own.child_name = older_sei.name
+				where older.warehouse = se.warehouse
+				and older_sei.product = sei.product
+				and older.status = 'Available'
+				and older_sei.available_qty > 0
+				and older_sei.available_qty - coalesce(own.qty, 0) > %(tolerance)s
+				and (
+					coalesce(older.arrival_date, older.creation) < coalesce(se.arrival_date, se.creation)
+					or (
+						coalesce(older.arrival_date, older.creation) = coalesce(se.arrival_date, se.creation)
+						and older.creation < se.creation
 					)
-					and (sei.received_qty - sei.reserved_qty - sei.issued_qty) > 0
-					limit 1
-					""",
-					(batch.warehouse, child.product, arrival_marker, arrival_marker, batch.creation),
 				)
-				if available_older:
-					frappe.throw(
-						_("FIFO policy violation for {0}. Older stock is available in warehouse {1}.").format(
-							child.product, batch.warehouse
-						)
 			)
-
-	def _get_total_invoiced_amount(self, exclude=None):
-		if self.is_new():
-			return 0.0
-		params = [self.name]
-		exclude_clause = ""
-		if exclude:
-			exclude_clause = "and name != %s"
-			params.append(exclude)
-		result = frappe.db.sql(
-			f"""
-			select coalesce(sum(total_amount), 0)
-			from `tabInvoice`
-			where sales_order = %s
-			and docstatus = 1
-			{exclude_clause}
+			order by sei.product, se.warehouse
 			""",
-			tuple(params),
+			values,
+			as_dict=True,
 		)
-		return flt(result[0][0] if result else 0.0)
+		# Only products allocated oldest-first can violate FIFO.
+		violations = [
+			row for row in violations if stock_fifo.get_policy(row.product, row.warehouse) == stock_fifo.FIFO
+		]
+		if violations:
+			frappe.throw(
+				"<br>".join(
+					_("FIFO policy violation for {0}. Older stock is available in warehouse {1}.").format(
+						row.product, row.warehouse
+					)
+					for row in violations
+				)
+			)
 
-	def _get_latest_invoice_name(self):
-		if self.is_new():
-			return None
-		row = frappe.db.sql(
-			"""
-			select name
-			from `tabInvoice`
-			where sales_order = %s and docstatus = 1
-			order by modified desc
-			limit 1
-			""",
-			(self.name,),
-		)
-		return row[0][0] if row else None
+	def _load_invoicing_counters(self):
+		"""Refresh `invoiced_amount`, `invoice_count` and `invoice` from the database.
+
+		Invoice submit and cancel maintain them with relative updates (see
+		`record_invoice` / `remove_invoice`); reading them back keeps a save
+		of this document from writing stale values over a concurrent invoice.
+		"""
+		counters = {}
+		if not self.is_new():
+			counters = (
+				frappe.db.get_value("Sales Order", self.name, list(INVOICE_COUNTER_FIELDS), as_dict=True) or {}
+			)
+		self.invoiced_amount = flt(counters.get("invoiced_amount"))
+		self.invoice_count = int(counters.get("invoice_count") or 0)
+		self.invoice = counters.get("invoice")
 
 	def get_outstanding_amount(self, exclude_invoice=None):
 		net_receivable = self._net_receivable()
@@ -1178,20 +1276,19 @@ class SalesOrder(Document):
 		if self.is_new():
 			return
 
-		total_invoiced = self._get_total_invoiced_amount()
+		self._load_invoicing_counters()
+		total_invoiced = self.invoiced_amount
 		net_receivable = self._net_receivable()
 		total_paid = self._sum_payment_slips(verified_only=self.sales_type == "Cash")
 		outstanding = max(net_receivable - total_paid, 0)
-		latest_invoice = self._get_latest_invoice_name()
 		invoice_target = flt(self.total_gross_amount or self.total_amount or 0)
 		invoice_coverage = invoice_target <= PAYMENT_TOLERANCE or (
 			total_invoiced >= invoice_target - PAYMENT_TOLERANCE
 		)
 
+		# The invoicing counters are only ever changed by Invoice submit/cancel.
 		updates = {
-			"invoiced_amount": total_invoiced,
 			"outstanding_amount": outstanding,
-			"invoice": latest_invoice,
 		}
 
 		if self.docstatus == 1:
@@ -1239,9 +1336,7 @@ class SalesOrder(Document):
 			self._ensure_loading_order()
 
 		frappe.db.set_value("Sales Order", self.name, updates, update_modified=False)
-		self.invoiced_amount = total_invoiced
 		self.outstanding_amount = outstanding
-		self.invoice = latest_invoice
 		if "gate_pass" in updates:
 			self.gate_pass = updates["gate_pass"]
 		if updates.get("status") == "Payment Verified":
@@ -1274,8 +1369,8 @@ class SalesOrder(Document):
 		is_cash = self.sales_type == "Cash"
 		outstanding = self.get_outstanding_amount()
 		total_gross = flt(self.total_gross_amount or self.total_amount or 0)
-		total_invoiced = flt(self._get_total_invoiced_amount() or 0)
-		remaining_gross = max(total_gross - total_invoiced, 0)
+		self._load_invoicing_counters()
+		remaining_gross = max(total_gross - flt(self.invoiced_amount), 0)
 
 		if is_cash and not self._has_verified_payments():
 			frappe.throw(_("Verify at least one payment slip before creating a cash invoice."))
@@ -1381,6 +1476,76 @@ class SalesOrder(Document):
 		frappe.throw(_("Gate Pass is auto-generated when the Loading Order is completed."))
 
 
+def get_for_invoicing_progress(sales_order):
+	"""Load a Sales Order with only the fields `update_invoicing_progress()` reads.
+
+	Invoice submit and cancel sync the order's progress; one parent read
+	and one narrow read per child table replace a full `get_doc`. The
+	result is for that sync only — never save it.
+	"""
+	values = frappe.db.get_value("Sales Order", sales_order, list(INVOICING_PROGRESS_FIELDS), as_dict=True)
+	if not values:
+		return None
+	meta = frappe.get_meta("Sales Order")
+	for fieldname, fields in INVOICING_PROGRESS_CHILD_FIELDS.items():
+		field = meta.get_field(fieldname)
+		if not field or field.fieldtype != "Table":
+			continue
+		values[fieldname] = frappe.get_all(
+			field.options,
+			filters={"parent": sales_order, "parenttype": "Sales Order", "parentfield": fieldname},
+			fields=["name", "idx", *fields],
+			order_by="idx",
+		)
+	return frappe.get_doc({"doctype": "Sales Order", **values})
+
+
+def record_invoice(sales_order, invoice, amount):
+	"""Count a submitted Invoice into its Sales Order's invoicing counters."""
+	frappe.db.sql(
+		"""
+		update `tabSales Order`
+		set invoiced_amount = coalesce(invoiced_amount, 0) + %(amount)s,
+			invoice_count = coalesce(invoice_count, 0) + 1,
+			invoice = %(invoice)s
+		where name = %(sales_order)s
+		""",
+		{"sales_order": sales_order, "invoice": invoice, "amount": flt(amount)},
+	)
+
+
+def remove_invoice(sales_order, invoice, amount):
+	"""Take a cancelled Invoice out of its Sales Order's invoicing counters."""
+	previous = frappe.db.sql(
+		"""
+		select name
+		from `tabInvoice`
+		where sales_order = %s and docstatus = 1 and name != %s
+		order by modified desc
+		limit 1
+		""",
+		(sales_order, invoice),
+	)
+	frappe.db.sql(
+		"""
+		update `tabSales Order`
+		set invoiced_amount = greatest(coalesce(invoiced_amount, 0) - %(amount)s, 0),
+			invoice_count = greatest(coalesce(invoice_count, 0) - 1, 0),
+			invoice = case
+				when invoice is null or invoice = %(invoice)s then %(previous)s
+				else invoice
+			end
+		where name = %(sales_order)s
+		""",
+		{
+			"sales_order": sales_order,
+			"invoice": invoice,
+			"amount": flt(amount),
+			"previous": previous[0][0] if previous else None,
+		},
+	)
+
+
 @frappe.whitelist()
 def create_sales_invoice(sales_order, amount=None):
 	so = frappe.get_doc("Sales Order", sales_order)
@@ -32,11 +32,14 @@ frappe.ui.form.on("Sales Order Status Update", {
 						to_date: frm.doc.to_date || "",
 						import_shipment: frm.doc.import_shipment_filter || "",
 						reason: frm.doc.reason || "",
+						background: frm.doc.run_in_background ? 1 : 0,
 					},
 					freeze: true,
 					freeze_message: __("Updating statuses..."),
 					callback(r) {
-						if (r && r.message) {
+						if (r && r.message && r.message.job_id) {
+							track_status_change_job(frm, r.message.job_id, r.message.total);
+						} else if (r && r.message) {
 							frm.trigger("load_preview");
 						}
 					},
@@ -110,3 +113,42 @@ frappe.ui.form.on("Sales Order Status Update", {
 function load_preview(frm) {
 	frm.trigger("load_preview");
 }
+
+function track_status_change_job(frm, job_id, total) {
+	const title = __("Updating Sales Order Statuses");
+	frappe.show_progress(title, 0, total, __("Queued"));
+
+	const poll = () => {
+		frappe.call({
+			method: "plasticflow.plasticflow.doctype.sales_order_status_update.sales_order_status_update.get_status_change_job",
+			args: { job_id },
+			callback(r) {
+				const job = (r && r.message) || {};
+				if (job.status === "Finished") {
+					frappe.hide_progress();
+					frappe.show_alert({
+						message: __("{0} Sales Order(s) updated to '{1}'.", [job.updated, job.new_status]),
+						indicator: "green",
+					});
+					frm.trigger("load_preview");
+				} else if (job.status === "Failed" || job.status === "Unknown") {
+					frappe.hide_progress();
+					frappe.msgprint({
+						title: __("Status Update Failed"),
+						message: __("{0} of {1} Sales Order(s) were updated before the job stopped.", [
+							job.updated || 0,
+							job.total || total,
+						]),
+						indicator: "red",
+					});
+					frm.trigger("load_preview");
+				} else {
+					frappe.show_progress(title, job.processed || 0, job.total || total,
+						__("{0} of {1} Sales Orders", [job.processed || 0, job.total || total]));
+					setTimeout(poll, 2000);
+				}
+			},
+		});
+	};
+	setTimeout(poll, 1000);
+}
@@ -1,6 +1,14 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint, get_fullname, now_datetime
+
+# Selections larger than this are always applied by a background job; the
+# `run_in_background` label in the doctype JSON quotes this number.
+BACKGROUND_THRESHOLD = 200
+CHUNK_SIZE = 500
+JOB_TIMEOUT = 60 * 60
+JOB_TTL = 24 * 60 * 60
 
 
 class SalesOrderStatusUpdate(Document):
@@ -53,33 +61,51 @@ def get_matching_orders(sales_type, current_status=None, customer=None,
 
 @frappe.whitelist()
 def apply_status_change(sales_type, new_status, current_status=None, customer=None,
-						from_date=None, to_date=None, import_shipment=None, reason=None):
-	"""Bulk update status on matching Sales Orders."""
+						from_date=None, to_date=None, import_shipment=None, reason=None, background=0):
+	"""Bulk update status on matching Sales Orders.
+
+	Small selections are applied in the request. With `background` set, or
+	above `BACKGROUND_THRESHOLD` orders, the change is queued and a job
+	handle for `get_status_change_job()` is returned instead.
+	"""
 	if not new_status:
 		frappe.throw(_("Please select a status to apply."))
 
-	orders = get_matching_orders(
-		sales_type=sales_type,
-		current_status=current_status,
-		customer=customer,
-		from_date=from_date,
-		to_date=to_date,
-		import_shipment=import_shipment,
-	)
-
+	filters = {
+		"sales_type": sales_type,
+		"current_status": current_status,
+		"customer": customer,
+		"from_date": from_date,
+		"to_date": to_date,
+		"import_shipment": import_shipment,
+	}
+	orders = get_matching_orders(**filters)
 	if not orders:
 		frappe.throw(_("No matching Sales Orders found."))
+	names = [order.name for order in orders if order.status != new_status]
+
+	if names and (cint(background) or len(names) > BACKGROUND_THRESHOLD):
+		job_id = frappe.generate_hash(length=10)
+		_set_job(
+			job_id,
+			{"status": "Queued", "total": len(names), "processed": 0, "updated": 0, "new_status": new_status},
+		)
+		frappe.enqueue(
+			run_status_change,
+			queue="long",
+			timeout=JOB_TIMEOUT,
+			job_id=f"plasticflow-sales-order-status-update-{job_id}",
+			enqueue_after_commit=True,
+			job=job_id,
+			filters=filters,
+			new_status=new_status,
+			reason=reason,
+		)
+		return {"job_id": job_id, "queued": True, "total": len(names)}
 
 	count = 0
-	for order in orders:
-		if order.status == new_status:
-			continue
-		frappe.db.set_value("Sales Order", order.name, "status", new_status, update_modified=False)
-		if reason:
-			frappe.get_doc("Sales Order", order.name).add_comment(
-				"Info", f"Status changed to {new_status}. Reason: {reason}"
-			)
-		count += 1
+	for chunk in _chunks(names):
+		count += _apply_chunk(chunk, new_status, reason)
 
 	frappe.db.commit()
 
@@ -90,3 +116,128 @@ def apply_status_change(sales_type, new_status, current_status=None, customer=No
 	)
 
 	return {"updated": count}
+
+
+def run_status_change(job, filters, new_status, reason=None):
+	"""Background job: apply a status change chunk by chunk, committing each."""
+	names = _pending_order_names(filters, new_status)
+	state = {"status": "Running", "total": len(names), "processed": 0, "updated": 0, "new_status": new_status}
+	_set_job(job, state)
+	try:
+		for chunk in _chunks(names):
+			state["updated"] += _apply_chunk(chunk, new_status, reason)
+			state["processed"] += len(chunk)
+			frappe.db.commit()
+			_set_job(job, state)
+			frappe.publish_progress(
+				state["processed"] * 100 / len(names),
+				title=_("Updating Sales Order Statuses"),
+				description=_("{0} of {1} Sales Orders").format(state["processed"], len(names)),
+			)
+	except Exception:
+		frappe.db.rollback()
+		_set_job(job, {**state, "status": "Failed", "error": frappe.get_traceback()})
+		frappe.log_error(title="Sales Order Status Update Failed")
+		raise
+
+	_set_job(job, {**state, "status": "Finished"})
+
+
+@frappe.whitelist()
+def get_status_change_job(job_id):
+	"""Progress of a queued status change: status, total, processed, updated.
+
+	Only the user who queued the change (or a System Manager) may read it.
+	"""
+	state = frappe.cache.get_value(_job_cache_key(job_id))
+	if not state:
+		return {"job_id": job_id, "status": "Unknown"}
+	if state.get("owner") != frappe.session.user and "System Manager" not in frappe.get_roles():
+		frappe.throw(_("You are not permitted to view this status change."), frappe.PermissionError)
+	return state
+
+
+def _pending_order_names(filters, new_status):
+	return [order.name for order in get_matching_orders(**filters) if order.status != new_status]
+
+
+def _chunks(names):
+	for start in range(0, len(names), CHUNK_SIZE):
+		yield names[start : start + CHUNK_SIZE]
+
+
+def _apply_chunk(names, new_status, reason):
+	"""One UPDATE for the chunk, then one bulk insert of the reason Comments."""
+	placeholders = ", ".join(["%s"] * len(names))
+	changed = frappe.db.sql_list(
+		f"""
+		select name from `tabSales Order`
+		where name in ({placeholders}) and docstatus = 1 and status != %s
+		for update
+		""",
+		(*names, new_status),
+	)
+	if not changed:
+		return 0
+
+	placeholders = ", ".join(["%s"] * len(changed))
+	frappe.db.sql(
+		f"""
+		update `tabSales Order`
+		set status = %s
+		where name in ({placeholders})
+		""",
+		(new_status, *changed),
+	)
+
+	if reason:
+		now = now_datetime()
+		user = frappe.session.user
+		full_name = get_fullname(user)
+		content = f"Status changed to {new_status}. Reason: {reason}"
+		frappe.db.bulk_insert(
+			"Comment",
+			fields=[
+				"name",
+				"creation",
+				"modified",
+				"modified_by",
+				"owner",
+				"comment_type",
+				"reference_doctype",
+				"reference_name",
+				"content",
+				"comment_email",
+				"comment_by",
+			],
+			values=[
+				(
+					frappe.generate_hash(length=10),
+					now,
+					now,
+					user,
+					user,
+					"Info",
+					"Sales Order",
+					name,
+					content,
+					user,
+					full_name,
+				)
+				for name in changed
+			],
+		)
+	return len(changed)
+
+
+def _job_cache_key(job_id):
+	return f"plasticflow_sales_order_status_update:{job_id}"
+
+
+def _set_job(job_id, state):
+	# The job runs as the user who queued it, so the owner stays the same.
+	frappe.cache.set_value(
+		_job_cache_key(job_id),
+		{"job_id": job_id, "owner": frappe.session.user, **state},
+		expires_in_sec=JOB_TTL,
+	)
@@ -33,7 +33,9 @@ class StockAdjustment(StockAdjustmentMixin, Document):
 		warehouse = self.warehouse if location_type == "Warehouse" else None
 		sign = -1 if reverse else 1
 
-		touched: dict[str, object] = {}
+		products = [item.product for item in self.items if item.product]
+		locked = self._lock_adjustment_batches(products, location_type, warehouse)
+		batches_by_product = self._get_adjustment_batches(products, location_type, warehouse, locked)
 
 		for item in self.items:
 			qty = flt(item.quantity or 0)
@@ -44,11 +46,9 @@ class StockAdjustment(StockAdjustmentMixin, Document):
 			self._apply_adjustment_line(
 				item.product,
 				qty_stock,
+				batches=batches_by_product[item.product],
 				stock_uom_name=stock_uom_name,
-				location_type=location_type,
-				warehouse=warehouse,
 				reverse=reverse,
-				touched=touched,
 			)
 
-		self._save_touched_batches(touched)
+		self._apply_batch_updates(location_type)
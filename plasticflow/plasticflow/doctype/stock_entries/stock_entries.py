@@ -2,7 +2,9 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import nowdate
 
+from plasticflow.stock import availability as stock_availability
 from plasticflow.stock import ledger as stock_ledger
+from plasticflow.stock import unit_of_work as stock_unit_of_work
 
 
 class StockEntries(Document):
@@ -96,10 +98,21 @@ class StockEntries(Document):
 		self._link_to_shipment()
 		stock_ledger.update_stock_entry_balances(self)
 
+	def before_update_after_submit(self):
+		# Keep the stored per-row `available_qty` authoritative on every save;
+		# the availability reader filters on it.
+		self._update_item_balances()
+		self._update_totals()
+
 	def on_update_after_submit(self):
 		self._link_to_shipment()
 		stock_ledger.update_stock_entry_balances(self)
 
+	def on_change(self):
+		# Saved outside the identity map: drop the in-request copy so it is reloaded.
+		stock_unit_of_work.evict([self.name])
+		stock_availability.invalidate({item.product for item in self.items if item.product})
+
 	def on_cancel(self):
 		stock_ledger.clear_stock_entry(self)
 		if self.import_shipment and frappe.db.exists("Import Shipment", self.import_shipment):
@@ -149,3 +162,10 @@ class StockEntries(Document):
 			return None
 		suffix = value[len(prefix) :]
 		return int(suffix) if suffix.isdigit() else None
+
+
+def on_doctype_update():
+	# Warehouse availability filters on warehouse plus the status set; the
+	# customs rollup groups a shipment's entries by status.
+	frappe.db.add_index("Stock Entries", ["warehouse", "status"], "warehouse_status_index")
+	frappe.db.add_index("Stock Entries", ["import_shipment", "status"], "import_shipment_status_index")
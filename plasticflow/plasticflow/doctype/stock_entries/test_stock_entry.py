@@ -1,9 +1,11 @@
 # Copyright (c) 2025, VuleroTech and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
 
+from plasticflow.stock import reservation as stock_reservation
+from plasticflow.tests.utils import insert_stock_entry
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -11,6 +13,8 @@ from frappe.tests import IntegrationTestCase
 EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
+ENTRY = "_Test Reservation Entry"
+ITEM = f"{ENTRY}-BATCH-001"
 
 
 class IntegrationTestStockEntries(IntegrationTestCase):
@@ -19,4 +23,57 @@ class IntegrationTestStockEntries(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def setUp(self):
+		_insert_entry(received=1)
+
+	def test_last_unit_is_reserved_once(self):
+		self.assertEqual(stock_reservation.reserve([{"child_name": ITEM, "qty": 1}]), [True])
+		self.assertEqual(stock_reservation.reserve([{"child_name": ITEM, "qty": 1}]), [False])
+		stock_reservation.refresh_entry_totals([ENTRY])
+
+		self.assertEntry(reserved=1, issued=0, available=0, status="Reserved")
+
+	def test_competing_rows_in_one_call(self):
+		rows = [{"child_name": ITEM, "qty": 1}, {"child_name": ITEM, "qty": 1}]
+		self.assertEqual(stock_reservation.reserve(rows), [True, False])
+
+	def test_release_restores_availability(self):
+		stock_reservation.reserve([{"child_name": ITEM, "qty": 1}])
+		self.assertEqual(stock_reservation.release([{"child_name": ITEM, "qty": 1}]), [True])
+		# Releasing what is no longer reserved is a no-op, not a failure.
+		self.assertEqual(stock_reservation.release([{"child_name": ITEM, "qty": 1}]), [True])
+		stock_reservation.refresh_entry_totals([ENTRY])
+
+		self.assertEntry(reserved=0, issued=0, available=1, status="Available")
+
+	def test_issue_depletes_entry(self):
+		stock_reservation.reserve([{"child_name": ITEM, "qty": 1}])
+		self.assertEqual(stock_reservation.issue([{"child_name": ITEM, "qty": 1}]), [True])
+		stock_reservation.refresh_entry_totals([ENTRY])
+
+		self.assertEntry(reserved=0, issued=1, available=0, status="Depleted")
+
+	def assertEntry(self, *, reserved, issued, available, status):
+		entry = frappe.db.get_value(
+			"Stock Entries",
+			ENTRY,
+			["total_received_qty", "total_reserved_qty", "total_issued_qty", "available_qty", "status"],
+			as_dict=True,
+		)
+		self.assertEqual(
+			(entry.total_received_qty, entry.total_reserved_qty, entry.total_issued_qty, entry.available_qty),
+			(1, reserved, issued, available),
+		)
+		self.assertEqual(entry.status, status)
+		item = frappe.db.get_value(
+			"Stock Entry Items", ITEM, ["reserved_qty", "issued_qty", "available_qty"], as_dict=True
+		)
+		self.assertEqual(
+			(item.reserved_qty, item.issued_qty, item.available_qty), (reserved, issued, available)
+		)
+
+
+def _insert_entry(*, received):
+	insert_stock_entry(
+		ENTRY, [{"received_qty": received}], total_received_qty=received, available_qty=received
+	)
@@ -1,3 +1,4 @@
+import frappe
 from frappe.model.document import Document
 
 
@@ -5,3 +6,10 @@ class StockEntryItems(Document):
 	"""Child table tracking per-product quantities inside a batch."""
 
 	pass
+
+
+def on_doctype_update():
+	# Availability reads filter on product and the stored available_qty;
+	# per-entry rollups group a parent's rows by product.
+	frappe.db.add_index("Stock Entry Items", ["product", "available_qty"], "product_available_qty_index")
+	frappe.db.add_index("Stock Entry Items", ["parent", "product"], "parent_product_index")
@@ -0,0 +1,7 @@
+from frappe.model.document import Document
+
+
+class StockLedgerDriftLog(Document):
+	"""One run of the scheduled Stock Ledger Entry drift check."""
+
+	pass
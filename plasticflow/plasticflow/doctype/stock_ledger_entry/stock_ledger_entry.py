@@ -1,7 +1,28 @@
+import frappe
 from frappe.model.document import Document
 
+from plasticflow.stock import ledger as stock_ledger
+
 
 class StockLedgerEntry(Document):
 	"""Represents aggregated stock availability per product and location."""
 
-	pass
+	def validate(self):
+		self.slot_key = stock_ledger.slot_key(
+			self.product,
+			self.location_type,
+			self.location_reference,
+			self.warehouse,
+			self.import_shipment,
+		)
+
+
+def on_doctype_update():
+	# Slot lookups by (product, location) in Sales Order and the reports,
+	# and the per-shipment reads in queries.get_fifo_import_shipments.
+	frappe.db.add_index(
+		"Stock Ledger Entry", ["product", "location_type", "location_reference"], "product_location_index"
+	)
+	frappe.db.add_index(
+		"Stock Ledger Entry", ["import_shipment", "location_type"], "import_shipment_location_index"
+	)
@@ -1,9 +1,15 @@
 # Copyright (c) 2026, VuleroTech and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, now_datetime
 
+from plasticflow.patches.post_model_sync import add_stock_ledger_slot_key
+from plasticflow.stock import ledger as stock_ledger
+from plasticflow.tests.utils import insert_rows
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -11,6 +17,9 @@ from frappe.tests import IntegrationTestCase
 EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
+PRODUCT = "_Test SLE Product"
+ENTRY = "_Test SLE Entry"
+WAREHOUSE = "_Test SLE Warehouse"
 
 
 class IntegrationTestStockLedgerEntry(IntegrationTestCase):
@@ -19,4 +28,55 @@ class IntegrationTestStockLedgerEntry(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def test_repeat_write_updates_the_slot_row(self):
+		first = stock_ledger.set_balances(PRODUCT, "Warehouse", ENTRY, available=10, warehouse=WAREHOUSE)
+		second = stock_ledger.apply_delta(
+			PRODUCT, "Warehouse", ENTRY, available_delta=-4, reserved_delta=4, warehouse=WAREHOUSE
+		)
+
+		self.assertEqual(first.name, second.name)
+		rows = _slot_rows()
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0].name, first.name)
+		self.assertEqual((rows[0].available_qty, rows[0].reserved_qty), (6, 4))
+
+	def test_patch_merges_duplicate_slots(self):
+		now = now_datetime()
+		names = [_insert_legacy_row(add_days(now, -offset), available=offset) for offset in (3, 1, 2)]
+
+		with patch.object(frappe.db, "commit"):
+			add_stock_ledger_slot_key.execute()
+
+		rows = _slot_rows()
+		self.assertEqual([row.name for row in rows], [names[1]])
+		self.assertEqual(rows[0].available_qty, 1)
+		self.assertEqual(
+			rows[0].slot_key, stock_ledger.slot_key(PRODUCT, "Warehouse", ENTRY, WAREHOUSE, None)
+		)
+
+
+def _slot_rows():
+	return frappe.get_all(
+		"Stock Ledger Entry",
+		filters={"product": PRODUCT, "location_type": "Warehouse", "location_reference": ENTRY},
+		fields=["name", "slot_key", "available_qty", "reserved_qty"],
+	)
+
+
+def _insert_legacy_row(last_movement, *, available):
+	"""A pre-`slot_key` duplicate: same slot fields, placeholder key."""
+	return insert_rows(
+		"Stock Ledger Entry",
+		[
+			{
+				"creation": last_movement,
+				"slot_key": frappe.generate_hash(length=40),
+				"product": PRODUCT,
+				"location_type": "Warehouse",
+				"location_reference": ENTRY,
+				"warehouse": WAREHOUSE,
+				"available_qty": available,
+				"last_movement": last_movement,
+			}
+		],
+	)[0]
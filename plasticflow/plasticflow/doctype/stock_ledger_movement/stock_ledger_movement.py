@@ -1,5 +1,18 @@
+import frappe
 from frappe.model.document import Document
 
 
 class StockLedgerMovement(Document):
 	pass
+
+
+def on_doctype_update():
+	# The Stock Balance "as of" path sums movements per product before a
+	# date, optionally for one shipment or warehouse.
+	frappe.db.add_index("Stock Ledger Movement", ["product", "movement_datetime"], "product_movement_index")
+	frappe.db.add_index(
+		"Stock Ledger Movement", ["import_shipment", "movement_datetime"], "import_shipment_movement_index"
+	)
+	frappe.db.add_index(
+		"Stock Ledger Movement", ["warehouse", "movement_datetime"], "warehouse_movement_index"
+	)
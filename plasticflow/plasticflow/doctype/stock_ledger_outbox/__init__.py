@@ -0,0 +1 @@
+# Stock Ledger Outbox DocType package
@@ -0,0 +1,7 @@
+from frappe.model.document import Document
+
+
+class StockLedgerOutbox(Document):
+	"""A Stock Entries/product pair whose ledger slots await recomputation."""
+
+	pass
@@ -0,0 +1,58 @@
+# Copyright (c) 2026, VuleroTech and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from plasticflow.stock import outbox as stock_outbox
+from plasticflow.tests.utils import insert_stock_entry
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+ENTRY = "_Test Outbox Entry"
+PRODUCT = "_Test Outbox Product"
+WAREHOUSE = "_Test Outbox Warehouse"
+
+
+class IntegrationTestStockLedgerOutbox(IntegrationTestCase):
+	"""
+	Integration tests for StockLedgerOutbox.
+	Use this class for testing interactions between multiple components.
+	"""
+
+	def test_process_drains_deferred_entry(self):
+		_insert_entry(received=12)
+		entry = frappe._dict(name=ENTRY, import_shipment=None, items=[frappe._dict(product=PRODUCT)])
+
+		with patch.dict(frappe.conf, {stock_outbox.MODE_KEY: stock_outbox.OUTBOX_MODE}):
+			self.assertTrue(stock_outbox.defer_entry(entry))
+		self.assertEqual(_pending(), 1)
+		self.assertFalse(frappe.db.exists("Stock Ledger Entry", {"stock_entry": ENTRY}))
+
+		# `process` commits per batch; keep the test inside its transaction.
+		with patch.object(frappe.db, "commit"):
+			self.assertEqual(stock_outbox.process(), 1)
+
+		self.assertEqual(_pending(), 0)
+		self.assertEqual(
+			frappe.db.get_value(
+				"Stock Ledger Entry",
+				{"stock_entry": ENTRY, "product": PRODUCT, "location_type": "Warehouse"},
+				"available_qty",
+			),
+			12,
+		)
+
+
+def _pending():
+	return frappe.db.count(stock_outbox.OUTBOX_DOCTYPE, {"stock_entry": ENTRY})
+
+
+def _insert_entry(*, received):
+	insert_stock_entry(ENTRY, [{"product": PRODUCT, "received_qty": received}], warehouse=WAREHOUSE)
@@ -50,9 +50,24 @@ function fetch_current_qty(frm, cdt, cdn) {
 }
 
 function refresh_all_current_quantities(frm) {
-	(frm.doc.items || []).forEach((item) => {
-		if (item.product) {
-			fetch_current_qty(frm, item.doctype, item.name);
-		}
+	const items = (frm.doc.items || []).filter((item) => item.product);
+	if (!items.length) return;
+
+	frappe.call({
+		method: "plasticflow.plasticflow.doctype.stock_reconciliation.stock_reconciliation.get_current_stock_bulk",
+		args: {
+			products: [...new Set(items.map((item) => item.product))],
+			location_type: frm.doc.location_type || "Warehouse",
+			warehouse: frm.doc.warehouse || "",
+		},
+		callback(r) {
+			if (!r || !r.message) return;
+			items.forEach((item) => {
+				const current = flt(r.message[item.product]);
+				frappe.model.set_value(item.doctype, item.name, "current_qty", current);
+				frappe.model.set_value(item.doctype, item.name, "difference",
+					flt(item.target_qty) - current);
+			});
+		},
 	});
 }
@@ -59,10 +59,13 @@ class StockReconciliation(StockAdjustmentMixin, Document):
 		location_type = self.location_type or "Warehouse"
 		warehouse = self.warehouse if location_type == "Warehouse" else None
 
+		batches_by_product = self._get_adjustment_batches(
+			[item.product for item in self.items if item.product], location_type, warehouse
+		)
 		for item in self.items:
 			if not item.product:
 				continue
-			batches = self._get_adjustment_batches(item.product, location_type, warehouse)
+			batches = batches_by_product[item.product]
 			item.current_qty = sum(flt(b.available_qty) for b in batches)
 			item.difference = flt(item.target_qty) - flt(item.current_qty)
 
@@ -70,7 +73,9 @@ class StockReconciliation(StockAdjustmentMixin, Document):
 		location_type = self.location_type or "Warehouse"
 		warehouse = self.warehouse if location_type == "Warehouse" else None
 		sign = -1 if reverse else 1
-		touched: dict[str, object] = {}
+		products = [item.product for item in self.items if item.product]
+		locked = self._lock_adjustment_batches(products, location_type, warehouse)
+		batches_by_product = self._get_adjustment_batches(products, location_type, warehouse, locked)
 
 		for item in self.items:
 			diff = flt(item.difference)
@@ -81,21 +86,29 @@ class StockReconciliation(StockAdjustmentMixin, Document):
 			self._apply_adjustment_line(
 				item.product,
 				qty_stock,
+				batches=batches_by_product[item.product],
 				stock_uom_name=stock_uom_name,
-				location_type=location_type,
-				warehouse=warehouse,
 				reverse=reverse,
-				touched=touched,
 			)
 
-		self._save_touched_batches(touched)
+		self._apply_batch_updates(location_type)
 
 
 @frappe.whitelist()
 def get_current_stock(product, location_type="Warehouse", warehouse=None):
 	"""Return total available_qty for a product at the given location."""
-	return stock_availability.get_available_quantity(
+	return stock_availability.get_cached_available_quantity(
 		product,
 		location_type=location_type,
 		warehouse=warehouse,
 	)
+
+
+@frappe.whitelist()
+def get_current_stock_bulk(products, location_type="Warehouse", warehouse=None):
+	"""Return ``{product: available_qty}`` for several products in one call."""
+	return stock_availability.get_cached_available_quantities(
+		frappe.parse_json(products) if isinstance(products, str) else products,
+		location_type=location_type,
+		warehouse=warehouse,
+	)
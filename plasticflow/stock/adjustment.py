@@ -4,6 +4,7 @@ from frappe.utils import flt
 
 from plasticflow.stock import availability as stock_availability
 from plasticflow.stock import ledger as stock_ledger
+from plasticflow.stock import reservation as stock_reservation
 from plasticflow.stock import uom as stock_uom
 
 QTY_TOLERANCE = 0.0001
@@ -17,13 +18,10 @@ class StockAdjustmentMixin:
 		product,
 		qty_stock,
 		*,
+		batches,
 		stock_uom_name,
-		location_type,
-		warehouse,
 		reverse,
-		touched,
 	):
-		batches = self._get_adjustment_batches(product, location_type, warehouse)
 		if not batches:
 			frappe.throw(
 				_("No stock entry items found for {0}.").format(product)
@@ -39,7 +37,7 @@ class StockAdjustmentMixin:
 				apply_qty = remaining if capacity is None else min(capacity, remaining)
 				if apply_qty <= 0:
 					continue
-				self._update_batch_item(batch, apply_qty, touched)
+				self._update_batch_item(batch, apply_qty)
 				remaining -= apply_qty
 				if remaining <= QTY_TOLERANCE:
 					return
@@ -57,7 +55,7 @@ class StockAdjustmentMixin:
 			if available <= 0:
 				continue
 			reduce = min(available, remaining)
-			self._update_batch_item(batch, -reduce, touched)
+			self._update_batch_item(batch, -reduce)
 			remaining -= reduce
 			if remaining <= QTY_TOLERANCE:
 				return
@@ -80,35 +78,58 @@ class StockAdjustmentMixin:
 		received_stock = stock_uom.convert_quantity(batch.get("received_qty") or 0, item_uom, stock_uom_name)
 		return max(flt(original_stock) - flt(received_stock), 0)
 
-	def _update_batch_item(self, batch, delta_qty, touched):
-		batch_doc = touched.get(batch.batch_name)
-		if not batch_doc:
-			batch_doc = frappe.get_doc("Stock Entries", batch.batch_name)
-			touched[batch.batch_name] = batch_doc
-		child = next((row for row in batch_doc.items if row.name == batch.child_name), None)
-		if not child:
-			frappe.throw(_("Stock Entry Item {0} not found in {1}.").format(batch.child_name, batch.batch_name))
-		child.received_qty = max(flt(child.received_qty or 0) + flt(delta_qty or 0), 0)
+	def _update_batch_item(self, batch, delta_qty):
+		# Queued for `_apply_batch_updates`; the walked row is kept in step
+		# so later lines of the document see the change.
+		batch.received_qty = max(flt(batch.received_qty or 0) + flt(delta_qty or 0), 0)
+		batch.available_qty = flt(batch.available_qty or 0) + flt(delta_qty or 0)
+		if not hasattr(self, "_batch_deltas"):
+			self._batch_deltas = []
+		self._batch_deltas.append({"child_name": batch.child_name, "qty": flt(delta_qty or 0)})
 
-	def _get_adjustment_batches(self, product, location_type, warehouse):
+	def _lock_adjustment_batches(self, products, location_type, warehouse):
+		# Lock every batch row the adjustment may touch up front, in the
+		# shared canonical order, before any quantities are read. The
+		# locked rows carry the current quantities.
+		return stock_availability.lock_candidate_batches(
+			products, location_type=location_type, warehouse=warehouse
+		)
+
+	def _get_adjustment_batches(self, products, location_type, warehouse, locked=None):
 		# Adjustment tools need every in-status batch, including ones with
 		# zero available stock — they may still have headroom against the
-		# Import Shipment master quantity that we can top up into.
-		return stock_availability.get_available_batches(
-			product,
+		# Import Shipment master quantity that we can top up into. One
+		# query for every product of the document: {product: FIFO list}.
+		# With `locked`, quantities come from the locked rows rather than
+		# the (possibly stale) snapshot read.
+		batches_by_product = stock_availability.get_available_batches_bulk(
+			products,
 			location_type=location_type,
 			warehouse=warehouse,
 			fifo=True,
 			include_zero=True,
 		)
+		if locked is None:
+			return batches_by_product
+		return stock_availability.apply_locked_quantities(batches_by_product, locked, include_zero=True)
 
-	def _save_touched_batches(self, touched):
-		for batch_doc in touched.values():
-			batch_doc.flags.ignore_validate_update_after_submit = True
-			for row in batch_doc.items:
-				row.flags.ignore_validate_update_after_submit = True
-			batch_doc._update_item_balances()
-			batch_doc._update_totals()
-			batch_doc._set_status()
-			batch_doc.save(ignore_permissions=True)
-			stock_ledger.update_stock_entry_balances(batch_doc)
+	def _apply_batch_updates(self, location_type):
+		# Relative UPDATEs on the locked rows, never a save of a parent
+		# loaded from a snapshot: that would write stale reserved/issued
+		# quantities back over another order's committed change. Then the
+		# same totals refresh and per-row ledger sync as Delivery Note.
+		rows = getattr(self, "_batch_deltas", None) or []
+		self._batch_deltas = []
+		if not rows:
+			return
+		stock_reservation.receive(rows)
+		children = stock_reservation.get_items(row["child_name"] for row in rows)
+		stock_reservation.refresh_entry_totals(child.parent for child in children.values())
+		remarks = f"Adjusted via {self.doctype} {self.name}"
+		for row in rows:
+			child = children.get(row["child_name"])
+			if not child:
+				frappe.throw(_("Stock Entry Item {0} not found.").format(row["child_name"]))
+			stock_ledger.adjust_received(
+				child, row["qty"], from_customs=location_type == "Customs", remarks=remarks
+			)
@@ -0,0 +1,195 @@
+"""In-memory FIFO allocation.
+
+`walk()` is the allocator behind Sales Order reservations: every line
+takes its product's batches from the primary shipment first, then from
+any other shipment, each in the order of the product's allocation
+policy (see `stock.fifo`). It touches no database state, so
+`plan_allocation()` can run the same walk as a dry run for a sales cart
+before an order exists.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from plasticflow.stock import availability as stock_availability
+from plasticflow.stock import fifo as stock_fifo
+from plasticflow.stock import uom as stock_uom
+
+QTY_TOLERANCE = 0.0001
+
+
+def walk(lines, batches_by_product, *, primary_shipment=None, policies=None):
+	"""Allocate `lines` against `batches_by_product` without writing anything.
+
+	`lines` are dicts with `key`, `product` and `qty` (stock UOM);
+	`batches_by_product` is the `get_available_batches_bulk()` result in
+	FIFO order; `policies` maps products to a `stock.fifo` policy (FIFO
+	when missing). Batch availability is drawn down as lines consume it,
+	so two lines of one product never claim the same quantity. Without a
+	primary shipment every batch is taken in policy order.
+
+	Returns `allocations` (key, product, batch, qty), `shortfalls` (key,
+	product, required, short), and the `alternate_shipments` used with
+	`alternate_allocations` summed per product.
+	"""
+	remaining: dict[str, float] = {}
+	result = frappe._dict(allocations=[], shortfalls=[], alternate_shipments=[], alternate_allocations={})
+
+	for line in lines:
+		product = line.get("product")
+		required = flt(line.get("qty") or 0)
+		if not product or required <= 0:
+			continue
+
+		policy = (policies or {}).get(product) or stock_fifo.FIFO
+		for batch in _candidates(batches_by_product.get(product) or [], primary_shipment, policy):
+			if required <= QTY_TOLERANCE:
+				break
+			available = remaining.setdefault(batch.child_name, flt(batch.available_qty or 0))
+			if available <= 0:
+				continue
+			qty = min(required, available)
+			remaining[batch.child_name] = available - qty
+			required -= qty
+			result.allocations.append(
+				frappe._dict(key=line.get("key"), product=product, batch=batch, qty=qty)
+			)
+			if primary_shipment and batch.import_shipment != primary_shipment:
+				if batch.import_shipment not in result.alternate_shipments:
+					result.alternate_shipments.append(batch.import_shipment)
+				result.alternate_allocations[product] = result.alternate_allocations.get(product, 0) + qty
+
+		if required > QTY_TOLERANCE:
+			result.shortfalls.append(
+				frappe._dict(
+					key=line.get("key"), product=product, required=flt(line.get("qty")), short=required
+				)
+			)
+
+	return result
+
+
+def _candidates(batches, primary_shipment, policy):
+	batches = stock_fifo.order_batches(batches, policy)
+	if not primary_shipment:
+		return batches
+	primary = [batch for batch in batches if batch.import_shipment == primary_shipment]
+	if policy == stock_fifo.SHIPMENT_PINNED:
+		return primary
+	fallback = [
+		batch for batch in batches if batch.import_shipment and batch.import_shipment != primary_shipment
+	]
+	return primary + fallback
+
+
+@frappe.whitelist()
+def plan_allocation(items, delivery_source="Warehouse", import_shipment=None, warehouse=None) -> dict:
+	"""Dry-run the Sales Order allocation for a cart.
+
+	`items` is a list (or JSON list) of `{product, quantity, uom, warehouse}`.
+	One Product lookup and one bulk availability read answer the whole
+	cart; nothing is reserved.
+	"""
+	frappe.has_permission("Sales Order", "create", throw=True)
+	if isinstance(items, str):
+		items = json.loads(items)
+	items = [frappe._dict(item) for item in items or [] if item and item.get("product")]
+
+	location_type = "Customs" if delivery_source == "Direct from Customs" else "Warehouse"
+	if location_type == "Warehouse":
+		warehouse = warehouse or next((item.warehouse for item in items if item.get("warehouse")), None)
+	else:
+		warehouse = None
+
+	products = list(dict.fromkeys(item.product for item in items))
+	stock_uoms = {}
+	if products:
+		stock_uoms = dict(
+			frappe.get_all(
+				"Product", filters={"name": ("in", products)}, fields=["name", "uom"], as_list=True
+			)
+		)
+
+	lines = []
+	for index, item in enumerate(items):
+		stock_uom_name = stock_uoms.get(item.product) or item.uom
+		lines.append(
+			{
+				"key": index,
+				"product": item.product,
+				"qty": stock_uom.convert_quantity(item.quantity, item.uom or stock_uom_name, stock_uom_name),
+				"uom": stock_uom_name,
+			}
+		)
+
+	batches_by_product = (
+		stock_availability.get_available_batches_bulk(
+			products, location_type=location_type, warehouse=warehouse, fifo=True
+		)
+		if products
+		else {}
+	)
+	plan = walk(
+		lines,
+		batches_by_product,
+		primary_shipment=import_shipment,
+		policies=stock_fifo.get_policies(products, warehouse),
+	)
+
+	allocations_by_line: dict[int, list] = {}
+	for allocation in plan.allocations:
+		batch = allocation.batch
+		allocations_by_line.setdefault(allocation.key, []).append(
+			{
+				"import_shipment": batch.import_shipment,
+				"import_shipment_item": batch.import_shipment_item,
+				"stock_entry": batch.batch_name,
+				"stock_entry_item": batch.child_name,
+				"arrival_date": batch.arrival_marker,
+				"expiry_date": batch.expiry_date,
+				"qty": allocation.qty,
+				"uom": batch.uom,
+			}
+		)
+	shortfalls_by_line = {shortfall.key: shortfall.short for shortfall in plan.shortfalls}
+
+	result_lines = []
+	for line in lines:
+		allocations = allocations_by_line.get(line["key"], [])
+		result_lines.append(
+			{
+				"idx": line["key"] + 1,
+				"product": line["product"],
+				"required_qty": line["qty"],
+				"allocated_qty": sum(allocation["qty"] for allocation in allocations),
+				"short_qty": shortfalls_by_line.get(line["key"], 0),
+				"uom": line["uom"],
+				"allocations": allocations,
+			}
+		)
+
+	return {
+		"location_type": location_type,
+		"warehouse": warehouse,
+		"import_shipment": import_shipment,
+		"policies": stock_fifo.get_policies(products, warehouse),
+		"fulfillable": not plan.shortfalls,
+		"lines": result_lines,
+		"alternate_shipments": plan.alternate_shipments,
+		"alternate_allocations": plan.alternate_allocations,
+		"shortfalls": [
+			{
+				"idx": shortfall.key + 1,
+				"product": shortfall.product,
+				"required_qty": shortfall.required,
+				"short_qty": shortfall.short,
+				"message": _("Insufficient stock for {0}. Short by {1} units.").format(
+					shortfall.product, f"{shortfall.short:.3f}"
+				),
+			}
+			for shortfall in plan.shortfalls
+		],
+	}
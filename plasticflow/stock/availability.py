@@ -8,6 +8,19 @@ identical everywhere.
 
 The truth lives in `Stock Entry Items`. `Stock Ledger Entry` is treated as
 a derived cache only.
+
+`get_available_batches()` results are memoised per transaction: one Sales
+Order submit asks for the same product many times (validation, the FIFO
+walk in `before_submit` and again in `on_submit`). The stock writers call
+`invalidate()` / `invalidate_items()` for the products they change, and
+the cache is dropped on every commit and rollback.
+
+`get_cached_available_quantity()` / `get_cached_available_quantities()`
+answer aggregate quantities from a shared Redis cache instead. Entries
+are keyed by (product, location_type, warehouse) under the product's
+version counter, which `invalidate()` bumps once the writing transaction
+commits — a reader never gets a quantity older than the last committed
+write, and stale entries simply expire.
 """
 
 from __future__ import annotations
@@ -15,8 +28,13 @@ from __future__ import annotations
 import frappe
 from frappe.utils import flt
 
+from plasticflow.stock import ledger as stock_ledger
+
 QTY_TOLERANCE = 0.0001
 
+SHARED_CACHE_PREFIX = "plasticflow:stock_availability"
+SHARED_CACHE_TTL = 6 * 60 * 60
+
 WAREHOUSE_STATUSES: tuple[str, ...] = (
 	"Available",
 	"Reserved",
@@ -32,6 +50,123 @@ def _status_set(location_type: str) -> tuple[str, ...]:
 	return WAREHOUSE_STATUSES
 
 
+_cache_stats = {"hits": 0, "misses": 0, "shared_hits": 0, "shared_misses": 0}
+
+
+def _cache(create=True):
+	"""`{product: {argument tuple: rows}}` for the current transaction."""
+	cache = getattr(frappe.local, "stock_availability_cache", None)
+	if cache is None and create:
+		cache = frappe.local.stock_availability_cache = {}
+		frappe.db.after_commit.add(clear_cache)
+		frappe.db.after_rollback.add(clear_cache)
+	return cache
+
+
+def clear_cache():
+	frappe.local.stock_availability_cache = None
+
+
+def invalidate(products=None):
+	"""Drop memoised availability for `products` (every product when None).
+
+	The transaction's own cache is cleared now; the shared cache version of
+	those products is bumped after commit.
+	"""
+	_queue_version_bump(products)
+	cache = _cache(create=False)
+	if not cache:
+		return
+	if products is None:
+		cache.clear()
+		return
+	for product in products:
+		cache.pop(product, None)
+
+
+def invalidate_items(child_names):
+	"""Drop memoised availability for the products of these `Stock Entry Items` rows."""
+	child_names = sorted({name for name in child_names or [] if name})
+	if not child_names:
+		return
+	invalidate(
+		frappe.db.sql_list(
+			f"""
+			select distinct product from `tabStock Entry Items`
+			where name in ({", ".join(["%s"] * len(child_names))})
+			""",
+			tuple(child_names),
+		)
+	)
+
+
+def get_cache_stats(*, reset=False):
+	"""Return this process's availability cache hit/miss counters.
+
+	`hits` / `misses` count per-transaction `get_available_batches` lookups,
+	`shared_hits` / `shared_misses` count products answered from Redis.
+	"""
+	stats = dict(_cache_stats)
+	if reset:
+		_cache_stats.update(dict.fromkeys(_cache_stats, 0))
+	return stats
+
+
+def _pending_bumps(create=True):
+	"""Products written by the current transaction, bumped in the shared cache on commit."""
+	pending = getattr(frappe.local, "stock_availability_bumps", None)
+	if pending is None and create:
+		pending = frappe.local.stock_availability_bumps = frappe._dict(products=set(), everything=False)
+		frappe.db.after_commit.add(_apply_version_bumps)
+		frappe.db.after_rollback.add(_discard_version_bumps)
+	return pending
+
+
+def _queue_version_bump(products):
+	pending = _pending_bumps()
+	if products is None:
+		pending.everything = True
+	else:
+		pending.products.update(product for product in products if product)
+
+
+def _apply_version_bumps():
+	pending = _pending_bumps(create=False)
+	_discard_version_bumps()
+	if pending:
+		bump_shared_versions(None if pending.everything else pending.products)
+
+
+def _discard_version_bumps():
+	frappe.local.stock_availability_bumps = None
+
+
+def bump_shared_versions(products=None):
+	"""Invalidate shared cache entries of `products` (every product when None) right away."""
+	if products is None:
+		frappe.cache.incr(_version_key(None))
+		return
+	products = sorted({product for product in products if product})
+	if not products:
+		return
+	pipe = frappe.cache.pipeline()
+	for product in products:
+		pipe.incr(_version_key(product))
+	pipe.execute()
+
+
+def _version_key(product):
+	if product is None:
+		return frappe.cache.make_key(f"{SHARED_CACHE_PREFIX}:epoch")
+	return frappe.cache.make_key(f"{SHARED_CACHE_PREFIX}:version:{product}")
+
+
+def _quantity_key(product, epoch, version, location_type, warehouse):
+	return frappe.cache.make_key(
+		f"{SHARED_CACHE_PREFIX}:qty:{epoch}:{version}:{product}:{location_type}:{warehouse or ''}"
+	)
+
+
 def get_available_batches(
 	product: str,
 	*,
@@ -54,16 +189,91 @@ def get_available_batches(
 	for_release=True surfaces batches that hold reserved_qty > 0 (used when
 	releasing a reservation). Otherwise the rows returned have available
 	stock to consume.
+
+	Memoised per transaction on the full argument tuple; callers get their
+	own copies of the rows.
 	"""
 	if not product:
 		return []
-	if not frappe.db.table_exists("Stock Entries") or not frappe.db.table_exists(
+	return get_available_batches_bulk(
+		[product],
+		location_type=location_type,
+		warehouse=warehouse,
+		import_shipment=import_shipment,
+		import_shipments=import_shipments,
+		exclude_import_shipment=exclude_import_shipment,
+		fifo=fifo,
+		for_release=for_release,
+		include_zero=include_zero,
+	)[product]
+
+
+def get_available_batches_bulk(
+	products,
+	*,
+	location_type: str = "Warehouse",
+	warehouse: str | None = None,
+	import_shipment: str | None = None,
+	import_shipments: list[str] | None = None,
+	exclude_import_shipment: str | None = None,
+	fifo: bool = True,
+	for_release: bool = False,
+	include_zero: bool = False,
+) -> dict:
+	"""`get_available_batches()` for many products: ``{product: FIFO list}``.
+
+	Products not already memoised are fetched together in one ordered
+	query; every requested product gets a key, empty when it has no
+	batches.
+	"""
+	products = sorted({product for product in products or [] if product})
+	key = (
+		location_type,
+		warehouse,
+		import_shipment,
+		tuple(import_shipments) if import_shipments else None,
+		exclude_import_shipment,
+		fifo,
+		for_release,
+		include_zero,
+	)
+	cache = _cache()
+	missing = [product for product in products if key not in cache.get(product, {})]
+	_cache_stats["hits"] += len(products) - len(missing)
+	_cache_stats["misses"] += len(missing)
+	if missing:
+		fetched = _query_available_batches(missing, *key)
+		for product in missing:
+			cache.setdefault(product, {})[key] = fetched.get(product, [])
+	return {product: [frappe._dict(row) for row in cache[product][key]] for product in products}
+
+
+def _query_available_batches(
+	products,
+	location_type,
+	warehouse,
+	import_shipment,
+	import_shipments,
+	exclude_import_shipment,
+	fifo,
+	for_release,
+	include_zero,
+	*,
+	lock: bool = False,
+) -> dict:
+	if not stock_ledger.table_exists("Stock Entries") or not stock_ledger.table_exists(
 		"Stock Entry Items"
 	):
-		return []
+		return {}
 
-	conditions: list[str] = ["se.docstatus = 1", "sei.product = %s"]
-	values: list = [product]
+	conditions: list[str] = ["se.docstatus = 1"]
+	values: list = []
+
+	if len(products) == 1:
+		conditions.append("sei.product = %s")
+	else:
+		conditions.append(f"sei.product in ({', '.join(['%s'] * len(products))})")
+	values.extend(products)
 
 	statuses = _status_set(location_type)
 	placeholders = ", ".join(["%s"] * len(statuses))
@@ -89,20 +299,21 @@ def get_available_batches(
 		if for_release:
 			conditions.append("coalesce(sei.reserved_qty, 0) > 0")
 		else:
-			conditions.append(
-				"(coalesce(sei.received_qty, 0) - coalesce(sei.reserved_qty, 0) "
-				"- coalesce(sei.issued_qty, 0)) > 0"
-			)
+			# The stored column (see `StockEntries._update_item_balances` and
+			# `reservation._apply`) so the (product, available_qty) index applies.
+			conditions.append("sei.available_qty > 0")
 
 	order_clause = "arrival_marker, se.creation" if fifo else "se.creation desc"
 
 	query = f"""
 		select
+			sei.product as product,
 			sei.name as child_name,
 			se.name as batch_name,
 			se.import_shipment as import_shipment,
 			sei.import_shipment_item as import_shipment_item,
 			sei.uom as uom,
+			sei.expiry_date as expiry_date,
 			se.status as status,
 			se.warehouse as warehouse,
 			coalesce(se.arrival_date, se.creation) as arrival_marker,
@@ -118,9 +329,166 @@ def get_available_batches(
 		inner join `tabStock Entries` se on se.name = sei.parent
 		left join `tabImport Shipment Item` isi on isi.name = sei.import_shipment_item
 		where {" and ".join(conditions)}
-		order by {order_clause}
+		order by sei.product, {order_clause}
+		{"lock in share mode" if lock else ""}
 	"""
-	return frappe.db.sql(query, tuple(values), as_dict=True)
+	by_product: dict[str, list] = {}
+	for row in frappe.db.sql(query, tuple(values), as_dict=True):
+		by_product.setdefault(row.product, []).append(row)
+	return by_product
+
+
+def lock_candidate_batches(
+	products,
+	*,
+	location_type: str | None = None,
+	warehouse: str | None = None,
+) -> dict:
+	"""Take row locks on every candidate batch row for the given products.
+
+	Writers (Sales Order submit/cancel, Delivery Note issue, Stock
+	Adjustment / Reconciliation) call this before reading availability so
+	concurrent submitters queue on the same rows instead of overselling.
+	Candidates include zero-available rows so the locked set does not
+	depend on quantities another transaction is about to change.
+
+	Locks are taken in one canonical order — product, then arrival_marker,
+	then child name (see `_lock_rows`) — so two transactions touching
+	overlapping products wait on each other instead of deadlocking.
+	Returns the locked rows (current, not snapshot, quantities) keyed by
+	child name.
+	"""
+	products = sorted({p for p in products or [] if p})
+	if not products:
+		return {}
+	if not stock_ledger.table_exists("Stock Entries") or not stock_ledger.table_exists(
+		"Stock Entry Items"
+	):
+		return {}
+
+	conditions: list[str] = ["se.docstatus = 1"]
+	values: list = []
+
+	ph = ", ".join(["%s"] * len(products))
+	conditions.append(f"sei.product in ({ph})")
+	values.extend(products)
+
+	if location_type:
+		statuses = _status_set(location_type)
+		placeholders = ", ".join(["%s"] * len(statuses))
+		conditions.append(f"se.status in ({placeholders})")
+		values.extend(statuses)
+		if location_type == "Warehouse" and warehouse:
+			conditions.append("se.warehouse = %s")
+			values.append(warehouse)
+
+	rows = frappe.db.sql(
+		f"""
+		select sei.name as child_name, sei.product as product
+		from `tabStock Entry Items` sei
+		inner join `tabStock Entries` se on se.name = sei.parent
+		where {" and ".join(conditions)}
+		order by sei.product, coalesce(se.arrival_date, se.creation), sei.name
+		""",
+		tuple(values),
+		as_dict=True,
+	)
+	return _lock_rows(rows)
+
+
+def lock_batch_items(child_names) -> dict:
+	"""Lock specific `Stock Entry Items` rows in the canonical order.
+
+	Used where the batch rows are already known (Delivery Note lines that
+	carry `stock_entry_item`).
+	"""
+	child_names = sorted({name for name in child_names or [] if name})
+	if not child_names:
+		return {}
+	ph = ", ".join(["%s"] * len(child_names))
+	rows = frappe.db.sql(
+		f"""
+		select sei.name as child_name, sei.product as product
+		from `tabStock Entry Items` sei
+		inner join `tabStock Entries` se on se.name = sei.parent
+		where sei.name in ({ph})
+		order by sei.product, coalesce(se.arrival_date, se.creation), sei.name
+		""",
+		tuple(child_names),
+		as_dict=True,
+	)
+	return _lock_rows(rows)
+
+
+def _lock_rows(candidates) -> dict:
+	"""Issue `FOR UPDATE` reads product by product, in sorted product order.
+
+	Only `Stock Entry Items` rows are locked — parent rows are left to the
+	writers' own UPDATEs so locking a product never blocks on an unrelated
+	product that shares a Stock Entry. Within a product InnoDB takes the
+	locks while walking the primary-key lookups, which is the same order
+	for every caller; the returned dict keeps the canonical FIFO order of
+	`candidates`.
+	"""
+	by_product: dict[str, list[str]] = {}
+	for row in candidates:
+		by_product.setdefault(row.product, []).append(row.child_name)
+
+	locked: dict = {}
+	for product in sorted(by_product):
+		names = by_product[product]
+		ph = ", ".join(["%s"] * len(names))
+		rows = frappe.db.sql(
+			f"""
+			select
+				name as child_name,
+				parent as batch_name,
+				product,
+				coalesce(received_qty, 0) as received_qty,
+				coalesce(reserved_qty, 0) as reserved_qty,
+				coalesce(issued_qty, 0) as issued_qty
+			from `tabStock Entry Items`
+			where name in ({ph})
+			for update
+			""",
+			tuple(names),
+			as_dict=True,
+		)
+		current = {row.child_name: row for row in rows}
+		for name in names:
+			row = current.get(name)
+			if row:
+				row.available_qty = row.received_qty - row.reserved_qty - row.issued_qty
+				locked[name] = row
+	return locked
+
+
+def apply_locked_quantities(
+	batches_by_product, locked, *, for_release: bool = False, include_zero: bool = False
+) -> dict:
+	"""Overlay the quantities of `locked` rows onto `get_available_batches_bulk()` rows.
+
+	A plain read sees the transaction's REPEATABLE READ snapshot, which can
+	predate a commit the lock waited for; the locked rows carry the current
+	quantities. Batches left with nothing to consume (nothing reserved, for
+	releases) are dropped, keeping FIFO order, unless `include_zero`.
+	"""
+	field = "reserved_qty" if for_release else "available_qty"
+	current: dict[str, list] = {}
+	for product, batches in batches_by_product.items():
+		rows = current.setdefault(product, [])
+		for batch in batches:
+			row = locked.get(batch.child_name)
+			if row:
+				batch.update(
+					received_qty=row.received_qty,
+					reserved_qty=row.reserved_qty,
+					issued_qty=row.issued_qty,
+					available_qty=row.available_qty,
+				)
+			if include_zero or flt(batch.get(field)) > QTY_TOLERANCE:
+				rows.append(batch)
+	return current
 
 
 def get_available_quantity(
@@ -144,6 +512,85 @@ def get_available_quantity(
 	return flt(sum(flt(r.available_qty) for r in rows))
 
 
+def get_cached_available_quantity(
+	product: str,
+	*,
+	location_type: str = "Warehouse",
+	warehouse: str | None = None,
+) -> float:
+	"""`get_available_quantity()` answered from the shared Redis cache."""
+	if not product:
+		return 0.0
+	return get_cached_available_quantities([product], location_type=location_type, warehouse=warehouse)[
+		product
+	]
+
+
+def get_cached_available_quantities(
+	products,
+	*,
+	location_type: str = "Warehouse",
+	warehouse: str | None = None,
+) -> dict:
+	"""``{product: available qty}`` for many products through the shared cache.
+
+	Two Redis round trips when warm (versions, then quantities); misses
+	are computed together with one query and stored under the version
+	read before it. That query is a locking read, so it sees every write
+	committed before the version read even when the transaction's
+	snapshot (or its `get_available_batches()` memo) is older. Products
+	this transaction has written bypass the shared cache so uncommitted
+	quantities never leak to other requests.
+	"""
+	products = sorted({product for product in products or [] if product})
+	if not products:
+		return {}
+	if location_type != "Warehouse":
+		warehouse = None
+
+	pending = _pending_bumps(create=False)
+	if not pending:
+		shared = products
+	elif pending.everything:
+		shared = []
+	else:
+		shared = [product for product in products if product not in pending.products]
+
+	result = {}
+	keys = {}
+	if shared:
+		versions = frappe.cache.mget([_version_key(None), *(_version_key(product) for product in shared)])
+		epoch = int(versions[0] or 0)
+		keys = {
+			product: _quantity_key(product, epoch, int(version or 0), location_type, warehouse)
+			for product, version in zip(shared, versions[1:], strict=True)
+		}
+		for product, value in zip(shared, frappe.cache.mget(list(keys.values())), strict=True):
+			if value is not None:
+				result[product] = float(value)
+		_cache_stats["shared_hits"] += len(result)
+		_cache_stats["shared_misses"] += len(shared) - len(result)
+
+	fill = [product for product in shared if product not in result]
+	if fill:
+		# Not memoised: the memo and the plain-read snapshot can both predate the versions.
+		batches = _query_available_batches(
+			fill, location_type, warehouse, None, None, None, True, False, False, lock=True
+		)
+		pipe = frappe.cache.pipeline()
+		for product in fill:
+			result[product] = flt(sum(flt(row.available_qty) for row in batches.get(product, [])))
+			pipe.set(keys[product], result[product], ex=SHARED_CACHE_TTL)
+		pipe.execute()
+
+	private = [product for product in products if product not in result]
+	if private:
+		batches = get_available_batches_bulk(private, location_type=location_type, warehouse=warehouse)
+		for product in private:
+			result[product] = flt(sum(flt(row.available_qty) for row in batches[product]))
+	return result
+
+
 def get_available_quantity_by_shipment(
 	product: str,
 	*,
@@ -175,7 +622,7 @@ def get_product_balances(
 	the historical report behaviour where the rollup row carries the
 	warehouse field and customs rows have no warehouse.
 	"""
-	if not frappe.db.table_exists("Stock Entries") or not frappe.db.table_exists(
+	if not stock_ledger.table_exists("Stock Entries") or not stock_ledger.table_exists(
 		"Stock Entry Items"
 	):
 		return []
@@ -202,9 +649,7 @@ def get_product_balances(
 	query = f"""
 		select
 			sei.product as product,
-			coalesce(sum(coalesce(sei.received_qty, 0)
-				- coalesce(sei.reserved_qty, 0)
-				- coalesce(sei.issued_qty, 0)), 0) as available_qty,
+			coalesce(sum(sei.available_qty), 0) as available_qty,
 			coalesce(sum(coalesce(sei.reserved_qty, 0)), 0) as reserved_qty,
 			coalesce(sum(coalesce(sei.issued_qty, 0)), 0) as issued_qty,
 			max(coalesce(se.modified, se.creation)) as last_movement
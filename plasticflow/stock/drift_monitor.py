@@ -0,0 +1,100 @@
+"""Scheduled drift check for the Stock Ledger Entry rollup.
+
+`rebuild.audit()` compares the whole ledger with the truth, which is too
+expensive to run often. This job runs hourly and checks only the slots
+of Stock Entries changed since its previous run — the same candidate set
+`rebuild_incremental()` uses — and appends one `Stock Ledger Drift Log`
+row with the number of drifting slots and the worst absolute difference.
+The latest figures are shown on the "Stock Ledger Drift" number cards.
+
+With
+
+	bench --site <site> set-config plasticflow_drift_auto_heal 1
+
+drifting slots are recomputed from Stock Entry Items in the same run.
+"""
+
+from __future__ import annotations
+
+import time
+
+import frappe
+from frappe.utils import add_to_date, cint, flt, now_datetime
+
+LOG_DOCTYPE = "Stock Ledger Drift Log"
+WATERMARK_KEY = "plasticflow_stock_drift_monitor_watermark"
+AUTO_HEAL_KEY = "plasticflow_drift_auto_heal"
+CHUNK_SIZE = 200
+FIRST_RUN_LOOKBACK_HOURS = 1
+
+
+def run(chunk_size: int = CHUNK_SIZE):
+	"""Scheduler entry point: check the slots touched since the last run."""
+	from plasticflow.stock import ledger as stock_ledger
+	from plasticflow.stock import rebuild as stock_rebuild
+
+	if not stock_ledger.table_exists(LOG_DOCTYPE) or not stock_ledger.table_exists(
+		stock_rebuild.LEDGER_DOCTYPE
+	):
+		return None
+
+	started = time.time()
+	checked_at = now_datetime()
+	since = frappe.db.get_global(WATERMARK_KEY) or add_to_date(checked_at, hours=-FIRST_RUN_LOOKBACK_HOURS)
+	auto_heal = cint(frappe.conf.get(AUTO_HEAL_KEY))
+
+	entries_checked = slots_checked = healed = 0
+	drift = []
+	after = ""
+	while True:
+		names = stock_rebuild._candidate_entries(since, after, chunk_size)
+		if not names:
+			break
+		checked, rows = stock_rebuild.entry_slot_drift(names)
+		entries_checked += len(names)
+		slots_checked += checked
+		drift.extend(rows)
+		if auto_heal and rows:
+			healed += stock_rebuild.recompute_entry_slots(
+				{(row["stock_entry"], row["product"]) for row in rows},
+				remarks="Healed by the stock ledger drift monitor",
+			)
+		after = names[-1]
+
+	log = frappe.get_doc(
+		{
+			"doctype": LOG_DOCTYPE,
+			"checked_at": checked_at,
+			"checked_since": since,
+			"entries_checked": entries_checked,
+			"slots_checked": slots_checked,
+			"drift_count": len(drift),
+			"max_abs_diff": max(
+				(abs(flt(value)) for row in drift for value in row["diff"].values()), default=0
+			),
+			"healed_count": healed,
+			"duration": round(time.time() - started, 3),
+		}
+	).insert(ignore_permissions=True)
+	frappe.db.set_global(WATERMARK_KEY, str(checked_at))
+	frappe.db.commit()
+
+	if drift:
+		frappe.logger().warning(
+			f"plasticflow.stock.drift_monitor: {len(drift)} drifting ledger slots "
+			f"(max abs diff {log.max_abs_diff}), healed {healed}"
+		)
+	return log.name
+
+
+def get_latest():
+	"""The most recent drift log row, or None before the first run."""
+	if not frappe.db.table_exists(LOG_DOCTYPE):
+		return None
+	rows = frappe.get_all(
+		LOG_DOCTYPE,
+		fields=["name", "checked_at", "slots_checked", "drift_count", "max_abs_diff", "healed_count"],
+		order_by="checked_at desc",
+		limit=1,
+	)
+	return rows[0] if rows else None
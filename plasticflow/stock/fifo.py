@@ -1,11 +1,106 @@
+"""Stock allocation policy.
+
+`PlasticFlow Stock Settings` holds a default policy, per-product and
+per-warehouse rules and the FIFO enforcement switch. The resolved
+settings are cached in Redis; `frappe.cache` also keeps them in
+`frappe.local` for the rest of the request, so a request reads Redis
+once and only a cache miss queries the database. Saving the settings
+clears the Redis copy, again once the save commits.
+
+Policies:
+
+* FIFO — oldest arrivals first (the availability reader's own order);
+* FEFO — earliest `expiry_date` first, undated batches last, FIFO on ties;
+* Shipment Pinned — only the order's own shipment, no fallback.
+"""
+
 import frappe
 
+FIFO = "FIFO"
+FEFO = "FEFO"
+SHIPMENT_PINNED = "Shipment Pinned"
+POLICIES = (FIFO, FEFO, SHIPMENT_PINNED)
+
+SETTINGS_DOCTYPE = "PlasticFlow Stock Settings"
+RULE_DOCTYPE = "Stock Allocation Policy Rule"
+CACHE_KEY = "plasticflow_stock_allocation_policy"
 
 _ENABLE_KEY = "plasticflow_enable_fifo"
 _DISABLE_KEY = "plasticflow_disable_fifo"
 
 
 def is_fifo_enabled() -> bool:
-	"""Return True when FIFO enforcement/allocation should be active."""
-	# Hard-disable FIFO temporarily. Re-enable by restoring config-driven logic.
-	return False
+	"""Return True when FIFO enforcement should block Sales Order submission.
+
+	`plasticflow_disable_fifo` / `plasticflow_enable_fifo` in site config
+	override the settings switch, in that order.
+	"""
+	if frappe.conf.get(_DISABLE_KEY):
+		return False
+	if frappe.conf.get(_ENABLE_KEY):
+		return True
+	return _settings()["enforce_fifo"]
+
+
+def get_policy(product=None, warehouse=None) -> str:
+	"""Resolve the policy: product in warehouse, then product, then warehouse, then the default."""
+	settings = _settings()
+	rules = settings["rules"]
+	for key in ((product or None, warehouse or None), (product or None, None), (None, warehouse or None)):
+		if key != (None, None) and key in rules:
+			return rules[key]
+	return settings["default_policy"]
+
+
+def get_policies(products, warehouse=None) -> dict:
+	"""`{product: policy}` for every product, from the cached settings."""
+	return {product: get_policy(product, warehouse) for product in products or [] if product}
+
+
+def order_batches(batches, policy):
+	"""Return `batches` (already in FIFO order) in the order `policy` consumes them."""
+	if policy != FEFO:
+		return list(batches)
+	# Stable: batches sharing an expiry date keep their FIFO order.
+	return sorted(
+		batches,
+		key=lambda batch: (0, batch.expiry_date) if batch.get("expiry_date") else (1, None),
+	)
+
+
+def clear_cache():
+	"""Drop the cached settings now and after the current transaction commits.
+
+	Another request that misses the cache before the commit would otherwise
+	cache the old settings again.
+	"""
+	_delete_cached_settings()
+	frappe.db.after_commit.add(_delete_cached_settings)
+
+
+def _delete_cached_settings():
+	frappe.cache.delete_value(CACHE_KEY)
+
+
+def _settings() -> dict:
+	return frappe.cache.get_value(CACHE_KEY, generator=_load_settings)
+
+
+def _load_settings() -> dict:
+	settings = {"default_policy": FIFO, "enforce_fifo": False, "rules": {}}
+	if not frappe.db.table_exists(RULE_DOCTYPE):
+		return settings
+
+	values = frappe.db.get_singles_dict(SETTINGS_DOCTYPE)
+	if values.get("default_policy") in POLICIES:
+		settings["default_policy"] = values.get("default_policy")
+	settings["enforce_fifo"] = bool(int(values.get("enforce_fifo") or 0))
+	for rule in frappe.get_all(
+		RULE_DOCTYPE,
+		filters={"parenttype": SETTINGS_DOCTYPE, "parent": SETTINGS_DOCTYPE},
+		fields=["product", "warehouse", "policy"],
+		order_by="idx",
+	):
+		if rule.policy in POLICIES and (rule.product or rule.warehouse):
+			settings["rules"].setdefault((rule.product or None, rule.warehouse or None), rule.policy)
+	return settings
@@ -0,0 +1,56 @@
+"""Landed cost rates of Import Shipment Items, fetched in bulk.
+
+Sales Order profitability prices every allocation (and every line
+without one) at the local landed rate of the shipment item it came from,
+addressed either by the `Import Shipment Item` name or by the
+(shipment, product) pair. `get_landed_rates()` resolves both kinds of
+reference with one query, however many lines the order has.
+"""
+
+import frappe
+from frappe.utils import flt
+
+
+def get_landed_rates(shipment_items=(), shipment_products=()):
+	"""Return `({shipment_item: rate}, {(shipment, product): rate})`.
+
+	A (shipment, product) pair resolves to the shipment's first row for
+	that product, by `idx`. Unknown references are left out; callers
+	treat them as a zero rate.
+	"""
+	shipment_items = sorted({name for name in shipment_items or () if name})
+	shipment_products = sorted({pair for pair in shipment_products or () if pair[0] and pair[1]})
+	if not shipment_items and not shipment_products:
+		return {}, {}
+
+	conditions = []
+	values: list = []
+	if shipment_items:
+		conditions.append(f"name in ({', '.join(['%s'] * len(shipment_items))})")
+		values.extend(shipment_items)
+	if shipment_products:
+		conditions.append(f"(parent, product) in ({', '.join(['(%s, %s)'] * len(shipment_products))})")
+		for shipment, product in shipment_products:
+			values.extend((shipment, product))
+
+	rows = frappe.db.sql(
+		f"""
+		select name, parent, product, landed_cost_rate_local
+		from `tabImport Shipment Item`
+		where {" or ".join(conditions)}
+		order by parent, idx
+		""",
+		tuple(values),
+		as_dict=True,
+	)
+
+	wanted_pairs = set(shipment_products)
+	by_item: dict[str, float] = {}
+	by_pair: dict[tuple[str, str], float] = {}
+	for row in rows:
+		rate = flt(row.landed_cost_rate_local or 0)
+		by_item[row.name] = rate
+		pair = (row.parent, row.product)
+		if pair in wanted_pairs and pair not in by_pair:
+			by_pair[pair] = rate
+	return by_item, by_pair
@@ -1,81 +1,96 @@
+import hashlib
+
 import frappe
 from frappe.utils import flt, now_datetime
 
+from plasticflow.stock import outbox as stock_outbox
+from plasticflow.stock import unit_of_work as stock_unit_of_work
+
 LEDGER_DOCTYPE = "Stock Ledger Entry"
 MOVEMENT_DOCTYPE = "Stock Ledger Movement"
 MOVEMENT_TOLERANCE = 0.0001
+BULK_CHUNK_SIZE = 500
+
+SLOT_KEY_SEPARATOR = chr(31)
+SLOT_KEY_FIELDS = (
+	"product",
+	"location_type",
+	"location_reference",
+	"warehouse",
+	"import_shipment",
+)
+SLOT_FIELDS = (
+	"product",
+	"location_type",
+	"location_reference",
+	"warehouse",
+	"stock_entry",
+	"import_shipment",
+)
+LEDGER_VALUE_FIELDS = (
+	"landed_cost_rate",
+	"landed_cost_amount",
+	"available_qty",
+	"reserved_qty",
+	"issued_qty",
+	"last_movement",
+	"remarks",
+)
+# Fields compared to decide whether a slot write can be skipped; `remarks`
+# and `last_movement` alone never justify a write.
+ELISION_VALUE_FIELDS = (
+	"available_qty",
+	"reserved_qty",
+	"issued_qty",
+	"landed_cost_rate",
+	"landed_cost_amount",
+)
+MOVEMENT_VALUE_FIELDS = (
+	"movement_datetime",
+	"available_delta",
+	"reserved_delta",
+	"issued_delta",
+	"balance_available",
+	"balance_reserved",
+	"balance_issued",
+	"remarks",
+	"source_doctype",
+	"source_name",
+)
+
+
+MOVEMENT_COLUMNS = (
+	"name",
+	"creation",
+	"modified",
+	"modified_by",
+	"owner",
+	"docstatus",
+	"idx",
+	*SLOT_FIELDS,
+	*MOVEMENT_VALUE_FIELDS,
+)
+
+_write_stats = {"performed": 0, "elided": 0}
+_existing_tables = set()
+
+
+def slot_key(product, location_type, location_reference, warehouse=None, import_shipment=None):
+	"""Return the unique identity of a ledger slot.
+
+	Must stay byte-for-byte identical to `slot_key_sql()` — the migration
+	patch backfills existing rows with the SQL form.
+	"""
+	parts = (product, location_type, location_reference, warehouse, import_shipment)
+	raw = SLOT_KEY_SEPARATOR.join(part or "" for part in parts)
+	return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
 
-def _get_filters(
-	product,
-	location_type,
-	location_reference,
-	warehouse=None,
-	stock_entry=None,
-	import_shipment=None,
-):
-	filters = {
-		"product": product,
-		"location_type": location_type,
-		"location_reference": location_reference,
-	}
-	if warehouse:
-		filters["warehouse"] = warehouse
-	if stock_entry:
-		filters["stock_entry"] = stock_entry
-	if import_shipment:
-		filters["import_shipment"] = import_shipment
-	return filters
-
-
-def _get_or_create(
-	product,
-	location_type,
-	location_reference,
-	warehouse=None,
-	stock_entry=None,
-	import_shipment=None,
-):
-	base_filters = _get_filters(
-		product,
-		location_type,
-		location_reference,
-		warehouse,
-		None,
-		import_shipment,
-	)
-	base_filters.pop("stock_entry", None)
-
-	existing = frappe.db.get_all(
-		LEDGER_DOCTYPE,
-		filters=base_filters,
-		fields=["name", "last_movement", "creation"],
-	)
-
-	doc = None
-	if existing:
-		existing.sort(key=lambda row: row.last_movement or row.creation, reverse=True)
-		doc = frappe.get_doc(LEDGER_DOCTYPE, existing[0].name)
-		for duplicate in existing[1:]:
-			frappe.delete_doc(
-				LEDGER_DOCTYPE,
-				duplicate.name,
-				ignore_permissions=True,
-				force=1,
-				delete_permanently=True,
-			)
-
-	if not doc:
-		doc = frappe.new_doc(LEDGER_DOCTYPE)
-
-	doc.product = product
-	doc.location_type = location_type
-	doc.location_reference = location_reference
-	doc.warehouse = warehouse
-	doc.stock_entry = stock_entry
-	doc.import_shipment = import_shipment
-
-	return doc
+def slot_key_sql(alias=None):
+	"""SQL expression computing `slot_key` for a row of `alias`."""
+	prefix = f"{alias}." if alias else ""
+	columns = ", ".join(f"coalesce({prefix}{field}, '')" for field in SLOT_KEY_FIELDS)
+	return f"sha1(concat_ws(char(31 using utf8mb4), {columns}))"
 
 
 def set_balances(
@@ -102,55 +117,24 @@ def set_balances(
 	Stock Entry Items truth, we don't want to emit synthetic movement rows
 	dated today — the historical audit log stays untouched.
 	"""
-	doc = _get_or_create(
+	slot = make_slot(
 		product,
 		location_type,
 		location_reference,
-		warehouse,
-		stock_entry,
-		import_shipment,
+		warehouse=warehouse,
+		stock_entry=stock_entry,
+		import_shipment=import_shipment,
+		available=available,
+		reserved=reserved,
+		issued=issued,
+		landed_cost_rate=landed_cost_rate,
+		landed_cost_amount=landed_cost_amount,
+		remarks=remarks,
+		source_doctype=source_doctype,
+		source_name=source_name,
 	)
-	old_available = flt(doc.available_qty or 0)
-	old_reserved = flt(doc.reserved_qty or 0)
-	old_issued = flt(doc.issued_qty or 0)
-
-	new_available = old_available if available is None else flt(available)
-	new_reserved = old_reserved if reserved is None else flt(reserved)
-	new_issued = old_issued if issued is None else flt(issued)
-
-	doc.available_qty = new_available
-	doc.reserved_qty = new_reserved
-	doc.issued_qty = new_issued
-	if remarks is not None:
-		doc.remarks = remarks
-	if landed_cost_rate is not None:
-		doc.landed_cost_rate = landed_cost_rate
-	if landed_cost_amount is not None:
-		doc.landed_cost_amount = landed_cost_amount
-	doc.last_movement = now_datetime()
-	if doc.is_new():
-		doc.insert(ignore_permissions=True)
-	else:
-		doc.save(ignore_permissions=True)
-	if not skip_movement_log:
-		_log_movement(
-			product,
-			location_type,
-			location_reference,
-			warehouse=warehouse,
-			stock_entry=stock_entry,
-			import_shipment=import_shipment,
-			available_delta=new_available - old_available,
-			reserved_delta=new_reserved - old_reserved,
-			issued_delta=new_issued - old_issued,
-			balance_available=new_available,
-			balance_reserved=new_reserved,
-			balance_issued=new_issued,
-			remarks=remarks,
-			source_doctype=source_doctype,
-			source_name=source_name,
-		)
-	return doc
+	rows = _write_slots([slot], _absolute_balances, skip_movement_log=skip_movement_log)
+	return rows[0] if rows else None
 
 
 def apply_delta(
@@ -170,54 +154,25 @@ def apply_delta(
 	skip_movement_log=False,
 ):
 	"""Adjust balances by delta values."""
-	doc = _get_or_create(
+	slot = make_slot(
 		product,
 		location_type,
 		location_reference,
-		warehouse,
-		stock_entry,
-		import_shipment,
+		warehouse=warehouse,
+		stock_entry=stock_entry,
+		import_shipment=import_shipment,
+		available_delta=available_delta,
+		reserved_delta=reserved_delta,
+		issued_delta=issued_delta,
+		remarks=remarks,
+		source_doctype=source_doctype,
+		source_name=source_name,
 	)
-	old_available = flt(doc.available_qty or 0)
-	old_reserved = flt(doc.reserved_qty or 0)
-	old_issued = flt(doc.issued_qty or 0)
-
-	new_available = max(old_available + flt(available_delta or 0), 0)
-	new_reserved = max(old_reserved + flt(reserved_delta or 0), 0)
-	new_issued = max(old_issued + flt(issued_delta or 0), 0)
-
-	doc.available_qty = new_available
-	doc.reserved_qty = new_reserved
-	doc.issued_qty = new_issued
-	if remarks is not None:
-		doc.remarks = remarks
-	doc.last_movement = now_datetime()
-	if doc.is_new():
-		doc.insert(ignore_permissions=True)
-	else:
-		doc.save(ignore_permissions=True)
-	if not skip_movement_log:
-		_log_movement(
-			product,
-			location_type,
-			location_reference,
-			warehouse=warehouse,
-			stock_entry=stock_entry,
-			import_shipment=import_shipment,
-			available_delta=new_available - old_available,
-			reserved_delta=new_reserved - old_reserved,
-			issued_delta=new_issued - old_issued,
-			balance_available=new_available,
-			balance_reserved=new_reserved,
-			balance_issued=new_issued,
-			remarks=remarks,
-			source_doctype=source_doctype,
-			source_name=source_name,
-		)
-	return doc
+	rows = _write_slots([slot], _delta_balances, skip_movement_log=skip_movement_log)
+	return rows[0] if rows else None
 
 
-def _log_movement(
+def make_slot(
 	product,
 	location_type,
 	location_reference,
@@ -225,45 +180,345 @@ def _log_movement(
 	warehouse=None,
 	stock_entry=None,
 	import_shipment=None,
-	available_delta=0.0,
-	reserved_delta=0.0,
-	issued_delta=0.0,
-	balance_available=0.0,
-	balance_reserved=0.0,
-	balance_issued=0.0,
-	remarks=None,
-	source_doctype=None,
-	source_name=None,
+	**values,
 ):
+	"""Describe one ledger slot write for the bulk helpers.
+
+	`values` takes the same keyword names as `set_balances` / `apply_delta`
+	(available, reserved_delta, landed_cost_rate, remarks, source_name, ...).
+	"""
+	slot = frappe._dict(
+		product=product,
+		location_type=location_type,
+		location_reference=location_reference,
+		warehouse=warehouse,
+		stock_entry=stock_entry,
+		import_shipment=import_shipment,
+	)
+	slot.update(values)
+	return slot
+
+
+def set_balances_bulk(slots, *, skip_movement_log=False):
+	"""Bulk variant of `set_balances`.
+
+	Reads every target slot in one query, computes the new balances in
+	Python and writes the rollup rows and movement rows with multi-row
+	statements. Slots are applied in order, so a slot listed twice ends
+	with the last value exactly as repeated `set_balances` calls would.
+	Slots whose stored values already match are not rewritten (see
+	`get_write_stats`). Returns the number of distinct slots processed.
+	"""
+	return len(_write_slots(slots, _absolute_balances, skip_movement_log=skip_movement_log))
+
+
+def apply_deltas_bulk(slots, *, skip_movement_log=False):
+	"""Bulk variant of `apply_delta`. See `set_balances_bulk`."""
+	return len(_write_slots(slots, _delta_balances, skip_movement_log=skip_movement_log))
+
+
+def clear_slots_bulk(slots):
+	"""Bulk variant of `clear_slot`: log the reversal and drop every matching row."""
+	slots = [slot for slot in slots if slot and slot.get("product")]
+	if not slots:
+		return 0
+	rows_by_key = _fetch_slot_rows(slots)
+	if not rows_by_key:
+		return 0
+
+	movements = [
+		_movement_row(
+			row,
+			old=row,
+			new={"available_qty": 0, "reserved_qty": 0, "issued_qty": 0},
+			remarks="Cleared ledger slot",
+		)
+		for row in rows_by_key.values()
+	]
+	_insert_movements(movements)
+	_delete_rows([row.name for row in rows_by_key.values()])
+	return len(rows_by_key)
+
+
+def _absolute_balances(row, slot):
+	return (
+		flt(row.available_qty) if slot.get("available") is None else flt(slot.available),
+		flt(row.reserved_qty) if slot.get("reserved") is None else flt(slot.reserved),
+		flt(row.issued_qty) if slot.get("issued") is None else flt(slot.issued),
+	)
+
+
+def _delta_balances(row, slot):
+	return (
+		max(flt(row.available_qty) + flt(slot.get("available_delta") or 0), 0),
+		max(flt(row.reserved_qty) + flt(slot.get("reserved_delta") or 0), 0),
+		max(flt(row.issued_qty) + flt(slot.get("issued_delta") or 0), 0),
+	)
+
+
+def _key_of(slot):
+	return slot_key(*(slot.get(field) for field in SLOT_KEY_FIELDS))
+
+
+def _fetch_slot_rows(slots):
+	"""Lock and load the ledger rows for the given slots, keyed by `slot_key`.
+
+	A point lookup on the unique index per key; `for update` serialises
+	concurrent writers on the same slot so read-modify-write stays exact.
+	"""
+	keys = sorted({_key_of(slot) for slot in slots})
+	rows_by_key = {}
+	for start in range(0, len(keys), BULK_CHUNK_SIZE):
+		chunk = keys[start : start + BULK_CHUNK_SIZE]
+		rows = frappe.db.sql(
+			f"""
+			select name, creation, slot_key, {", ".join(SLOT_FIELDS)}, {", ".join(LEDGER_VALUE_FIELDS)}
+			from `tab{LEDGER_DOCTYPE}`
+			where slot_key in ({", ".join(["%s"] * len(chunk))})
+			for update
+			""",
+			tuple(chunk),
+			as_dict=True,
+		)
+		for row in rows:
+			rows_by_key[row.slot_key] = row
+	return rows_by_key
+
+
+def _write_slots(slots, compute, *, skip_movement_log=False):
+	slots = [slot for slot in slots if slot and slot.get("product")]
+	if not slots:
+		return []
+
+	now = now_datetime()
+	rows_by_key = _fetch_slot_rows(slots)
+	stored = {key: _stored_state(row) for key, row in rows_by_key.items()}
+	pending = {}
+	movements = []
+
+	for slot in slots:
+		key = _key_of(slot)
+		row = rows_by_key.get(key)
+		if not row:
+			row = frappe._dict(
+				name=frappe.generate_hash(length=10),
+				creation=now,
+				slot_key=key,
+				available_qty=0,
+				reserved_qty=0,
+				issued_qty=0,
+			)
+			rows_by_key[key] = row
+
+		old = {
+			"available_qty": flt(row.available_qty),
+			"reserved_qty": flt(row.reserved_qty),
+			"issued_qty": flt(row.issued_qty),
+		}
+		row.available_qty, row.reserved_qty, row.issued_qty = compute(row, slot)
+		for field in SLOT_FIELDS:
+			row[field] = slot.get(field)
+		for field in ("landed_cost_rate", "landed_cost_amount", "remarks"):
+			if slot.get(field) is not None:
+				row[field] = slot.get(field)
+		pending[key] = row
+
+		if not skip_movement_log:
+			movements.append(
+				_movement_row(
+					slot,
+					old=old,
+					new=row,
+					remarks=slot.get("remarks"),
+					source_doctype=slot.get("source_doctype"),
+					source_name=slot.get("source_name"),
+				)
+			)
+
+	changed = []
+	for key, row in pending.items():
+		if key in stored and _same_state(stored[key], _stored_state(row)):
+			continue
+		row.last_movement = now
+		changed.append(row)
+	_write_stats["elided"] += len(pending) - len(changed)
+	_write_stats["performed"] += len(changed)
+
+	if changed:
+		_upsert_ledger_rows(changed, now)
+	_insert_movements(movements)
+	return list(pending.values())
+
+
+def _stored_state(row):
+	return (
+		tuple(row.get(field) or None for field in SLOT_FIELDS),
+		tuple(flt(row.get(field)) for field in ELISION_VALUE_FIELDS),
+	)
+
+
+def _same_state(old, new):
+	return old[0] == new[0] and all(
+		abs(a - b) < MOVEMENT_TOLERANCE for a, b in zip(old[1], new[1], strict=True)
+	)
+
+
+def get_write_stats(*, reset=False):
+	"""Return this process's ledger slot write counters.
+
+	`performed` counts rollup rows actually written, `elided` counts slot
+	writes skipped because balances, landed cost and slot identity were
+	already identical to what is stored (so `last_movement` is untouched).
+	"""
+	stats = dict(_write_stats)
+	if reset:
+		_write_stats.update(performed=0, elided=0)
+	return stats
+
+
+def _upsert_ledger_rows(rows, now):
+	user = frappe.session.user
+	columns = ("name", "creation", "modified", "modified_by", "owner", "docstatus", "idx")
+	columns += ("slot_key", *SLOT_FIELDS, *LEDGER_VALUE_FIELDS)
+	values = [
+		(
+			row.name,
+			row.creation or now,
+			now,
+			user,
+			user,
+			0,
+			0,
+			row.slot_key,
+			*(row.get(field) for field in SLOT_FIELDS + LEDGER_VALUE_FIELDS),
+		)
+		for row in rows
+	]
+	update_fields = ("modified", "modified_by", *SLOT_FIELDS, *LEDGER_VALUE_FIELDS)
+	insert_rows(LEDGER_DOCTYPE, columns, values, update_fields=update_fields)
+
+
+def _delete_rows(names):
+	for start in range(0, len(names), BULK_CHUNK_SIZE):
+		chunk = names[start : start + BULK_CHUNK_SIZE]
+		frappe.db.sql(
+			f"delete from `tab{LEDGER_DOCTYPE}` where name in ({', '.join(['%s'] * len(chunk))})",
+			tuple(chunk),
+		)
+
+
+def _movement_row(slot, *, old, new, remarks=None, source_doctype=None, source_name=None):
+	available_delta = flt(new.get("available_qty")) - flt(old.get("available_qty"))
+	reserved_delta = flt(new.get("reserved_qty")) - flt(old.get("reserved_qty"))
+	issued_delta = flt(new.get("issued_qty")) - flt(old.get("issued_qty"))
 	if (
 		abs(available_delta) < MOVEMENT_TOLERANCE
 		and abs(reserved_delta) < MOVEMENT_TOLERANCE
 		and abs(issued_delta) < MOVEMENT_TOLERANCE
 	):
+		return None
+	row = frappe._dict({field: slot.get(field) for field in SLOT_FIELDS})
+	row.update(
+		available_delta=available_delta,
+		reserved_delta=reserved_delta,
+		issued_delta=issued_delta,
+		balance_available=flt(new.get("available_qty")),
+		balance_reserved=flt(new.get("reserved_qty")),
+		balance_issued=flt(new.get("issued_qty")),
+		remarks=remarks,
+		source_doctype=source_doctype or None,
+		source_name=source_name or None,
+	)
+	return row
+
+
+def _insert_movements(rows):
+	"""Buffer movement rows; `flush_movements` writes them just before commit."""
+	rows = [row for row in rows if row]
+	if not rows:
 		return
-	if not frappe.db.table_exists(MOVEMENT_DOCTYPE):
+	now = now_datetime()
+	user = frappe.session.user
+	buffer = _movement_buffer()
+	for row in rows:
+		row.movement_datetime = now
+		buffer.append(
+			(
+				frappe.generate_hash(length=10),
+				now,
+				now,
+				user,
+				user,
+				0,
+				0,
+				*(row.get(field) for field in SLOT_FIELDS + MOVEMENT_VALUE_FIELDS),
+			)
+		)
+
+
+def _movement_buffer():
+	buffer = getattr(frappe.local, "stock_ledger_movements", None)
+	if buffer is None:
+		buffer = frappe.local.stock_ledger_movements = []
+		frappe.db.before_commit.add(flush_movements)
+		frappe.db.after_rollback.add(_discard_movements)
+	return buffer
+
+
+def flush_movements():
+	"""Write buffered Stock Ledger Movement rows in one bulk insert.
+
+	Registered on `frappe.db.before_commit`, so the audit rows land in the
+	same transaction as the rollup rows they describe.
+	"""
+	buffer = getattr(frappe.local, "stock_ledger_movements", None)
+	frappe.local.stock_ledger_movements = None
+	if not buffer or not table_exists(MOVEMENT_DOCTYPE):
 		return
+	frappe.db.bulk_insert(
+		MOVEMENT_DOCTYPE,
+		fields=MOVEMENT_COLUMNS,
+		values=buffer,
+		chunk_size=BULK_CHUNK_SIZE,
+	)
+
+
+def _discard_movements():
+	frappe.local.stock_ledger_movements = None
+
 
-	doc = frappe.new_doc(MOVEMENT_DOCTYPE)
-	doc.product = product
-	doc.location_type = location_type
-	doc.location_reference = location_reference
-	doc.warehouse = warehouse
-	doc.stock_entry = stock_entry
-	doc.import_shipment = import_shipment
-	doc.available_delta = available_delta
-	doc.reserved_delta = reserved_delta
-	doc.issued_delta = issued_delta
-	doc.balance_available = balance_available
-	doc.balance_reserved = balance_reserved
-	doc.balance_issued = balance_issued
-	if remarks is not None:
-		doc.remarks = remarks
-	if source_doctype:
-		doc.source_doctype = source_doctype
-	if source_name:
-		doc.source_name = source_name
-	doc.insert(ignore_permissions=True)
+def table_exists(doctype):
+	"""`frappe.db.table_exists`, memoised per site for the life of the process.
+
+	Only positive answers are cached so a table created by a later migrate
+	is still picked up.
+	"""
+	key = (frappe.local.site, doctype)
+	if key not in _existing_tables:
+		if not frappe.db.table_exists(doctype):
+			return False
+		_existing_tables.add(key)
+	return True
+
+
+def insert_rows(doctype, columns, values, *, update_fields=None):
+	"""Multi-row INSERT, upserting `update_fields` when the key already exists.
+
+	Also used by `stock.outbox` to append its rows in the caller's transaction.
+	"""
+	column_sql = ", ".join(f"`{column}`" for column in columns)
+	row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+	update_sql = ""
+	if update_fields:
+		update_sql = " on duplicate key update " + ", ".join(
+			f"`{field}` = values(`{field}`)" for field in update_fields
+		)
+	for start in range(0, len(values), BULK_CHUNK_SIZE):
+		chunk = values[start : start + BULK_CHUNK_SIZE]
+		frappe.db.sql(
+			f"insert into `tab{doctype}` ({column_sql}) values {', '.join([row_sql] * len(chunk))}{update_sql}",
+			tuple(value for row in chunk for value in row),
+		)
 
 
 def clear_slot(
@@ -274,49 +529,18 @@ def clear_slot(
 	stock_entry=None,
 	import_shipment=None,
 ):
-	base_filters = _get_filters(product, location_type, location_reference, warehouse, None, import_shipment)
-	entries = frappe.db.get_all(
-		LEDGER_DOCTYPE,
-		filters=base_filters,
-		fields=[
-			"name",
-			"product",
-			"location_type",
-			"location_reference",
-			"warehouse",
-			"stock_entry",
-			"import_shipment",
-			"available_qty",
-			"reserved_qty",
-			"issued_qty",
-		],
+	clear_slots_bulk(
+		[
+			make_slot(
+				product,
+				location_type,
+				location_reference,
+				warehouse=warehouse,
+				stock_entry=stock_entry,
+				import_shipment=import_shipment,
+			)
+		]
 	)
-	for entry in entries:
-		available = flt(entry.available_qty or 0)
-		reserved = flt(entry.reserved_qty or 0)
-		issued = flt(entry.issued_qty or 0)
-		_log_movement(
-			entry.product,
-			entry.location_type,
-			entry.location_reference,
-			warehouse=entry.warehouse,
-			stock_entry=entry.stock_entry,
-			import_shipment=entry.import_shipment,
-			available_delta=-available,
-			reserved_delta=-reserved,
-			issued_delta=-issued,
-			balance_available=0,
-			balance_reserved=0,
-			balance_issued=0,
-			remarks="Cleared ledger slot",
-		)
-		frappe.delete_doc(
-			LEDGER_DOCTYPE,
-			entry.name,
-			ignore_permissions=True,
-			force=1,
-			delete_permanently=True,
-		)
 
 
 # Convenience helpers -----------------------------------------------------
@@ -367,7 +591,17 @@ def _get_transferred_totals_by_shipment_item(import_shipment_name):
 	return {row.shipment_item: row.total_transferred for row in rows}
 
 
-def sync_shipment_customs_balances(shipment_doc, *, stock_entry=None):
+def _landed_cost_local(item):
+	local_rate = getattr(item, "landed_cost_rate_local", None)
+	local_amount = getattr(item, "landed_cost_amount_local", None)
+	if local_rate is None:
+		local_rate = getattr(item, "landed_cost_rate", 0)
+	if local_amount is None:
+		local_amount = getattr(item, "landed_cost_amount", 0)
+	return local_rate, local_amount
+
+
+def _shipment_customs_slots(shipment_doc, *, stock_entry=None):
 	linked_entry = stock_entry
 	if not linked_entry and shipment_doc.get("stock_entry"):
 		linked_entry = frappe.get_doc("Stock Entries", shipment_doc.stock_entry)
@@ -375,107 +609,95 @@ def sync_shipment_customs_balances(shipment_doc, *, stock_entry=None):
 	source_items = linked_entry.items if linked_entry else shipment_doc.items
 	customs_reference = shipment_doc.name
 
+	slots = []
 	for item in source_items:
-		local_rate = getattr(item, "landed_cost_rate_local", None)
-		local_amount = getattr(item, "landed_cost_amount_local", None)
-		if local_rate is None:
-			local_rate = getattr(item, "landed_cost_rate", 0)
-		if local_amount is None:
-			local_amount = getattr(item, "landed_cost_amount", 0)
+		local_rate, local_amount = _landed_cost_local(item)
 		quantity = getattr(item, "available_qty", None)
 		if quantity is None:
 			quantity = getattr(item, "received_qty", None)
 		if quantity is None:
 			quantity = getattr(item, "quantity", 0)
 
-		set_balances(
-			item.product,
-			"Customs",
-			customs_reference,
-			available=quantity or 0,
-			reserved=0,
-			issued=0,
-			warehouse=None,
-			stock_entry=linked_entry.name if linked_entry else None,
-			import_shipment=shipment_doc.name,
-			landed_cost_rate=local_rate,
-			landed_cost_amount=local_amount,
-			remarks="Customs stock awaiting transfer",
+		slots.append(
+			make_slot(
+				item.product,
+				"Customs",
+				customs_reference,
+				available=quantity or 0,
+				reserved=0,
+				issued=0,
+				warehouse=None,
+				stock_entry=linked_entry.name if linked_entry else None,
+				import_shipment=shipment_doc.name,
+				landed_cost_rate=local_rate,
+				landed_cost_amount=local_amount,
+				remarks="Customs stock awaiting transfer",
+			)
 		)
+	return slots
+
+
+def sync_shipment_customs_balances(shipment_doc, *, stock_entry=None):
+	set_balances_bulk(_shipment_customs_slots(shipment_doc, stock_entry=stock_entry))
 
 
 def clear_shipment_balances(shipment_doc):
-	for item in shipment_doc.items:
-		clear_slot(
-			item.product,
-			"Customs",
-			shipment_doc.name,
-			warehouse=None,
-			import_shipment=shipment_doc.name,
-			stock_entry=shipment_doc.get("stock_entry"),
-		)
+	clear_slots_bulk(
+		[
+			make_slot(
+				item.product,
+				"Customs",
+				shipment_doc.name,
+				warehouse=None,
+				import_shipment=shipment_doc.name,
+				stock_entry=shipment_doc.get("stock_entry"),
+			)
+			for item in shipment_doc.items
+		]
+	)
 
 
-def _set_warehouse_balances(stock_entry_doc):
+def _warehouse_slots(stock_entry_doc, *, import_shipment=None, include_reserved=True):
+	slots = []
 	for item in stock_entry_doc.items:
-		available_qty = _available_from_item(item)
-		local_rate = getattr(item, "landed_cost_rate_local", None)
-		local_amount = getattr(item, "landed_cost_amount_local", None)
-		if local_rate is None:
-			local_rate = getattr(item, "landed_cost_rate", 0)
-		if local_amount is None:
-			local_amount = getattr(item, "landed_cost_amount", 0)
-		set_balances(
-			item.product,
-			"Warehouse",
-			stock_entry_doc.name,
-			available=available_qty,
-			warehouse=stock_entry_doc.warehouse,
-			stock_entry=stock_entry_doc.name,
-			import_shipment=stock_entry_doc.import_shipment,
-			landed_cost_rate=local_rate,
-			landed_cost_amount=local_amount,
-			remarks="Stock available in warehouse",
+		local_rate, local_amount = _landed_cost_local(item)
+		values = {"available": _available_from_item(item)}
+		if include_reserved:
+			values["reserved"] = item.reserved_qty or 0
+			values["issued"] = item.issued_qty or 0
+		slots.append(
+			make_slot(
+				item.product,
+				"Warehouse",
+				stock_entry_doc.name,
+				warehouse=stock_entry_doc.warehouse,
+				stock_entry=stock_entry_doc.name,
+				import_shipment=import_shipment or stock_entry_doc.import_shipment,
+				landed_cost_rate=local_rate,
+				landed_cost_amount=local_amount,
+				remarks="Stock available in warehouse",
+				**values,
+			)
 		)
+	return slots
+
+
+def _set_warehouse_balances(stock_entry_doc):
+	set_balances_bulk(_warehouse_slots(stock_entry_doc, include_reserved=False))
 
 
 def update_warehouse_stock(stock_entry_doc):
-	for item in stock_entry_doc.items:
-		available_qty = _available_from_item(item)
-		local_rate = getattr(item, "landed_cost_rate_local", None)
-		local_amount = getattr(item, "landed_cost_amount_local", None)
-		if local_rate is None:
-			local_rate = getattr(item, "landed_cost_rate", 0)
-		if local_amount is None:
-			local_amount = getattr(item, "landed_cost_amount", 0)
-		set_balances(
-			item.product,
-			"Warehouse",
-			stock_entry_doc.name,
-			available=available_qty,
-			reserved=item.reserved_qty or 0,
-			issued=item.issued_qty or 0,
-			warehouse=stock_entry_doc.warehouse,
-			stock_entry=stock_entry_doc.name,
-			import_shipment=stock_entry_doc.import_shipment,
-			landed_cost_rate=local_rate,
-			landed_cost_amount=local_amount,
-			remarks="Stock available in warehouse",
-		)
+	set_balances_bulk(_warehouse_slots(stock_entry_doc))
 
 
 def transfer_shipment_to_warehouse(shipment_doc, stock_entry_doc):
 	shipment_item_map = {child.name: (child.quantity or 0) for child in shipment_doc.items}
 	transferred_totals = _get_transferred_totals_by_shipment_item(shipment_doc.name)
 
+	slots = []
 	for item in stock_entry_doc.items:
 		available_qty = _available_from_item(item)
-		local_rate = getattr(item, "landed_cost_rate_local", None)
-		local_amount = getattr(item, "landed_cost_amount_local", None)
-		if local_rate is None:
-			local_rate = getattr(item, "landed_cost_rate", 0)
-		if local_amount is None:
-			local_amount = getattr(item, "landed_cost_amount", 0)
+		local_rate, local_amount = _landed_cost_local(item)
 		qty = item.available_qty or item.received_qty or 0
 		if not qty:
 			continue
@@ -487,62 +709,70 @@ def transfer_shipment_to_warehouse(shipment_doc, stock_entry_doc):
 		remaining_at_customs = max(customs_qty - total_transferred, 0)
 
 		# update customs balances with remaining stock and record movement in issued qty
-		set_balances(
-			item.product,
-			"Customs",
-			shipment_doc.name,
-			available=remaining_at_customs,
-			reserved=0,
-			issued=total_transferred,
-			warehouse=None,
-			stock_entry=stock_entry_doc.name,
-			import_shipment=shipment_doc.name,
-			landed_cost_rate=local_rate,
-			landed_cost_amount=local_amount,
-			remarks="Transferred to warehouse",
+		slots.append(
+			make_slot(
+				item.product,
+				"Customs",
+				shipment_doc.name,
+				available=remaining_at_customs,
+				reserved=0,
+				issued=total_transferred,
+				warehouse=None,
+				stock_entry=stock_entry_doc.name,
+				import_shipment=shipment_doc.name,
+				landed_cost_rate=local_rate,
+				landed_cost_amount=local_amount,
+				remarks="Transferred to warehouse",
+			)
 		)
 
 		# set warehouse balances to current entry values
-		set_balances(
-			item.product,
-			"Warehouse",
-			stock_entry_doc.name,
-			available=available_qty,
-			reserved=item.reserved_qty or 0,
-			issued=item.issued_qty or 0,
-			warehouse=stock_entry_doc.warehouse,
-			stock_entry=stock_entry_doc.name,
-			import_shipment=shipment_doc.name,
-			landed_cost_rate=local_rate,
-			landed_cost_amount=local_amount,
-			remarks="Stock available in warehouse",
+		slots.append(
+			make_slot(
+				item.product,
+				"Warehouse",
+				stock_entry_doc.name,
+				available=available_qty,
+				reserved=item.reserved_qty or 0,
+				issued=item.issued_qty or 0,
+				warehouse=stock_entry_doc.warehouse,
+				stock_entry=stock_entry_doc.name,
+				import_shipment=shipment_doc.name,
+				landed_cost_rate=local_rate,
+				landed_cost_amount=local_amount,
+				remarks="Stock available in warehouse",
+			)
 		)
 
+	set_balances_bulk(slots)
 
-def _sync_entry_customs_balances(stock_entry_doc):
+
+def _entry_customs_slots(stock_entry_doc):
 	customs_reference = stock_entry_doc.import_shipment or stock_entry_doc.name
+	slots = []
 	for item in stock_entry_doc.items:
-		available_qty = _available_from_item(item)
-		local_rate = getattr(item, "landed_cost_rate_local", None)
-		local_amount = getattr(item, "landed_cost_amount_local", None)
-		if local_rate is None:
-			local_rate = getattr(item, "landed_cost_rate", 0)
-		if local_amount is None:
-			local_amount = getattr(item, "landed_cost_amount", 0)
-		set_balances(
-			item.product,
-			"Customs",
-			customs_reference,
-			available=available_qty,
-			reserved=0,
-			issued=0,
-			warehouse=None,
-			stock_entry=stock_entry_doc.name,
-			import_shipment=stock_entry_doc.import_shipment,
-			landed_cost_rate=local_rate,
-			landed_cost_amount=local_amount,
-			remarks="Customs stock awaiting transfer",
+		local_rate, local_amount = _landed_cost_local(item)
+		slots.append(
+			make_slot(
+				item.product,
+				"Customs",
+				customs_reference,
+				available=_available_from_item(item),
+				reserved=0,
+				issued=0,
+				warehouse=None,
+				stock_entry=stock_entry_doc.name,
+				import_shipment=stock_entry_doc.import_shipment,
+				landed_cost_rate=local_rate,
+				landed_cost_amount=local_amount,
+				remarks="Customs stock awaiting transfer",
+			)
 		)
+	return slots
+
+
+def _sync_entry_customs_balances(stock_entry_doc):
+	set_balances_bulk(_entry_customs_slots(stock_entry_doc))
 
 
 def _available_from_item(item) -> float:
@@ -554,68 +784,61 @@ def _available_from_item(item) -> float:
 	return max(available, 0)
 
 
+def _entry_clear_slots(stock_entry_doc, location_type):
+	if location_type == "Warehouse":
+		reference = stock_entry_doc.name
+		warehouse = stock_entry_doc.warehouse
+	else:
+		reference = stock_entry_doc.import_shipment or stock_entry_doc.name
+		warehouse = None
+	return [
+		make_slot(
+			item.product,
+			location_type,
+			reference,
+			warehouse=warehouse,
+			stock_entry=stock_entry_doc.name,
+			import_shipment=stock_entry_doc.import_shipment,
+		)
+		for item in stock_entry_doc.items
+	]
+
+
 def update_stock_entry_balances(stock_entry_doc):
+	if stock_outbox.defer_entry(stock_entry_doc):
+		return
 	shipment = None
 	if stock_entry_doc.import_shipment and frappe.db.exists("Import Shipment", stock_entry_doc.import_shipment):
 		shipment = frappe.get_doc("Import Shipment", stock_entry_doc.import_shipment)
 
 	if stock_entry_doc.status == "At Customs":
 		if shipment:
-			sync_shipment_customs_balances(shipment, stock_entry=stock_entry_doc)
+			set_balances_bulk(_shipment_customs_slots(shipment, stock_entry=stock_entry_doc))
 		else:
-			_sync_entry_customs_balances(stock_entry_doc)
-		for item in stock_entry_doc.items:
-			clear_slot(
-				item.product,
-				"Warehouse",
-				stock_entry_doc.name,
-				warehouse=stock_entry_doc.warehouse,
-				stock_entry=stock_entry_doc.name,
-				import_shipment=stock_entry_doc.import_shipment,
-			)
+			set_balances_bulk(_entry_customs_slots(stock_entry_doc))
+		clear_slots_bulk(_entry_clear_slots(stock_entry_doc, "Warehouse"))
 		return
 
 	if shipment:
 		transfer_shipment_to_warehouse(shipment, stock_entry_doc)
 	else:
-		update_warehouse_stock(stock_entry_doc)
-		customs_reference = stock_entry_doc.import_shipment or stock_entry_doc.name
-		for item in stock_entry_doc.items:
-			clear_slot(
-				item.product,
-				"Customs",
-				customs_reference,
-				warehouse=None,
-				stock_entry=stock_entry_doc.name,
-				import_shipment=stock_entry_doc.import_shipment,
-			)
+		set_balances_bulk(_warehouse_slots(stock_entry_doc))
+		clear_slots_bulk(_entry_clear_slots(stock_entry_doc, "Customs"))
 
 
 def clear_stock_entry(stock_entry_doc):
-	for item in stock_entry_doc.items:
-		clear_slot(
-			item.product,
-			"Warehouse",
-			stock_entry_doc.name,
-			warehouse=stock_entry_doc.warehouse,
-			stock_entry=stock_entry_doc.name,
-			import_shipment=stock_entry_doc.import_shipment,
-		)
-		customs_reference = stock_entry_doc.import_shipment or stock_entry_doc.name
-		if customs_reference:
-			clear_slot(
-				item.product,
-				"Customs",
-				customs_reference,
-				warehouse=None,
-				stock_entry=stock_entry_doc.name,
-				import_shipment=stock_entry_doc.import_shipment,
-			)
+	if stock_outbox.defer_entry(stock_entry_doc):
+		return
+	clear_slots_bulk(
+		_entry_clear_slots(stock_entry_doc, "Warehouse") + _entry_clear_slots(stock_entry_doc, "Customs")
+	)
 
 
 def adjust_for_reservation(stock_entry_item, quantity, from_customs=False):
+	if stock_outbox.defer_item(stock_entry_item):
+		return
 	location_type = "Customs" if from_customs else "Warehouse"
-	parent = frappe.get_doc("Stock Entries", stock_entry_item.parent)
+	parent = stock_unit_of_work.get(stock_entry_item.parent)
 	location_reference = parent.import_shipment if from_customs else parent.name
 	apply_delta(
 		stock_entry_item.product,
@@ -630,8 +853,10 @@ def adjust_for_reservation(stock_entry_item, quantity, from_customs=False):
 
 
 def release_reservation(stock_entry_item, quantity, from_customs=False):
+	if stock_outbox.defer_item(stock_entry_item):
+		return
 	location_type = "Customs" if from_customs else "Warehouse"
-	parent = frappe.get_doc("Stock Entries", stock_entry_item.parent)
+	parent = stock_unit_of_work.get(stock_entry_item.parent)
 	location_reference = parent.import_shipment if from_customs else parent.name
 	apply_delta(
 		stock_entry_item.product,
@@ -646,8 +871,10 @@ def release_reservation(stock_entry_item, quantity, from_customs=False):
 
 
 def issue_stock(stock_entry_item, quantity, from_customs=False):
+	if stock_outbox.defer_item(stock_entry_item):
+		return
 	location_type = "Customs" if from_customs else "Warehouse"
-	parent = frappe.get_doc("Stock Entries", stock_entry_item.parent)
+	parent = stock_unit_of_work.get(stock_entry_item.parent)
 	location_reference = parent.import_shipment if from_customs else parent.name
 	apply_delta(
 		stock_entry_item.product,
@@ -661,9 +888,30 @@ def issue_stock(stock_entry_item, quantity, from_customs=False):
 	)
 
 
+def adjust_received(stock_entry_item, quantity, from_customs=False, remarks=None):
+	"""Add a signed received quantity (a stock adjustment) to the item's slot."""
+	if stock_outbox.defer_item(stock_entry_item):
+		return
+	location_type = "Customs" if from_customs else "Warehouse"
+	parent = stock_unit_of_work.get(stock_entry_item.parent)
+	location_reference = parent.import_shipment if from_customs else parent.name
+	apply_delta(
+		stock_entry_item.product,
+		location_type,
+		location_reference,
+		available_delta=quantity,
+		warehouse=parent.warehouse if not from_customs else None,
+		stock_entry=parent.name,
+		import_shipment=parent.import_shipment,
+		remarks=remarks,
+	)
+
+
 def reverse_issue(stock_entry_item, quantity, from_customs=False):
+	if stock_outbox.defer_item(stock_entry_item):
+		return
 	location_type = "Customs" if from_customs else "Warehouse"
-	parent = frappe.get_doc("Stock Entries", stock_entry_item.parent)
+	parent = stock_unit_of_work.get(stock_entry_item.parent)
 	location_reference = parent.import_shipment if from_customs else parent.name
 	apply_delta(
 		stock_entry_item.product,
@@ -0,0 +1,222 @@
+"""Transactional outbox for Stock Ledger Entry maintenance.
+
+`Stock Ledger Entry` is a derived cache (see `rebuild.py`). In the default
+"sync" mode every submit pays for the cache inline. With
+
+	bench --site <site> set-config plasticflow_ledger_mode outbox
+
+the ledger hooks instead append compact "slot dirty" rows — one per
+(Stock Entries, product) pair — to `Stock Ledger Outbox` inside the same
+transaction. After commit a deduplicated background job drains the
+outbox, coalesces the pairs and recomputes only the affected slots from
+Stock Entry Items; a per-minute scheduler sweep queues the same job as
+a safety net. A rolled-back transaction leaves no outbox rows behind.
+
+`get_lag()` reports how far the rollup is behind.
+"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.utils import now_datetime, time_diff_in_seconds
+
+MODE_KEY = "plasticflow_ledger_mode"
+SYNC_MODE = "sync"
+OUTBOX_MODE = "outbox"
+
+OUTBOX_DOCTYPE = "Stock Ledger Outbox"
+BATCH_SIZE = 500
+JOB_ID = "plasticflow-stock-ledger-outbox"
+LOCK_NAME = "plasticflow_stock_ledger_outbox"
+
+
+def get_mode() -> str:
+	mode = (frappe.conf.get(MODE_KEY) or SYNC_MODE).strip().lower()
+	return mode if mode in (SYNC_MODE, OUTBOX_MODE) else SYNC_MODE
+
+
+def is_enabled() -> bool:
+	from plasticflow.stock import ledger as stock_ledger
+
+	return get_mode() == OUTBOX_MODE and stock_ledger.table_exists(OUTBOX_DOCTYPE)
+
+
+def defer_entry(stock_entry_doc) -> bool:
+	"""Queue every product of a Stock Entries doc. False means "write inline"."""
+	if not is_enabled():
+		return False
+	mark_dirty(
+		stock_entry_doc.name,
+		[item.product for item in stock_entry_doc.items],
+		import_shipment=stock_entry_doc.import_shipment,
+		source_doctype="Stock Entries",
+		source_name=stock_entry_doc.name,
+	)
+	return True
+
+
+def defer_item(stock_entry_item) -> bool:
+	"""Queue the slots of one Stock Entry Items row. False means "write inline"."""
+	if not is_enabled():
+		return False
+	mark_dirty(stock_entry_item.parent, [stock_entry_item.product])
+	return True
+
+
+def mark_dirty(stock_entry, products, *, import_shipment=None, source_doctype=None, source_name=None):
+	"""Append outbox rows for (stock_entry, product) pairs in the current transaction."""
+	from plasticflow.stock import ledger as stock_ledger
+
+	products = sorted({product for product in products if product})
+	if not stock_entry or not products:
+		return
+	now = now_datetime()
+	user = frappe.session.user
+	stock_ledger.insert_rows(
+		OUTBOX_DOCTYPE,
+		(
+			"creation",
+			"modified",
+			"modified_by",
+			"owner",
+			"docstatus",
+			"idx",
+			"stock_entry",
+			"product",
+			"import_shipment",
+			"source_doctype",
+			"source_name",
+		),
+		[
+			(now, now, user, user, 0, 0, stock_entry, product, import_shipment, source_doctype, source_name)
+			for product in products
+		],
+	)
+	_schedule_drain()
+
+
+def _schedule_drain():
+	if getattr(frappe.local, "stock_ledger_outbox_scheduled", False):
+		return
+	frappe.local.stock_ledger_outbox_scheduled = True
+	frappe.db.after_commit.add(_enqueue_drain)
+	frappe.db.after_rollback.add(_reset_schedule)
+
+
+def _reset_schedule():
+	frappe.local.stock_ledger_outbox_scheduled = False
+
+
+def _enqueue_drain():
+	_reset_schedule()
+	frappe.enqueue(
+		"plasticflow.stock.outbox.process",
+		queue="short",
+		job_id=JOB_ID,
+		deduplicate=True,
+	)
+
+
+def sweep():
+	"""Scheduler safety net: queue the drain job when rows are pending."""
+	from plasticflow.stock import ledger as stock_ledger
+
+	if stock_ledger.table_exists(OUTBOX_DOCTYPE) and frappe.db.sql(
+		f"select 1 from `tab{OUTBOX_DOCTYPE}` limit 1"
+	):
+		_enqueue_drain()
+
+
+def process(batch_size: int = BATCH_SIZE) -> int:
+	"""Drain the outbox. Runs from the deduplicated job.
+
+	Only one drain runs at a time: two drainers holding different rows of
+	the same (entry, product) pair would each recompute the slot from
+	their own snapshot, and the older one could commit last. A drain
+	that finds the named lock taken returns at once; the running one (or
+	the next sweep) picks up its rows.
+
+	Claims rows oldest first, recomputes the coalesced pairs, deletes the
+	claimed rows and commits per batch. Rows that arrive meanwhile have a
+	higher id and are picked up by the next batch.
+	"""
+	from plasticflow.stock import ledger as stock_ledger
+
+	if not stock_ledger.table_exists(OUTBOX_DOCTYPE):
+		return 0
+
+	# Named locks are server-wide; scope ours to this site's database.
+	lock_name = f"{frappe.conf.db_name}:{LOCK_NAME}"
+	if not frappe.db.sql("select get_lock(%s, 0)", (lock_name,))[0][0]:
+		return 0
+	try:
+		return _drain(batch_size)
+	finally:
+		frappe.db.sql("select release_lock(%s)", (lock_name,))
+
+
+def _drain(batch_size):
+	from plasticflow.stock import rebuild as stock_rebuild
+
+	processed = 0
+	while True:
+		rows = frappe.db.sql(
+			f"""
+			select name, stock_entry, product
+			from `tab{OUTBOX_DOCTYPE}`
+			order by name
+			limit %s
+			for update
+			""",
+			(batch_size,),
+			as_dict=True,
+		)
+		if not rows:
+			break
+		stock_rebuild.recompute_entry_slots(
+			{(row.stock_entry, row.product) for row in rows},
+			remarks="Recomputed from Stock Entry Items (ledger outbox)",
+		)
+		names = [row.name for row in rows]
+		frappe.db.sql(
+			f"delete from `tab{OUTBOX_DOCTYPE}` where name in ({', '.join(['%s'] * len(names))})",
+			tuple(names),
+		)
+		frappe.db.commit()
+		processed += len(rows)
+		if len(rows) < batch_size:
+			break
+	return processed
+
+
+@frappe.whitelist()
+def get_lag():
+	"""How far the Stock Ledger Entry rollup is behind Stock Entry Items."""
+	frappe.has_permission(OUTBOX_DOCTYPE, "read", throw=True)
+	result = {
+		"mode": get_mode(),
+		"pending_rows": 0,
+		"pending_slots": 0,
+		"oldest_pending": None,
+		"lag_seconds": 0.0,
+	}
+	if not frappe.db.table_exists(OUTBOX_DOCTYPE):
+		return result
+	row = frappe.db.sql(
+		f"""
+		select
+			count(*) as pending_rows,
+			count(distinct stock_entry, product) as pending_slots,
+			min(creation) as oldest_pending
+		from `tab{OUTBOX_DOCTYPE}`
+		""",
+		as_dict=True,
+	)[0]
+	result.update(
+		pending_rows=row.pending_rows or 0,
+		pending_slots=row.pending_slots or 0,
+		oldest_pending=row.oldest_pending,
+	)
+	if row.oldest_pending:
+		result["lag_seconds"] = max(time_diff_in_seconds(now_datetime(), row.oldest_pending), 0.0)
+	return result
@@ -8,9 +8,18 @@ with different formulas, so the cache could drift away from the truth.
 
 This module provides:
 
-* `audit()` — read-only diff between the rollup and the truth.
+* `audit()` — read-only, set-based, paginated diff between the rollup
+  and the truth (`iter_drift()` streams every row; `entry_slot_drift()`
+  checks only the slots of given Stock Entries, for the drift monitor).
 * `rebuild_all()` — overwrite every rollup row from the truth, idempotent,
-  no Stock Ledger Movement rows emitted.
+  no Stock Ledger Movement rows emitted. Chunked, with a commit and a
+  checkpoint per chunk, so an interrupted run resumes.
+* `rebuild_incremental()` — the same engine restricted to Stock Entries
+  modified since the watermark left by the previous run.
+* `rebuild_all(parallel=N)` — the full rebuild sharded by product hash
+  across N background jobs.
+* `recompute_entry_slots()` — recompute only the slots of given
+  (stock_entry, product) pairs; used by the ledger outbox worker.
 
 Both are safe to run on production. The rebuild is what the post-deploy
 patch invokes.
@@ -18,8 +27,12 @@ patch invokes.
 
 from __future__ import annotations
 
+import json
+import time
+
 import frappe
-from frappe.utils import flt
+from frappe import _
+from frappe.utils import cint, flt, now_datetime
 
 from plasticflow.stock import ledger as stock_ledger
 from plasticflow.stock.availability import (
@@ -29,13 +42,44 @@ from plasticflow.stock.availability import (
 )
 
 LEDGER_DOCTYPE = "Stock Ledger Entry"
+AUDIT_PAGE_LENGTH = 500
+REBUILD_CHUNK_SIZE = 200
+WATERMARK_KEY = "plasticflow_stock_ledger_rebuild_watermark"
+CHECKPOINT_KEY = "plasticflow_stock_ledger_rebuild_checkpoint"
+LAST_PARALLEL_RUN_KEY = "plasticflow_stock_ledger_rebuild_last_parallel_run"
+PARALLEL_JOB_TIMEOUT = 4 * 60 * 60
+PARALLEL_RUN_TTL = 24 * 60 * 60
+
+
+def _in_condition(column, values, conditions, params):
+	conditions.append(f"{column} in ({', '.join(['%s'] * len(values))})")
+	params.extend(values)
+
+
+def _shard_condition(column, shard, conditions, params):
+	"""Restrict `column` (a product) to shard `(index, count)` of the product hash space."""
+	index, count = shard
+	conditions.append(f"mod(crc32({column}), %s) = %s")
+	params.extend((count, index))
 
 
-def _iter_warehouse_slots():
-	"""Yield (slot_key, expected) for each warehouse Stock Entry."""
+def _iter_warehouse_slots(*, stock_entries=None, products=None, shard=None):
+	"""Yield (slot_key, expected) for each warehouse Stock Entry.
+
+	`stock_entries` / `products` / `shard` narrow the scan for incremental
+	and sharded recomputes.
+	"""
 	if not frappe.db.table_exists("Stock Entries"):
 		return
-	placeholders = ", ".join(["%s"] * len(WAREHOUSE_STATUSES))
+	conditions = ["se.docstatus = 1"]
+	params: list = []
+	_in_condition("se.status", WAREHOUSE_STATUSES, conditions, params)
+	if stock_entries:
+		_in_condition("se.name", stock_entries, conditions, params)
+	if products:
+		_in_condition("sei.product", products, conditions, params)
+	if shard:
+		_shard_condition("sei.product", shard, conditions, params)
 	rows = frappe.db.sql(
 		f"""
 		select
@@ -48,10 +92,10 @@ def _iter_warehouse_slots():
 			coalesce(sum(sei.issued_qty), 0) as issued
 		from `tabStock Entries` se
 		inner join `tabStock Entry Items` sei on sei.parent = se.name
-		where se.docstatus = 1 and se.status in ({placeholders})
+		where {" and ".join(conditions)}
 		group by se.name, se.warehouse, se.import_shipment, sei.product
 		""",
-		WAREHOUSE_STATUSES,
+		tuple(params),
 		as_dict=True,
 	)
 	for row in rows:
@@ -73,7 +117,7 @@ def _iter_warehouse_slots():
 		)
 
 
-def _iter_customs_slots():
+def _iter_customs_slots(*, import_shipments=None, products=None, shard=None):
 	"""Yield (slot_key, expected) for customs-side stock per shipment+product.
 
 	Customs balances are keyed by shipment, not by stock entry — multiple
@@ -81,7 +125,15 @@ def _iter_customs_slots():
 	"""
 	if not frappe.db.table_exists("Stock Entries"):
 		return
-	placeholders = ", ".join(["%s"] * len(CUSTOMS_STATUSES))
+	conditions = ["se.docstatus = 1", "se.import_shipment is not null", "se.import_shipment != ''"]
+	params: list = []
+	_in_condition("se.status", CUSTOMS_STATUSES, conditions, params)
+	if import_shipments:
+		_in_condition("se.import_shipment", import_shipments, conditions, params)
+	if products:
+		_in_condition("sei.product", products, conditions, params)
+	if shard:
+		_shard_condition("sei.product", shard, conditions, params)
 	rows = frappe.db.sql(
 		f"""
 		select
@@ -93,11 +145,10 @@ def _iter_customs_slots():
 			min(se.name) as stock_entry
 		from `tabStock Entries` se
 		inner join `tabStock Entry Items` sei on sei.parent = se.name
-		where se.docstatus = 1 and se.status in ({placeholders})
-			and se.import_shipment is not null and se.import_shipment != ''
+		where {" and ".join(conditions)}
 		group by se.import_shipment, sei.product
 		""",
-		CUSTOMS_STATUSES,
+		tuple(params),
 		as_dict=True,
 	)
 	for row in rows:
@@ -119,30 +170,95 @@ def _iter_customs_slots():
 		)
 
 
-def _current_rollup(slot_key):
-	filters = {
-		"product": slot_key["product"],
-		"location_type": slot_key["location_type"],
-		"location_reference": slot_key["location_reference"],
-	}
-	if slot_key["warehouse"]:
-		filters["warehouse"] = slot_key["warehouse"]
-	if slot_key["import_shipment"]:
-		filters["import_shipment"] = slot_key["import_shipment"]
-	rows = frappe.db.get_all(
-		LEDGER_DOCTYPE,
-		filters=filters,
-		fields=["coalesce(sum(available_qty), 0) as available",
-				"coalesce(sum(reserved_qty), 0) as reserved",
-				"coalesce(sum(issued_qty), 0) as issued"],
-	)
-	if not rows:
-		return {"available": 0.0, "reserved": 0.0, "issued": 0.0}
-	row = rows[0]
+def _truth_sql():
+	"""Grouped truth (warehouse + customs slots) with its `slot_key`, as SQL.
+
+	Takes the named parameters `warehouse_statuses` / `customs_statuses`.
+	"""
+	return f"""
+		select {stock_ledger.slot_key_sql("g")} as slot_key, g.*
+		from (
+			select
+				sei.product as product,
+				'Warehouse' as location_type,
+				se.name as location_reference,
+				se.warehouse as warehouse,
+				se.name as stock_entry,
+				se.import_shipment as import_shipment,
+				coalesce(sum(sei.received_qty), 0) as received,
+				coalesce(sum(sei.reserved_qty), 0) as reserved,
+				coalesce(sum(sei.issued_qty), 0) as issued
+			from `tabStock Entries` se
+			inner join `tabStock Entry Items` sei on sei.parent = se.name
+			where se.docstatus = 1 and se.status in %(warehouse_statuses)s
+			group by se.name, se.warehouse, se.import_shipment, sei.product
+			union all
+			select
+				sei.product,
+				'Customs',
+				se.import_shipment,
+				null,
+				min(se.name),
+				se.import_shipment,
+				coalesce(sum(sei.received_qty), 0),
+				coalesce(sum(sei.reserved_qty), 0),
+				coalesce(sum(sei.issued_qty), 0)
+			from `tabStock Entries` se
+			inner join `tabStock Entry Items` sei on sei.parent = se.name
+			where se.docstatus = 1 and se.status in %(customs_statuses)s
+				and se.import_shipment is not null and se.import_shipment != ''
+			group by se.import_shipment, sei.product
+		) g
+	"""
+
+
+def _drift_sql():
+	"""`with truth ..., drift ...` — a full outer join of truth and rollup on `slot_key`.
+
+	Truth slots missing from the rollup compare against zero; rollup rows
+	with no truth slot (orphans) compare against an expected zero.
+	"""
+	sql = f"""
+		with truth as ({_truth_sql()}),
+		drift as (
+			select
+				t.slot_key, t.product, t.location_type, t.location_reference,
+				t.warehouse, t.stock_entry, t.import_shipment,
+				greatest(t.received - t.reserved - t.issued, 0) as expected_available,
+				t.reserved as expected_reserved,
+				t.issued as expected_issued,
+				coalesce(sle.available_qty, 0) as actual_available,
+				coalesce(sle.reserved_qty, 0) as actual_reserved,
+				coalesce(sle.issued_qty, 0) as actual_issued
+			from truth t
+			left join `tab{LEDGER_DOCTYPE}` sle on sle.slot_key = t.slot_key
+			union all
+			select
+				sle.slot_key, sle.product, sle.location_type, sle.location_reference,
+				sle.warehouse, sle.stock_entry, sle.import_shipment,
+				0, 0, 0,
+				coalesce(sle.available_qty, 0),
+				coalesce(sle.reserved_qty, 0),
+				coalesce(sle.issued_qty, 0)
+			from `tab{LEDGER_DOCTYPE}` sle
+			left join truth t on t.slot_key = sle.slot_key
+			where t.slot_key is null
+		)
+	"""
+	condition = """
+		abs(expected_available - actual_available) >= %(tolerance)s
+		or abs(expected_reserved - actual_reserved) >= %(tolerance)s
+		or abs(expected_issued - actual_issued) >= %(tolerance)s
+	"""
+	return sql, condition
+
+
+def _drift_values(**values):
 	return {
-		"available": flt(row.get("available")),
-		"reserved": flt(row.get("reserved")),
-		"issued": flt(row.get("issued")),
+		"warehouse_statuses": WAREHOUSE_STATUSES,
+		"customs_statuses": CUSTOMS_STATUSES,
+		"tolerance": QTY_TOLERANCE,
+		**values,
 	}
 
 
@@ -154,86 +270,564 @@ def _diff(actual, expected):
 	}
 
 
-def _significant(diff):
-	return (
-		abs(diff["available"]) >= QTY_TOLERANCE
-		or abs(diff["reserved"]) >= QTY_TOLERANCE
-		or abs(diff["issued"]) >= QTY_TOLERANCE
+def iter_drift(*, start=0, page_length=None, chunk_size=AUDIT_PAGE_LENGTH):
+	"""Yield drift rows in slot order, one query per `chunk_size` rows.
+
+	Streams the set-based comparison for callers that want every row
+	(drift monitor, scripts) without holding them all in memory.
+	"""
+	remaining = page_length
+	while remaining is None or remaining > 0:
+		size = chunk_size if remaining is None else min(chunk_size, remaining)
+		rows = _fetch_drift(start, size)
+		yield from rows
+		if len(rows) < size:
+			return
+		start += len(rows)
+		if remaining is not None:
+			remaining -= len(rows)
+
+
+def _fetch_drift(start, page_length):
+	cte, condition = _drift_sql()
+	rows = frappe.db.sql(
+		f"""
+		{cte}
+		select * from drift
+		where {condition}
+		order by product, location_type, location_reference, slot_key
+		limit %(page_length)s offset %(start)s
+		""",
+		_drift_values(page_length=page_length, start=start),
+		as_dict=True,
 	)
+	return [_drift_row(row) for row in rows]
+
+
+def _drift_row(row):
+	expected = {
+		"available": flt(row.expected_available),
+		"reserved": flt(row.expected_reserved),
+		"issued": flt(row.expected_issued),
+	}
+	actual = {
+		"available": flt(row.actual_available),
+		"reserved": flt(row.actual_reserved),
+		"issued": flt(row.actual_issued),
+	}
+	return {
+		"product": row.product,
+		"location_type": row.location_type,
+		"location_reference": row.location_reference,
+		"warehouse": row.warehouse,
+		"stock_entry": row.stock_entry,
+		"import_shipment": row.import_shipment,
+		"actual": actual,
+		"expected": expected,
+		"diff": _diff(actual, expected),
+	}
+
+
+def count_drift():
+	if not frappe.db.table_exists("Stock Entries") or not frappe.db.table_exists(LEDGER_DOCTYPE):
+		return 0
+	cte, condition = _drift_sql()
+	return frappe.db.sql(f"{cte} select count(*) from drift where {condition}", _drift_values())[0][0] or 0
 
 
 @frappe.whitelist()
-def audit():
+def audit(start=0, page_length=AUDIT_PAGE_LENGTH):
 	"""Read-only diff between Stock Ledger Entry and the canonical truth.
 
-	Returns the list of slots whose rollup disagrees with what the items
-	add up to. Safe to run on production — touches no rows.
+	One set-based comparison: truth grouped from Stock Entry Items,
+	outer-joined to the rollup on `slot_key`. Returns the total number of
+	drifting slots plus one page of them, so the cost is two queries no
+	matter how many slots exist. Safe to run on production — touches no
+	rows.
 	"""
-	drift = []
-	for slot_key, expected in _iter_warehouse_slots():
-		actual = _current_rollup(slot_key)
-		diff = _diff(actual, expected)
-		if _significant(diff):
-			drift.append({**slot_key, "actual": actual, "expected": expected, "diff": diff})
-	for slot_key, expected in _iter_customs_slots():
-		actual = _current_rollup(slot_key)
-		diff = _diff(actual, expected)
-		if _significant(diff):
-			drift.append({**slot_key, "actual": actual, "expected": expected, "diff": diff})
+	start = max(cint(start), 0)
+	page_length = max(cint(page_length), 0) or AUDIT_PAGE_LENGTH
+	drift_count = count_drift()
+	rows = _fetch_drift(start, page_length) if drift_count > start else []
 	return {
-		"drift_count": len(drift),
-		"rows": drift,
+		"drift_count": drift_count,
+		"start": start,
+		"page_length": page_length,
+		"rows": rows,
 	}
 
 
-def rebuild_all(*, log_progress: bool = True):
+def rebuild_all(
+	*,
+	log_progress: bool = True,
+	chunk_size: int = REBUILD_CHUNK_SIZE,
+	resume: bool = True,
+	parallel: int = 0,
+):
 	"""Overwrite every Stock Ledger Entry row from the canonical truth.
 
 	Idempotent. Does not emit Stock Ledger Movement rows — the historical
 	audit log is preserved verbatim. Run from the post-deploy patch and at
 	any time afterwards if a discrepancy is reported.
+
+	Walks every Stock Entries document in name order, `chunk_size` at a
+	time, committing and checkpointing after each chunk; with `resume` an
+	interrupted run continues after the last committed chunk.
+
+	`parallel=N` (N > 1) instead enqueues N shard jobs on the `long` queue
+	and returns the run id; see `rebuild_parallel()`.
 	"""
-	rebuilt = 0
-	for slot_key, expected in _iter_warehouse_slots():
-		stock_ledger.set_balances(
-			slot_key["product"],
-			slot_key["location_type"],
-			slot_key["location_reference"],
-			available=expected["available"],
-			reserved=expected["reserved"],
-			issued=expected["issued"],
-			warehouse=slot_key["warehouse"],
-			stock_entry=slot_key["stock_entry"],
-			import_shipment=slot_key["import_shipment"],
+	if cint(parallel) > 1:
+		return rebuild_parallel(cint(parallel), chunk_size=chunk_size, resume=resume)
+	return _run_rebuild("full", since=None, log_progress=log_progress, chunk_size=chunk_size, resume=resume)
+
+
+def rebuild_incremental(
+	*, log_progress: bool = True, chunk_size: int = REBUILD_CHUNK_SIZE, resume: bool = True
+):
+	"""Rebuild only the slots of Stock Entries changed since the stored watermark.
+
+	An entry counts as changed when it or any of its items was modified
+	after the watermark. Falls back to `rebuild_all()` when no watermark
+	exists yet. Uses the same chunked, checkpointed engine.
+	"""
+	checkpoint = _get_checkpoint() if resume else None
+	watermark = frappe.db.get_global(WATERMARK_KEY)
+	if not watermark and not (checkpoint and checkpoint.get("mode") == "incremental"):
+		return rebuild_all(log_progress=log_progress, chunk_size=chunk_size, resume=resume)
+	return _run_rebuild(
+		"incremental", since=watermark, log_progress=log_progress, chunk_size=chunk_size, resume=resume
+	)
+
+
+def _run_rebuild(mode, *, since, log_progress, chunk_size, resume, shard=None):
+	checkpoint = _get_checkpoint(shard) if resume else None
+	if checkpoint and checkpoint.get("mode") == mode:
+		since = checkpoint.get("since")
+		started_at = checkpoint["started_at"]
+		after = checkpoint.get("last_entry") or ""
+		rebuilt = cint(checkpoint.get("rebuilt"))
+	else:
+		started_at = str(now_datetime())
+		after = ""
+		rebuilt = 0
+
+	total = _count_candidate_entries(since, after, shard)
+	done = 0
+	while True:
+		names = _candidate_entries(since, after, chunk_size, shard)
+		if not names:
+			break
+		rebuilt += recompute_entry_slots(
+			[(name, None) for name in names],
 			remarks="Rebuilt from Stock Entry Items",
 			skip_movement_log=True,
+			shard=shard,
 		)
-		rebuilt += 1
-
-	for slot_key, expected in _iter_customs_slots():
-		stock_ledger.set_balances(
-			slot_key["product"],
-			slot_key["location_type"],
-			slot_key["location_reference"],
-			available=expected["available"],
-			reserved=expected["reserved"],
-			issued=expected["issued"],
-			warehouse=None,
-			stock_entry=slot_key["stock_entry"],
-			import_shipment=slot_key["import_shipment"],
-			remarks="Rebuilt from Stock Entry Items",
-			skip_movement_log=True,
+		after = names[-1]
+		done += len(names)
+		_set_checkpoint(
+			{"mode": mode, "since": since, "started_at": started_at, "last_entry": after, "rebuilt": rebuilt},
+			shard,
 		)
-		rebuilt += 1
-
-	_zero_orphan_rollups()
+		frappe.db.commit()
+		if log_progress:
+			frappe.publish_progress(
+				done * 100 / total if total else 100,
+				title=_("Rebuilding Stock Ledger"),
+				description=_("{0} of {1} stock entries").format(done, total),
+			)
 
+	frappe.db.set_global(_checkpoint_key(shard), "")
+	if not shard:
+		# Sharded runs leave this to the coordinator, once every shard is done.
+		_zero_orphan_rollups()
+		frappe.db.set_global(WATERMARK_KEY, started_at)
 	frappe.db.commit()
 	if log_progress:
-		frappe.logger().info(f"plasticflow.stock.rebuild: rebuilt {rebuilt} ledger slots")
+		frappe.logger().info(f"plasticflow.stock.rebuild: {mode} rebuild wrote {rebuilt} ledger slots")
 	return rebuilt
 
 
+def rebuild_parallel(shards: int, *, chunk_size: int = REBUILD_CHUNK_SIZE, resume: bool = True):
+	"""Shard the full rebuild by product hash across background workers.
+
+	Enqueues one `rebuild_shard` job per shard on the `long` queue. Each
+	shard writes only the slots of products with
+	`crc32(product) % shards == index`, so shards never touch the same
+	row. The shard that reports in last, whether it finished or failed,
+	runs the coordinator, which zeroes orphan rollups once and records
+	per-shard timings and failures. Returns the run id for
+	`get_parallel_rebuild_status()`.
+	"""
+	run_id = frappe.generate_hash(length=10)
+	frappe.cache.set_value(
+		_run_cache_key(run_id),
+		{"shards": shards, "started_at": str(now_datetime()), "started": time.time(), "timings": {}},
+		expires_in_sec=PARALLEL_RUN_TTL,
+	)
+	for index in range(shards):
+		frappe.enqueue(
+			"plasticflow.stock.rebuild.rebuild_shard",
+			queue="long",
+			timeout=PARALLEL_JOB_TIMEOUT,
+			job_id=f"plasticflow-ledger-rebuild-{run_id}-{index}",
+			run_id=run_id,
+			index=index,
+			shards=shards,
+			chunk_size=chunk_size,
+			resume=resume,
+		)
+	return run_id
+
+
+def rebuild_shard(run_id, index, shards, chunk_size=REBUILD_CHUNK_SIZE, resume=True):
+	"""Background job: rebuild one product-hash shard, then report in.
+
+	A shard that raises (including a job timeout) records its failure
+	before re-raising, so the run still completes and reports it; its
+	checkpoint lets a resumed run pick up where it stopped.
+	"""
+	started = time.time()
+	try:
+		rebuilt = _run_rebuild(
+			"full",
+			since=None,
+			log_progress=False,
+			chunk_size=chunk_size,
+			resume=resume,
+			shard=(cint(index), cint(shards)),
+		)
+	except Exception:
+		frappe.db.rollback()
+		failure = {"seconds": round(time.time() - started, 3), "error": frappe.get_traceback(), "finished": time.time()}
+		frappe.cache.hset(_failures_cache_key(run_id), str(index), failure)
+		frappe.log_error(title=f"Stock ledger rebuild shard {index} of run {run_id} failed")
+		_report_shard(run_id, shards)
+		raise
+	timing = {"seconds": round(time.time() - started, 3), "slots": rebuilt, "finished": time.time()}
+	frappe.cache.hset(_timings_cache_key(run_id), str(index), timing)
+	_report_shard(run_id, shards)
+
+
+def _report_shard(run_id, shards):
+	"""Count a finished or failed shard in; the last one runs the coordinator."""
+	counter = frappe.cache.make_key(f"{_run_cache_key(run_id)}:finished")
+	reported = frappe.cache.incr(counter)
+	frappe.cache.expire(counter, PARALLEL_RUN_TTL)
+	if reported == cint(shards):
+		_finish_parallel_rebuild(run_id)
+
+
+def _finish_parallel_rebuild(run_id):
+	"""Coordinator: runs once, after the last shard reports in.
+
+	Orphan zeroing does not depend on the shards, so it always runs. The
+	watermark only moves when every shard succeeded: an incremental
+	rebuild from it would otherwise skip what a failed shard never wrote.
+	"""
+	run = frappe.cache.get_value(_run_cache_key(run_id)) or {}
+	failures = _shard_failures(run_id)
+	_zero_orphan_rollups()
+	if run.get("started_at") and not failures:
+		frappe.db.set_global(WATERMARK_KEY, run["started_at"])
+
+	timings = {int(index): value for index, value in (frappe.cache.hgetall(_timings_cache_key(run_id)) or {}).items()}
+	shard_seconds = sum(timing["seconds"] for timing in timings.values())
+	wall_seconds = max((timing["finished"] for timing in timings.values()), default=time.time()) - run.get(
+		"started", time.time()
+	)
+	summary = {
+		"run_id": run_id,
+		"shards": run.get("shards") or len(timings),
+		"started_at": run.get("started_at"),
+		"wall_seconds": round(wall_seconds, 3),
+		"shard_seconds": round(shard_seconds, 3),
+		"speedup": round(shard_seconds / wall_seconds, 2) if wall_seconds > 0 else None,
+		"slots": sum(timing["slots"] for timing in timings.values()),
+		"timings": {index: timings[index] for index in sorted(timings)},
+		"status": "Failed" if failures else "Finished",
+		"failed_shards": len(failures),
+		"failures": failures,
+	}
+	frappe.db.set_global(LAST_PARALLEL_RUN_KEY, json.dumps(summary))
+	frappe.db.commit()
+	log = frappe.logger().error if failures else frappe.logger().info
+	log(f"plasticflow.stock.rebuild: parallel rebuild {run_id} {summary['status'].lower()}: {summary}")
+	return summary
+
+
+def get_parallel_rebuild_status(run_id=None):
+	"""Per-shard timings and failures of a running parallel rebuild, or the last finished one."""
+	if run_id:
+		run = frappe.cache.get_value(_run_cache_key(run_id)) or {}
+		timings = frappe.cache.hgetall(_timings_cache_key(run_id)) or {}
+		failures = _shard_failures(run_id)
+		return {
+			"run_id": run_id,
+			"shards": run.get("shards"),
+			"started_at": run.get("started_at"),
+			"finished_shards": len(timings),
+			"failed_shards": len(failures),
+			"timings": {int(index): value for index, value in timings.items()},
+			"failures": failures,
+		}
+	raw = frappe.db.get_global(LAST_PARALLEL_RUN_KEY)
+	return json.loads(raw) if raw else None
+
+
+def _run_cache_key(run_id):
+	return f"plasticflow:stock_ledger_rebuild:{run_id}"
+
+
+def _timings_cache_key(run_id):
+	return f"{_run_cache_key(run_id)}:timings"
+
+
+def _failures_cache_key(run_id):
+	return f"{_run_cache_key(run_id)}:failures"
+
+
+def _shard_failures(run_id):
+	failures = frappe.cache.hgetall(_failures_cache_key(run_id)) or {}
+	return dict(sorted((int(index), value) for index, value in failures.items()))
+
+
+def _candidate_conditions(since, after, shard=None):
+	conditions = ["se.name > %(after)s"]
+	values = {"after": after or "", "since": since}
+	if since:
+		conditions.append(
+			"""(se.modified >= %(since)s or exists (
+				select 1 from `tabStock Entry Items` sei
+				where sei.parent = se.name and sei.modified >= %(since)s
+			))"""
+		)
+	if shard:
+		conditions.append(
+			"""exists (
+				select 1 from `tabStock Entry Items` sei
+				where sei.parent = se.name and mod(crc32(sei.product), %(shard_count)s) = %(shard_index)s
+			)"""
+		)
+		values.update(shard_index=shard[0], shard_count=shard[1])
+	return " and ".join(conditions), values
+
+
+def _candidate_entries(since, after, limit, shard=None):
+	condition, values = _candidate_conditions(since, after, shard)
+	return frappe.db.sql_list(
+		f"""
+		select se.name from `tabStock Entries` se
+		where {condition}
+		order by se.name
+		limit %(limit)s
+		""",
+		{**values, "limit": limit},
+	)
+
+
+def _count_candidate_entries(since, after, shard=None):
+	if not frappe.db.table_exists("Stock Entries"):
+		return 0
+	condition, values = _candidate_conditions(since, after, shard)
+	return frappe.db.sql(f"select count(*) from `tabStock Entries` se where {condition}", values)[0][0] or 0
+
+
+def _checkpoint_key(shard=None):
+	if not shard:
+		return CHECKPOINT_KEY
+	return f"{CHECKPOINT_KEY}:{shard[0]}/{shard[1]}"
+
+
+def _get_checkpoint(shard=None):
+	raw = frappe.db.get_global(_checkpoint_key(shard))
+	if not raw:
+		return None
+	try:
+		return json.loads(raw)
+	except ValueError:
+		return None
+
+
+def _set_checkpoint(checkpoint, shard=None):
+	frappe.db.set_global(_checkpoint_key(shard), json.dumps(checkpoint))
+
+
+def _truth_slot(slot_key, expected, remarks="Rebuilt from Stock Entry Items"):
+	return stock_ledger.make_slot(
+		slot_key["product"],
+		slot_key["location_type"],
+		slot_key["location_reference"],
+		available=expected["available"],
+		reserved=expected["reserved"],
+		issued=expected["issued"],
+		warehouse=slot_key["warehouse"],
+		stock_entry=slot_key["stock_entry"],
+		import_shipment=slot_key["import_shipment"],
+		remarks=remarks,
+	)
+
+
+def recompute_entry_slots(
+	pairs, *, remarks="Recomputed from Stock Entry Items", skip_movement_log=False, shard=None
+):
+	"""Recompute only the ledger slots behind the given (stock_entry, product) pairs.
+
+	Writes the truth for the warehouse slots of those entries and the
+	customs slots of their shipments, and zeroes existing rollup rows of
+	those entries/shipments that no longer have a truth row (cancelled
+	entry, entry moved between customs and warehouse). A pair with no
+	product recomputes every product of the entry. Movement rows are
+	logged as for any other balance change unless `skip_movement_log`.
+	`shard=(index, count)` limits the work to products of that shard.
+	Returns the number of slots written.
+	"""
+	pairs = {(entry, product) for entry, product in pairs if entry}
+	if not pairs:
+		return 0
+	entries = sorted({entry for entry, _product in pairs})
+	products = None
+	if all(product for _entry, product in pairs):
+		products = sorted({product for _entry, product in pairs})
+	shipments = sorted(
+		{
+			shipment
+			for shipment in frappe.get_all(
+				"Stock Entries", filters={"name": ("in", entries)}, pluck="import_shipment"
+			)
+			if shipment
+		}
+	)
+
+	truth = list(_iter_warehouse_slots(stock_entries=entries, products=products, shard=shard))
+	if shipments:
+		truth.extend(_iter_customs_slots(import_shipments=shipments, products=products, shard=shard))
+	slots = [_truth_slot(slot_key, expected, remarks) for slot_key, expected in truth]
+
+	live_keys = {
+		stock_ledger.slot_key(*(slot.get(field) for field in stock_ledger.SLOT_KEY_FIELDS)) for slot in slots
+	}
+	for row in _existing_rollups(entries, shipments, products, shard):
+		if row.slot_key in live_keys:
+			continue
+		slots.append(
+			_truth_slot(
+				row,
+				{"available": 0, "reserved": 0, "issued": 0},
+				"Zeroed — no live stock entry items for this slot",
+			)
+		)
+	return stock_ledger.set_balances_bulk(slots, skip_movement_log=skip_movement_log)
+
+
+def entry_slot_drift(entries):
+	"""Compare the slots behind the given Stock Entries with their rollup rows.
+
+	The per-entry counterpart of `audit()`: truth is grouped only for
+	those entries (warehouse slots) and their shipments (customs slots),
+	and rollup rows are read by `slot_key`, so the cost follows the number
+	of entries rather than the size of the ledger. Touches no rows.
+	Returns `(slots_checked, drift_rows)` with rows shaped as in `audit()`.
+	"""
+	entries = sorted({entry for entry in entries or [] if entry})
+	if not entries:
+		return 0, []
+	shipments = sorted(
+		{
+			shipment
+			for shipment in frappe.get_all(
+				"Stock Entries", filters={"name": ("in", entries)}, pluck="import_shipment"
+			)
+			if shipment
+		}
+	)
+	truth = list(_iter_warehouse_slots(stock_entries=entries))
+	if shipments:
+		truth.extend(_iter_customs_slots(import_shipments=shipments))
+	truth_by_key = {
+		stock_ledger.slot_key(*(slot_key.get(field) for field in stock_ledger.SLOT_KEY_FIELDS)): (
+			slot_key,
+			expected,
+		)
+		for slot_key, expected in truth
+	}
+	stored = _rollups_by_key(sorted(truth_by_key))
+	for row in _existing_rollups(entries, shipments, None):
+		if row.slot_key not in truth_by_key:
+			truth_by_key[row.slot_key] = (row, {"available": 0, "reserved": 0, "issued": 0})
+			stored[row.slot_key] = row
+
+	drift = []
+	for key, (slot_key, expected) in truth_by_key.items():
+		row = stored.get(key) or {}
+		actual = {
+			"available": flt(row.get("available_qty")),
+			"reserved": flt(row.get("reserved_qty")),
+			"issued": flt(row.get("issued_qty")),
+		}
+		if _significant(actual, expected):
+			drift.append(
+				{
+					**{field: slot_key.get(field) for field in stock_ledger.SLOT_FIELDS},
+					"actual": actual,
+					"expected": expected,
+					"diff": _diff(actual, expected),
+				}
+			)
+	return len(truth_by_key), drift
+
+
+def _significant(actual, expected):
+	return any(abs(flt(expected[field]) - flt(actual[field])) >= QTY_TOLERANCE for field in expected)
+
+
+def _rollups_by_key(keys):
+	rows_by_key = {}
+	for start in range(0, len(keys), AUDIT_PAGE_LENGTH):
+		chunk = keys[start : start + AUDIT_PAGE_LENGTH]
+		rows = frappe.db.sql(
+			f"""
+			select slot_key, available_qty, reserved_qty, issued_qty
+			from `tab{LEDGER_DOCTYPE}`
+			where slot_key in ({", ".join(["%s"] * len(chunk))})
+			""",
+			tuple(chunk),
+			as_dict=True,
+		)
+		rows_by_key.update((row.slot_key, row) for row in rows)
+	return rows_by_key
+
+
+def _existing_rollups(entries, shipments, products, shard=None):
+	conditions = []
+	params: list = []
+	scope = []
+	_in_condition("stock_entry", entries, scope, params)
+	if shipments:
+		scope_params: list = []
+		_in_condition("import_shipment", shipments, scope, scope_params)
+		scope[-1] = f"(location_type = 'Customs' and {scope[-1]})"
+		params.extend(scope_params)
+	conditions.append(f"({' or '.join(scope)})")
+	if products:
+		_in_condition("product", products, conditions, params)
+	if shard:
+		_shard_condition("product", shard, conditions, params)
+	conditions.append("(available_qty != 0 or reserved_qty != 0 or issued_qty != 0)")
+	return frappe.db.sql(
+		f"""
+		select slot_key, product, location_type, location_reference,
+			warehouse, stock_entry, import_shipment,
+			available_qty, reserved_qty, issued_qty
+		from `tab{LEDGER_DOCTYPE}`
+		where {" and ".join(conditions)}
+		""",
+		tuple(params),
+		as_dict=True,
+	)
+
+
 def _zero_orphan_rollups():
 	"""Zero out rollup rows that no longer correspond to live, in-status entries.
 
@@ -241,32 +835,43 @@ def _zero_orphan_rollups():
 	cancelled or has moved out of the canonical status set, is stale.
 	We zero the balances rather than delete, so historical Stock Ledger
 	Movement rows still resolve their `entry` link.
+
+	One locking count and one set-based UPDATE — the rows are never
+	loaded — and, like the rest of the rebuild, no movement rows are
+	emitted. Returns the number of rows zeroed.
 	"""
 	if not frappe.db.table_exists(LEDGER_DOCTYPE):
-		return
-	rows = frappe.db.sql(
-		f"""
-		select sle.name, sle.product, sle.location_type, sle.location_reference,
-			sle.warehouse, sle.stock_entry, sle.import_shipment,
-			sle.available_qty, sle.reserved_qty, sle.issued_qty
-		from `tab{LEDGER_DOCTYPE}` sle
+		return 0
+	joins = f"""
+		`tab{LEDGER_DOCTYPE}` sle
 		left join `tabStock Entries` se on se.name = sle.stock_entry
-		where (se.name is null or se.docstatus != 1)
-			and (sle.available_qty != 0 or sle.reserved_qty != 0 or sle.issued_qty != 0)
+	"""
+	orphaned = """
+		(se.name is null or se.docstatus != 1)
+		and (sle.available_qty != 0 or sle.reserved_qty != 0 or sle.issued_qty != 0)
+	"""
+	# Count under lock so the UPDATE below touches exactly these rows.
+	zeroed = frappe.db.sql(f"select count(*) from {joins} where {orphaned} for update")[0][0]
+	if not zeroed:
+		return 0
+	now = now_datetime()
+	frappe.db.sql(
+		f"""
+		update {joins}
+		set
+			sle.available_qty = 0,
+			sle.reserved_qty = 0,
+			sle.issued_qty = 0,
+			sle.remarks = %(remarks)s,
+			sle.last_movement = %(now)s,
+			sle.modified = %(now)s,
+			sle.modified_by = %(user)s
+		where {orphaned}
 		""",
-		as_dict=True,
+		{
+			"remarks": "Zeroed during rebuild — parent stock entry missing or cancelled",
+			"now": now,
+			"user": frappe.session.user,
+		},
 	)
-	for row in rows:
-		stock_ledger.set_balances(
-			row.product,
-			row.location_type,
-			row.location_reference,
-			available=0,
-			reserved=0,
-			issued=0,
-			warehouse=row.warehouse,
-			stock_entry=row.stock_entry,
-			import_shipment=row.import_shipment,
-			remarks="Zeroed during rebuild — parent stock entry missing or cancelled",
-			skip_movement_log=True,
-		)
+	return zeroed
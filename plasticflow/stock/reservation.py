@@ -0,0 +1,210 @@
+"""Atomic quantity updates on `Stock Entry Items`.
+
+Reservation, release, issue, issue-reversal and stock adjustments
+(`receive`) used to load the whole
+Stock Entries document, find the child row in Python, change
+`reserved_qty` / `issued_qty` and `save()` it back. That is a lost-update
+race when two orders reserve the same batch, and a full-document write
+for a one-column change.
+
+The helpers here apply one relative UPDATE per row and report per-row
+success, then `refresh_entry_totals()` recomputes the parent totals and
+status with a single aggregate statement. The stored `available_qty`
+column is kept in step inside the same UPDATE. Reservations first lock
+their rows with `for update` and check the free quantity, so two orders
+can never both take the last unit; the other operations clamp at zero
+and always succeed.
+
+Each helper takes rows shaped like the Sales Order reservation payload:
+``{"child_name": ..., "qty": ...}`` (extra keys are ignored) and returns
+a list of booleans in the same order.
+"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+from plasticflow.stock import availability as stock_availability
+from plasticflow.stock import unit_of_work as stock_unit_of_work
+
+QTY_TOLERANCE = 0.0001
+
+ITEM_DOCTYPE = "Stock Entry Items"
+ENTRY_DOCTYPE = "Stock Entries"
+
+
+class StockConflictError(frappe.ValidationError):
+	"""A reservation lost the race for a batch row's free quantity."""
+
+
+_AVAILABLE_SQL = (
+	"greatest(coalesce(received_qty, 0) - coalesce(reserved_qty, 0) - coalesce(issued_qty, 0), 0)"
+)
+
+# operation -> SET clause. MySQL applies SET assignments left to right,
+# so `available_qty` sees the new values.
+_OPERATIONS = {
+	"reserve": "reserved_qty = coalesce(reserved_qty, 0) + %(qty)s",
+	"release": "reserved_qty = greatest(coalesce(reserved_qty, 0) - %(qty)s, 0)",
+	"issue": (
+		"reserved_qty = greatest(coalesce(reserved_qty, 0) - %(qty)s, 0),"
+		" issued_qty = coalesce(issued_qty, 0) + %(qty)s"
+	),
+	"reverse_issue": (
+		"issued_qty = greatest(coalesce(issued_qty, 0) - %(qty)s, 0),"
+		" reserved_qty = coalesce(reserved_qty, 0) + %(qty)s"
+	),
+	"receive": "received_qty = greatest(coalesce(received_qty, 0) + %(qty)s, 0)",
+}
+# Operations whose qty is a signed delta rather than a positive amount.
+_SIGNED_OPERATIONS = {"receive"}
+
+
+def reserve(rows) -> list[bool]:
+	"""Move qty from available to reserved, only where enough is available."""
+	return _apply("reserve", rows)
+
+
+def release(rows) -> list[bool]:
+	"""Move qty from reserved back to available (clamped at zero)."""
+	return _apply("release", rows)
+
+
+def issue(rows) -> list[bool]:
+	"""Move qty from reserved to issued."""
+	return _apply("issue", rows)
+
+
+def reverse_issue(rows) -> list[bool]:
+	"""Move qty from issued back to reserved."""
+	return _apply("reverse_issue", rows)
+
+
+def receive(rows) -> list[bool]:
+	"""Add a signed qty to received (and so available), clamped at zero."""
+	return _apply("receive", rows)
+
+
+def get_items(child_names) -> dict:
+	"""Return ``{child_name: row}`` with the fields the ledger helpers need."""
+	child_names = sorted({name for name in child_names or [] if name})
+	if not child_names:
+		return {}
+	placeholders = ", ".join(["%s"] * len(child_names))
+	rows = frappe.db.sql(
+		f"""
+		select sei.name, sei.parent, sei.product, sei.uom, se.status as entry_status
+		from `tab{ITEM_DOCTYPE}` sei
+		inner join `tab{ENTRY_DOCTYPE}` se on se.name = sei.parent
+		where sei.name in ({placeholders})
+		""",
+		tuple(child_names),
+		as_dict=True,
+	)
+	return {row.name: row for row in rows}
+
+
+def _apply(operation, rows) -> list[bool]:
+	rows = list(rows)
+	query = f"""
+		update `tab{ITEM_DOCTYPE}`
+		set {_OPERATIONS[operation]},
+			available_qty = {_AVAILABLE_SQL},
+			modified = %(modified)s,
+			modified_by = %(user)s
+		where name = %(child_name)s
+	"""
+	pending = [row for row in rows if flt(row.get("qty") or 0) > 0 and row.get("child_name")]
+	free = None
+	if operation == "reserve":
+		free = _lock_free_quantities(row.get("child_name") for row in pending)
+	modified = now_datetime()
+	user = frappe.session.user
+	results = []
+	for row in rows:
+		qty = flt(row.get("qty") or 0)
+		skip = abs(qty) < QTY_TOLERANCE if operation in _SIGNED_OPERATIONS else qty <= 0
+		if skip or not row.get("child_name"):
+			results.append(True)
+			continue
+		if free is not None:
+			available = free.get(row.get("child_name"), 0)
+			if available < qty - QTY_TOLERANCE:
+				results.append(False)
+				continue
+			free[row.get("child_name")] = available - qty
+		frappe.db.sql(
+			query,
+			{
+				"child_name": row.get("child_name"),
+				"qty": qty,
+				"modified": modified,
+				"user": user,
+			},
+		)
+		results.append(True)
+	stock_availability.invalidate_items(row.get("child_name") for row in rows)
+	return results
+
+
+def _lock_free_quantities(child_names) -> dict:
+	"""Lock the rows and return ``{child_name: received - reserved - issued}``."""
+	child_names = sorted({name for name in child_names if name})
+	if not child_names:
+		return {}
+	rows = frappe.db.sql(
+		f"""
+		select name,
+			coalesce(received_qty, 0) - coalesce(reserved_qty, 0) - coalesce(issued_qty, 0)
+		from `tab{ITEM_DOCTYPE}`
+		where name in ({", ".join(["%s"] * len(child_names))})
+		for update
+		""",
+		tuple(child_names),
+	)
+	return {name: flt(free) for name, free in rows}
+
+
+def refresh_entry_totals(entry_names):
+	"""Recompute totals and status for the given Stock Entries in one statement.
+
+	Mirrors `StockEntries._update_totals` / `_set_status`.
+	"""
+	entry_names = sorted({name for name in entry_names or [] if name})
+	if not entry_names:
+		return
+	stock_unit_of_work.evict(entry_names)
+	placeholders = ", ".join(["%s"] * len(entry_names))
+	frappe.db.sql(
+		f"""
+		update `tab{ENTRY_DOCTYPE}` se
+		inner join (
+			select
+				parent,
+				coalesce(sum(received_qty), 0) as received,
+				coalesce(sum(reserved_qty), 0) as reserved,
+				coalesce(sum(issued_qty), 0) as issued,
+				coalesce(sum(available_qty), 0) as available
+			from `tab{ITEM_DOCTYPE}`
+			where parenttype = %s and parent in ({placeholders})
+			group by parent
+		) totals on totals.parent = se.name
+		set
+			se.total_received_qty = totals.received,
+			se.total_reserved_qty = totals.reserved,
+			se.total_issued_qty = totals.issued,
+			se.available_qty = totals.available,
+			se.status = case
+				when se.status = 'At Customs' then se.status
+				when totals.available <= 0 and totals.issued != 0 then 'Depleted'
+				when totals.available <= 0 then 'Reserved'
+				when totals.reserved != 0 then 'Reserved'
+				when totals.issued != 0 then 'Partially Issued'
+				else 'Available'
+			end,
+			se.modified = %s,
+			se.modified_by = %s
+		""",
+		(ENTRY_DOCTYPE, *entry_names, now_datetime(), frappe.session.user),
+	)
@@ -0,0 +1,89 @@
+# Copyright (c) 2026, VuleroTech and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.database import get_db
+from frappe.tests import IntegrationTestCase
+
+from plasticflow.stock import availability as stock_availability
+from plasticflow.tests.utils import insert_stock_entry
+
+ENTRY = "_Test Shared Availability Entry"
+PRODUCT = "_Test Shared Availability Product"
+WAREHOUSE = "_Test Shared Availability Warehouse"
+
+
+class IntegrationTestSharedAvailabilityCache(IntegrationTestCase):
+	"""The shared cache fill against writes committed by another connection.
+
+	The seeded rows are committed so the second connection can update them,
+	and deleted again on cleanup.
+	"""
+
+	def setUp(self):
+		self.addCleanup(_delete_entry)
+		insert_stock_entry(ENTRY, [{"product": PRODUCT, "received_qty": 10}], warehouse=WAREHOUSE)
+		frappe.db.commit()
+		stock_availability.bump_shared_versions([PRODUCT])
+
+	def test_fill_sees_write_committed_after_version_read(self):
+		# Open this transaction's snapshot and memoise the old quantity.
+		self.assertEqual(
+			stock_availability.get_available_quantity(PRODUCT, warehouse=WAREHOUSE),
+			10,
+		)
+
+		mget = frappe.cache.mget
+		calls = []
+
+		def commit_between(keys):
+			values = mget(keys)
+			calls.append(keys)
+			if len(calls) == 1:
+				_commit_received_qty(25)
+			return values
+
+		with patch.object(frappe.cache, "mget", commit_between):
+			self.assertEqual(_cached_quantity(), 25)
+
+		# The entry stored under the version read holds the committed quantity.
+		self.assertEqual(_cached_quantity(), 25)
+
+
+def _cached_quantity():
+	return stock_availability.get_cached_available_quantity(PRODUCT, warehouse=WAREHOUSE)
+
+
+def _commit_received_qty(qty):
+	"""Update the seeded batch through a second connection and commit it."""
+	conf = frappe.conf
+	db = get_db(
+		socket=conf.db_socket,
+		host=conf.db_host,
+		port=conf.db_port,
+		user=conf.db_user or conf.db_name,
+		password=conf.db_password,
+		cur_db_name=conf.db_name,
+	)
+	try:
+		db.sql(
+			"""
+			update `tabStock Entry Items`
+			set received_qty = %(qty)s, available_qty = %(qty)s
+			where parent = %(entry)s
+			""",
+			{"qty": qty, "entry": ENTRY},
+		)
+		db.commit()
+	finally:
+		db.close()
+
+
+def _delete_entry():
+	frappe.db.rollback()
+	frappe.db.delete("Stock Entry Items", {"parent": ENTRY})
+	frappe.db.delete("Stock Entries", {"name": ENTRY})
+	frappe.db.commit()
+	stock_availability.bump_shared_versions([PRODUCT])
@@ -0,0 +1,203 @@
+# Copyright (c) 2026, VuleroTech and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, now_datetime
+
+from plasticflow.plasticflow.report.stock_balance import stock_balance
+from plasticflow.stock import availability as stock_availability
+from plasticflow.stock import rebuild as stock_rebuild
+from plasticflow.tests.utils import insert_rows
+
+PRODUCTS = 40
+ENTRIES_PER_PRODUCT = 25
+WAREHOUSE = "_Test Query Plan Warehouse"
+
+
+class IntegrationTestStockQueryPlans(IntegrationTestCase):
+	"""EXPLAIN the canonical stock queries against seeded data.
+
+	Each test captures the SQL a real code path issues and fails when
+	MariaDB plans a full scan (`type = ALL`) of one of the stock tables.
+	"""
+
+	HOT_TABLES = (
+		"tabStock Entries",
+		"tabStock Entry Items",
+		"tabStock Ledger Entry",
+		"tabStock Ledger Movement",
+	)
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.product = _product(7)
+		cls.shipment = _shipment(3)
+		cls.entry = _seed()
+
+	def setUp(self):
+		# Every test must reach the database, not the per-transaction cache.
+		stock_availability.clear_cache()
+
+	def test_available_batches(self):
+		self.assertNoFullScan(
+			lambda: stock_availability.get_available_batches(self.product, warehouse=WAREHOUSE)
+		)
+
+	def test_available_batches_bulk(self):
+		self.assertNoFullScan(
+			lambda: stock_availability.get_available_batches_bulk(
+				[self.product, _product(8)], warehouse=WAREHOUSE, include_zero=True
+			)
+		)
+
+	def test_lock_candidate_batches(self):
+		self.assertNoFullScan(
+			lambda: stock_availability.lock_candidate_batches(
+				[self.product], location_type="Warehouse", warehouse=WAREHOUSE
+			)
+		)
+
+	def test_sales_order_fifo_check(self):
+		order = frappe.new_doc("Sales Order")
+		reservations = {
+			self.entry: {"from_customs": False, "rows": [{"child_name": f"{self.entry}-BATCH-001", "qty": 1}]}
+		}
+
+		def enforce():
+			# Older seeded batches are available, so the check reports a violation.
+			with self.assertRaises(frappe.ValidationError):
+				order._enforce_fifo(reservations)
+
+		self.assertNoFullScan(enforce)
+
+	def test_entry_slot_drift(self):
+		self.assertNoFullScan(lambda: stock_rebuild.entry_slot_drift([self.entry]))
+
+	def test_ledger_slot_lookup(self):
+		self.assertNoFullScan(
+			lambda: frappe.db.get_value(
+				"Stock Ledger Entry",
+				{"product": self.product, "location_type": "Warehouse", "location_reference": self.entry},
+				"reserved_qty",
+			)
+		)
+
+	def test_stock_balance_as_of_shipment(self):
+		self.assertNoFullScan(
+			lambda: stock_balance.execute(
+				{"import_shipment": self.shipment, "as_of_date": add_days(now_datetime(), -200).date()}
+			)
+		)
+
+	def assertNoFullScan(self, call):
+		queries = _capture_selects(call)
+		self.assertTrue(queries, "no query was captured")
+		for query, values in queries:
+			plan = frappe.db.sql(f"explain {query}", values, as_dict=True)
+			full_scans = [
+				row.table
+				for row in plan
+				if row.type == "ALL" and _table_of(row.table, query) in self.HOT_TABLES
+			]
+			self.assertFalse(full_scans, f"full table scan on {full_scans} for:\n{query}")
+
+
+def _capture_selects(call):
+	captured = []
+	sql = frappe.db.sql
+
+	def record(query, values=(), *args, **kwargs):
+		if query.lstrip().lower().startswith(("select", "with")):
+			captured.append((query, values))
+		return sql(query, values, *args, **kwargs)
+
+	with patch.object(frappe.db, "sql", record):
+		call()
+	return captured
+
+
+def _table_of(alias, query):
+	"""Map an EXPLAIN `table` (an alias or table name) back to its table."""
+	if alias.startswith("tab"):
+		return alias
+	for table in IntegrationTestStockQueryPlans.HOT_TABLES:
+		if f"`{table}` {alias}" in query or f"`{table}` as {alias}" in query:
+			return table
+	return alias
+
+
+def _product(index):
+	return f"_Test QP Product {index:03d}"
+
+
+def _shipment(index):
+	return f"_Test QP Shipment {index:03d}"
+
+
+def _seed():
+	"""Bulk insert enough submitted entries, items and ledger rows to make plans meaningful."""
+	now = now_datetime()
+	entries, items, slots, movements = [], [], [], []
+	for product_index in range(PRODUCTS):
+		product = _product(product_index)
+		for entry_index in range(ENTRIES_PER_PRODUCT):
+			entry = f"_TQP-{product_index:03d}-{entry_index:03d}"
+			shipment = _shipment(entry_index)
+			created = add_days(now, -entry_index * 10)
+			reserved = entry_index % 3
+			location = {
+				"product": product,
+				"location_type": "Warehouse",
+				"location_reference": entry,
+				"warehouse": WAREHOUSE,
+				"stock_entry": entry,
+				"import_shipment": shipment,
+			}
+			entries.append(
+				{
+					"name": entry,
+					"creation": created,
+					"import_shipment": shipment,
+					"warehouse": WAREHOUSE,
+					"status": "Available",
+					"arrival_date": created.date(),
+				}
+			)
+			items.append(
+				{
+					"name": f"{entry}-BATCH-001",
+					"creation": created,
+					"parent": entry,
+					"parenttype": "Stock Entries",
+					"parentfield": "items",
+					"product": product,
+					"received_qty": 100,
+					"reserved_qty": reserved,
+					"issued_qty": 0,
+					"available_qty": 100 - reserved,
+				}
+			)
+			slots.append(
+				{
+					"creation": created,
+					"slot_key": frappe.generate_hash(length=40),
+					**location,
+					"available_qty": 100 - reserved,
+					"reserved_qty": reserved,
+					"issued_qty": 0,
+					"last_movement": created,
+				}
+			)
+			movements.append(
+				{"creation": created, **location, "movement_datetime": created, "available_delta": 100}
+			)
+
+	insert_rows("Stock Entries", entries, docstatus=1)
+	insert_rows("Stock Entry Items", items, docstatus=1)
+	insert_rows("Stock Ledger Entry", slots)
+	insert_rows("Stock Ledger Movement", movements)
+	return "_TQP-007-003"
@@ -0,0 +1,59 @@
+"""Request-scoped identity map for `Stock Entries`.
+
+One request (a Sales Order submit, a Delivery Note issue, a Stock
+Adjustment) often needs the same Stock Entries parent many times — once
+per child row in the ledger helpers, again in the FIFO check. `get()`
+hands back the instance already loaded in this request instead of
+calling `frappe.get_doc` again.
+
+Instances are read-only: they come from the transaction's snapshot, so
+saving one could write stale `reserved_qty` / `issued_qty` back over a
+concurrent change. Quantities only ever change through the relative SQL
+updates in `reservation.py`, which call `evict()` for the parents they
+touch.
+
+The map lives on `frappe.local`, so it never outlives the request or
+job, and it is dropped on rollback.
+"""
+
+from __future__ import annotations
+
+import frappe
+
+DOCTYPE = "Stock Entries"
+
+
+def _state(create=True):
+	state = getattr(frappe.local, "stock_entry_identity_map", None)
+	if state is None and create:
+		state = frappe.local.stock_entry_identity_map = frappe._dict(docs={})
+		frappe.db.after_rollback.add(clear)
+	return state
+
+
+def get(name):
+	"""Return the request's instance of a Stock Entries document, loading it once."""
+	state = _state()
+	doc = state.docs.get(name)
+	if doc is None:
+		doc = frappe.get_doc(DOCTYPE, name)
+		state.docs[name] = doc
+	return doc
+
+
+def register(doc):
+	"""Adopt an instance the caller already holds; returns the mapped instance."""
+	return _state().docs.setdefault(doc.name, doc)
+
+
+def evict(names):
+	"""Forget instances whose rows were changed behind the document's back."""
+	state = _state(create=False)
+	if not state:
+		return
+	for name in names:
+		state.docs.pop(name, None)
+
+
+def clear():
+	frappe.local.stock_entry_identity_map = None
@@ -0,0 +1,63 @@
+"""Seeding helpers shared by the integration tests.
+
+The stock tests seed rows straight into the tables, skipping document
+hooks and link validation, so a fixture needs no Product, Customer or
+Import Shipment records. Everything is written inside the test's
+transaction and rolled back with it.
+"""
+
+import frappe
+from frappe.utils import now_datetime
+
+STANDARD_FIELDS = ("name", "creation", "modified", "modified_by", "owner", "docstatus")
+
+
+def insert_rows(doctype, rows, *, docstatus=0):
+	"""Bulk insert `rows` (dicts sharing the same keys) into `doctype`.
+
+	`name`, `creation`, `modified`, `modified_by`, `owner` and `docstatus`
+	are filled in unless a row sets them. Returns the row names.
+	"""
+	rows = list(rows)
+	if not rows:
+		return []
+	now = now_datetime()
+	user = frappe.session.user
+	defaults = {"creation": now, "modified_by": user, "owner": user, "docstatus": docstatus}
+	prepared = []
+	for row in rows:
+		row = {**defaults, **row}
+		row.setdefault("name", frappe.generate_hash(length=10))
+		row.setdefault("modified", row["creation"])
+		prepared.append(row)
+	fields = list(dict.fromkeys([*STANDARD_FIELDS, *prepared[0]]))
+	frappe.db.bulk_insert(
+		doctype, fields=fields, values=[tuple(row[field] for field in fields) for row in prepared]
+	)
+	return [row["name"] for row in prepared]
+
+
+def insert_stock_entry(name, items, **fields):
+	"""Seed a submitted Stock Entries row with `items` as its Stock Entry Items.
+
+	Item rows are named `<name>-BATCH-001`, `-002`, ... unless they carry a
+	`name`; `available_qty` defaults to `received_qty`. Returns the item
+	names.
+	"""
+	insert_rows("Stock Entries", [{"name": name, "status": "Available", **fields}], docstatus=1)
+	return insert_rows(
+		"Stock Entry Items",
+		[
+			{
+				"name": f"{name}-BATCH-{idx:03d}",
+				"parent": name,
+				"parenttype": "Stock Entries",
+				"parentfield": "items",
+				"idx": idx,
+				"available_qty": item.get("received_qty", 0),
+				**item,
+			}
+			for idx, item in enumerate(items, start=1)
+		],
+		docstatus=1,
+	)